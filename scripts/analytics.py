@@ -0,0 +1,338 @@
+"""
+analytics.py - Columnar analytics over result files
+---------------------------------
+Loads any number of result files (pretty .json or streaming .jsonl) into one
+NumPy column table, one row per (run, task, strategy), and computes pass
+rates with bootstrap confidence intervals, paired McNemar comparisons and
+per-dataset breakdowns with grouped array operations instead of per-record
+dict counters:
+
+    python scripts/analytics.py summary results/*.json --by dataset
+    python scripts/analytics.py compare results_X.jsonl --strategies baseline baseline_improved
+    python scripts/analytics.py diff results_OLD.json results_NEW.jsonl --flips
+---------------------------------
+"""
+
+import os
+import math
+import json
+import argparse
+
+import numpy as np
+
+from results_io import read_jsonl, unit_key
+
+
+CATEGORICAL = ("run", "task", "dataset", "strategy")
+BOOTSTRAP_SAMPLES = 2000
+ALPHA = 0.05
+# McNemar: exact binomial test up to this many discordant pairs, chi-square above
+EXACT_LIMIT = 5000
+
+
+# ---------------- Table ---------------- #
+class ResultTable:
+    """Result rows as NumPy columns.
+
+    Categorical columns hold integer codes into `labels[column]`; `passed` is
+    bool and `tokens` / `latency` are float (NaN when a record has no call).
+    """
+
+    def __init__(self, columns: dict, labels: dict):
+        self.columns = columns
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.columns["passed"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def code(self, column: str, label: str) -> int:
+        try:
+            return self.labels[column].index(label)
+        except ValueError:
+            raise KeyError(f"No {column} {label!r} (have: {', '.join(self.labels[column])})") from None
+
+    def select(self, mask) -> "ResultTable":
+        return ResultTable({k: v[mask] for k, v in self.columns.items()}, self.labels)
+
+
+def _task_rows(task: dict):
+    """Per-strategy records of one task in the pretty JSON format."""
+    for strategy, result in task.get("strategies", {}).items():
+        yield {**task, **result, "strategy": strategy}
+
+
+def _read_records(path: str) -> list:
+    if path.endswith(".jsonl"):
+        # Later records of a unit replace earlier ones (--resume / retries)
+        return list({unit_key(r): r for r in read_jsonl(path)}.values())
+    with open(path, "r", encoding="utf-8") as f:
+        tasks = json.load(f)
+    if not isinstance(tasks, list) or (tasks and "strategies" not in tasks[0]):
+        raise ValueError(f"{path} is not an eval_gpt.py results file")
+    return [row for task in tasks for row in _task_rows(task)]
+
+
+def load_results(paths: list, run_names: list = None) -> ResultTable:
+    """Load result files into one table; each file is a run named after it."""
+    labels = {c: [] for c in CATEGORICAL}
+    index = {c: {} for c in CATEGORICAL}
+    codes = {c: [] for c in CATEGORICAL}
+    passed, tokens, latency = [], [], []
+
+    def encode(column, label):
+        table = index[column]
+        code = table.get(label)
+        if code is None:
+            code = table[label] = len(labels[column])
+            labels[column].append(label)
+        codes[column].append(code)
+
+    for i, path in enumerate(paths):
+        run = run_names[i] if run_names else os.path.splitext(os.path.basename(path))[0]
+        for record in _read_records(path):
+            if "passed" not in record:
+                continue
+            encode("run", run)
+            # Same key as results_io.unit_key; APPS task ids are not unique
+            encode("task", str(record.get("filename") or record.get("task_id")))
+            encode("dataset", record.get("dataset") or "Unknown")
+            encode("strategy", record["strategy"])
+            passed.append(bool(record["passed"]))
+            call = record.get("call") or {}
+            prompt, completion = call.get("prompt_tokens"), call.get("completion_tokens")
+            tokens.append(prompt + completion if prompt is not None and completion is not None else math.nan)
+            latency.append(call["latency_seconds"] if call.get("latency_seconds") is not None else math.nan)
+
+    columns = {c: np.asarray(codes[c], dtype=np.int32) for c in CATEGORICAL}
+    columns["passed"] = np.asarray(passed, dtype=bool)
+    columns["tokens"] = np.asarray(tokens, dtype=float)
+    columns["latency"] = np.asarray(latency, dtype=float)
+    return ResultTable(columns, labels)
+
+
+# ---------------- Grouping ---------------- #
+def group_by(table: ResultTable, by: tuple) -> tuple:
+    """(group codes of shape [groups, len(by)], group id of every row)."""
+    key = np.zeros(len(table), dtype=np.int64)
+    for column in by:
+        # Mixed-radix key over the categorical codes
+        key = key * len(table.labels[column]) + table[column]
+    unique, inverse = np.unique(key, return_inverse=True)
+    groups = np.empty((len(unique), len(by)), dtype=np.int64)
+    for j in range(len(by) - 1, -1, -1):
+        size = len(table.labels[by[j]])
+        groups[:, j] = unique % size
+        unique = unique // size
+    return groups, inverse
+
+
+def _labels(table: ResultTable, by: tuple, codes) -> dict:
+    return {column: table.labels[column][code] for column, code in zip(by, codes)}
+
+
+def bootstrap_ci(passed, total, samples: int = BOOTSTRAP_SAMPLES, alpha: float = ALPHA,
+                 seed: int = 0) -> tuple:
+    """Percentile bootstrap interval of each group's pass rate.
+
+    Resampling n binary outcomes with replacement draws Binomial(n, passed / n)
+    passes, so every group is resampled at once without materializing rows.
+    """
+    passed, total = np.asarray(passed, dtype=float), np.asarray(total, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    rate = np.divide(passed, total, out=np.zeros_like(passed), where=total > 0)
+    draws = rng.binomial(total, rate, size=(samples, len(total))) / np.maximum(total, 1)
+    lo, hi = np.quantile(draws, [alpha / 2, 1 - alpha / 2], axis=0)
+    return lo, hi
+
+
+def pass_rates(table: ResultTable, by: tuple = ("run", "strategy"), samples: int = BOOTSTRAP_SAMPLES,
+               alpha: float = ALPHA) -> list:
+    """One row per group: total, passed, rate, bootstrap CI and mean tokens."""
+    groups, inverse = group_by(table, by)
+    n = len(groups)
+    total = np.bincount(inverse, minlength=n)
+    passed = np.bincount(inverse, weights=table["passed"], minlength=n)
+    lo, hi = bootstrap_ci(passed, total, samples, alpha)
+    has_tokens = ~np.isnan(table["tokens"])
+    token_sum = np.bincount(inverse[has_tokens], weights=table["tokens"][has_tokens], minlength=n)
+    token_count = np.bincount(inverse[has_tokens], minlength=n)
+    rows = []
+    for g in range(n):
+        rows.append({
+            **_labels(table, by, groups[g]),
+            "total": int(total[g]),
+            "passed": int(passed[g]),
+            "rate": passed[g] / total[g],
+            "ci": (float(lo[g]), float(hi[g])),
+            "tokens": token_sum[g] / token_count[g] if token_count[g] else None,
+        })
+    return rows
+
+
+# ---------------- Paired Comparison ---------------- #
+def mcnemar_p(a_only: int, b_only: int) -> float:
+    """Two-sided McNemar p-value from the discordant pair counts."""
+    n = a_only + b_only
+    if n == 0:
+        return 1.0
+    if n <= EXACT_LIMIT:
+        tail = sum(math.comb(n, i) for i in range(min(a_only, b_only) + 1))
+        return min(1.0, 2 * tail / 2 ** n)
+    statistic = (abs(a_only - b_only) - 1) ** 2 / n
+    return math.erfc(math.sqrt(statistic / 2))
+
+
+def paired(table: ResultTable, column: str, a: str, b: str, within: tuple = ()) -> dict:
+    """Pair rows where `column` is `a` vs `b` on the same task and other keys.
+
+    Pairs share every categorical value except `column`, so comparing two
+    strategies pairs them per (run, task) and comparing two runs pairs them per
+    (task, strategy). Returns (within labels) -> pair arrays for `a` and `b`,
+    plus the task code of each pair.
+    """
+    keys = tuple(c for c in CATEGORICAL if c != column)
+    sides = []
+    for label in (a, b):
+        side = table.select(table[column] == table.code(column, label))
+        key = np.zeros(len(side), dtype=np.int64)
+        for c in keys:
+            key = key * len(table.labels[c]) + side[c]
+        sides.append((side, key))
+    (side_a, key_a), (side_b, key_b) = sides
+    common, ia, ib = np.intersect1d(key_a, key_b, return_indices=True)
+    pairs = {"a": side_a["passed"][ia], "b": side_b["passed"][ib], "task": side_a["task"][ia]}
+    if not within:
+        return {(): pairs}
+    group_key = np.zeros(len(common), dtype=np.int64)
+    for c in within:
+        group_key = group_key * len(table.labels[c]) + side_a[c][ia]
+    out = {}
+    for value in np.unique(group_key):
+        mask = group_key == value
+        codes, rest = [], int(value)
+        for c in reversed(within):
+            rest, code = divmod(rest, len(table.labels[c]))
+            codes.append(code)
+        label = tuple(table.labels[c][code] for c, code in zip(within, reversed(codes)))
+        out[label] = {k: v[mask] for k, v in pairs.items()}
+    return out
+
+
+def mcnemar(table: ResultTable, column: str, a: str, b: str, within: tuple = ()) -> list:
+    """McNemar test of `a` vs `b` for each `within` group."""
+    rows = []
+    for label, pairs in sorted(paired(table, column, a, b, within).items()):
+        a_only = int(np.count_nonzero(pairs["a"] & ~pairs["b"]))
+        b_only = int(np.count_nonzero(~pairs["a"] & pairs["b"]))
+        rows.append({
+            **dict(zip(within, label)),
+            "pairs": len(pairs["a"]),
+            "rate_a": float(pairs["a"].mean()) if len(pairs["a"]) else 0.0,
+            "rate_b": float(pairs["b"].mean()) if len(pairs["b"]) else 0.0,
+            "a_only": a_only,
+            "b_only": b_only,
+            "p": mcnemar_p(a_only, b_only),
+        })
+    return rows
+
+
+def flips(table: ResultTable, column: str, a: str, b: str, within: tuple = ()) -> list:
+    """(within labels, task, "fixed" | "broken") for pairs whose outcome changed from a to b."""
+    out = []
+    for label, pairs in sorted(paired(table, column, a, b, within).items()):
+        for i in np.flatnonzero(pairs["a"] != pairs["b"]):
+            out.append((label, table.labels["task"][pairs["task"][i]], "fixed" if pairs["b"][i] else "broken"))
+    return out
+
+
+# ---------------- CLI ---------------- #
+def _ci(row: dict) -> str:
+    lo, hi = row["ci"]
+    return f"[{lo * 100:5.1f}, {hi * 100:5.1f}]"
+
+
+def print_summary(table: ResultTable, by: tuple, args):
+    level = int(round((1 - args.alpha) * 100))
+    print(f"\n📊 Pass rate by {', '.join(by)} ({level}% bootstrap CI, {args.bootstrap} samples):")
+    width = [max(len(str(label)) for label in table.labels[c]) + 2 for c in by]
+    for row in pass_rates(table, by, args.bootstrap, args.alpha):
+        keys = "".join(f"{row[c]:{w}}" for c, w in zip(by, width))
+        tokens = f"{row['tokens']:10.0f}" if row["tokens"] is not None else f"{'-':>10}"
+        print(f"   {keys}{row['passed']:6}/{row['total']:<6}{row['rate'] * 100:6.1f}%  {_ci(row)}{tokens} tok")
+
+
+def print_mcnemar(rows: list, within: tuple, a: str, b: str):
+    print(f"\n⚖️  McNemar: {a} (A) vs {b} (B), paired per task:")
+    print(f"   {'':30}{'pairs':>7}{'A':>8}{'B':>8}{'A only':>8}{'B only':>8}{'p':>9}")
+    for row in rows:
+        label = " / ".join(str(row[c]) for c in within) or "all"
+        mark = " *" if row["p"] < ALPHA else ""
+        print(f"   {label:30}{row['pairs']:7}{row['rate_a'] * 100:7.1f}%{row['rate_b'] * 100:7.1f}%"
+              f"{row['a_only']:8}{row['b_only']:8}{row['p']:9.4f}{mark}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pass rates, confidence intervals and paired tests over result files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    summary = sub.add_parser("summary", help="Pass rate per run and strategy")
+    summary.add_argument("files", nargs="+", help="Result files (.json or .jsonl)")
+    summary.add_argument("--by", nargs="*", default=[], choices=["dataset", "task"],
+                         help="Further break the rates down by these columns")
+
+    compare = sub.add_parser("compare", help="Paired comparison of two strategies within each run")
+    compare.add_argument("files", nargs="+", help="Result files (.json or .jsonl)")
+    compare.add_argument("--strategies", nargs=2, required=True, metavar=("A", "B"))
+    compare.add_argument("--by-dataset", action="store_true", help="One test per dataset")
+
+    diff = sub.add_parser("diff", help="Cross-run diff: rate changes, McNemar and flipped tasks")
+    diff.add_argument("old", help="Earlier results file")
+    diff.add_argument("new", help="Later results file")
+    diff.add_argument("--by-dataset", action="store_true", help="Break down per strategy and dataset")
+    diff.add_argument("--flips", action="store_true", help="List every task that was fixed or broken")
+
+    for p in (summary, compare, diff):
+        p.add_argument("--bootstrap", type=int, default=BOOTSTRAP_SAMPLES, help="Bootstrap resamples")
+        p.add_argument("--alpha", type=float, default=ALPHA, help="1 - confidence level")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        if args.command == "diff":
+            table = load_results([args.old, args.new], ["old", "new"])
+        else:
+            table = load_results(args.files)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ {e}")
+    print(f"🧮 {len(table)} results from {len(table.labels['run'])} run(s), "
+          f"{len(table.labels['task'])} tasks, {len(table.labels['strategy'])} strategies")
+
+    if args.command == "summary":
+        print_summary(table, ("run", "strategy", *args.by), args)
+    elif args.command == "compare":
+        a, b = args.strategies
+        within = ("run", "dataset") if args.by_dataset else ("run",)
+        try:
+            rows = mcnemar(table, "strategy", a, b, within)
+        except KeyError as e:
+            raise SystemExit(f"❌ {e.args[0]}")
+        print_mcnemar(rows, within, a, b)
+    else:
+        within = ("strategy", "dataset") if args.by_dataset else ("strategy",)
+        print_summary(table, ("run", *within), args)
+        print_mcnemar(mcnemar(table, "run", "old", "new", within), within, args.old, args.new)
+        changed = flips(table, "run", "old", "new", within)
+        fixed = sum(kind == "fixed" for _, _, kind in changed)
+        print(f"\n🔀 {fixed} tasks fixed, {len(changed) - fixed} broken")
+        if args.flips:
+            for label, task, kind in changed:
+                print(f"   {'✅' if kind == 'fixed' else '❌'} {' / '.join(label):30} {task}")
+
+
+if __name__ == "__main__":
+    main()
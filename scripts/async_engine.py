@@ -0,0 +1,197 @@
+"""
+async_engine.py - Concurrent API request engine
+---------------------------------
+Bounded in-flight requests with per-model RPM/TPM rate limits, plus retries,
+an AIMD concurrency limit and a circuit breaker (see resilience.py)
+---------------------------------
+"""
+
+import asyncio
+import time
+
+from resilience import AdaptiveLimit, CircuitOpenError, is_rate_limit
+from prompt_layout import message_text
+
+
+# Completion tokens reserved per choice before the response reports its real usage
+OUTPUT_TOKEN_ESTIMATE = 512
+
+
+# ---------------- Rate Limiting ---------------- #
+class RateLimiter:
+    """Token-bucket limiter for requests per minute and tokens per minute."""
+
+    def __init__(self, rpm: int = None, tpm: int = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm or 0)
+        self._tokens = float(tpm or 0)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.rpm and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60.0 / self.rpm)
+        if self.tpm and self._tokens < tokens:
+            wait = max(wait, (tokens - self._tokens) * 60.0 / self.tpm)
+        return wait
+
+    async def acquire(self, tokens: int = 0):
+        """Wait until one request and `tokens` tokens are available, then take them."""
+        if self.tpm:
+            # A single request larger than the bucket would otherwise wait forever
+            tokens = min(tokens, self.tpm)
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= tokens
+
+    def adjust(self, tokens: int = 0, requests: int = 0):
+        """Charge (positive) or refund (negative) budget after the fact, e.g. once
+        a response reports its real usage; refunds never overfill the bucket."""
+        self._refill()
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests - requests)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens - tokens)
+
+
+def estimate_tokens(request: dict) -> int:
+    """Token reservation for a chat request: prompt chars / 4 plus an expected
+    output of OUTPUT_TOKEN_ESTIMATE per choice (capped at max_tokens)."""
+    chars = sum(len(message_text(m)) for m in request.get("messages", []))
+    output = min(OUTPUT_TOKEN_ESTIMATE, request.get("max_tokens") or OUTPUT_TOKEN_ESTIMATE)
+    return chars // 4 + output * request.get("n", 1)
+
+
+# ---------------- Engine ---------------- #
+class AsyncEngine:
+    """Runs chat requests concurrently while keeping results in submission order.
+
+    `send` is a coroutine function taking a request dict and returning the
+    response; it is where the actual client call lives. With a `retry`
+    policy, failed calls are retried with backoff; 429s shrink the
+    concurrency limit (down to `min_concurrency`) and successes grow it back.
+    Requests reserve an estimate of their tokens (see estimate_tokens); with
+    `usage`, a function from a response to the tokens it really used, the
+    difference is charged or refunded afterwards.
+    """
+
+    def __init__(self, send, max_concurrency: int = 8, rate_limits: dict = None,
+                 retry=None, breaker=None, min_concurrency: int = 1, usage=None):
+        self.send = send
+        self.usage = usage
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.rate_limits = rate_limits or {}
+        self.retry = retry
+        self.breaker = breaker
+        self.retries = 0
+        self.rate_limited = 0
+        self._limiters = {}
+        self._limit = None
+
+    def _limiter(self, model: str) -> RateLimiter:
+        if model not in self._limiters:
+            limits = self.rate_limits.get(model, {})
+            self._limiters[model] = RateLimiter(limits.get("rpm"), limits.get("tpm"))
+        return self._limiters[model]
+
+    @property
+    def limit(self) -> AdaptiveLimit:
+        if self._limit is None:
+            self._limit = AdaptiveLimit(self.max_concurrency, self.min_concurrency)
+        return self._limit
+
+    async def _attempt(self, request: dict, **kwargs):
+        """One call inside a concurrency slot; returns (result, error).
+
+        The rate-limit wait comes first, so a request sleeping on the token
+        bucket holds neither a concurrency slot nor the breaker's probe.
+        """
+        limiter = self._limiter(request.get("model"))
+        reserved = estimate_tokens(request)
+        await limiter.acquire(reserved)
+        await self.limit.acquire()
+        result, error, sent = None, None, False
+        try:
+            if self.breaker is not None:
+                self.breaker.before_call()
+            sent = True
+            result = await self.send(request, **kwargs)
+        except Exception as e:
+            error = e
+        if not sent:
+            # Rejected by an open breaker: nothing reached the API
+            limiter.adjust(-reserved, requests=-1)
+        elif error is None and self.usage is not None:
+            used = self.usage(result)
+            if used is not None:
+                limiter.adjust(used - reserved)
+        if self.breaker is not None and not isinstance(error, CircuitOpenError):
+            if error is None:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure(error)
+        await self.limit.release(success=error is None,
+                                 rate_limited=error is not None and is_rate_limit(error))
+        return result, error
+
+    async def submit(self, request: dict, stats: dict = None, **kwargs):
+        """Send one request once a concurrency slot and rate-limit budget are free.
+
+        Retries taken are added to `stats["retries"]` when given; extra keyword
+        arguments are passed on to `send`.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            result, error = await self._attempt(request, **kwargs)
+            if error is None:
+                return result
+            self.rate_limited += int(is_rate_limit(error))
+            if self.retry is None or not self.retry.should_retry(attempt, error):
+                raise error
+            self.retries += 1
+            if stats is not None:
+                stats["retries"] = stats.get("retries", 0) + 1
+            await asyncio.sleep(self.retry.delay(attempt, error))
+
+    async def gather(self, requests: list) -> list:
+        """Submit all requests; failures are returned in place as exceptions."""
+        return await asyncio.gather(
+            *(self.submit(r) for r in requests), return_exceptions=True
+        )
+
+    def run(self, requests: list) -> list:
+        """Blocking entry point: results[i] corresponds to requests[i]."""
+        self._limit = None
+        self._limiters = {}
+        return asyncio.run(self.gather(requests))
+
+    def stats(self) -> dict:
+        return {
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "concurrency_limit": round(self.limit.limit, 2),
+            "lowest_limit": round(self.limit.lowest, 2),
+            "limit_decreases": self.limit.decreases,
+            "breaker_trips": self.breaker.trips if self.breaker is not None else 0,
+        }
@@ -0,0 +1,266 @@
+"""
+backends.py - Pluggable model backends
+---------------------------------
+One interface for every model source the harness can evaluate:
+
+  openai:MODEL            OpenAI chat completions (default for bare model names)
+  anthropic:MODEL         Anthropic messages API (default for claude-* names)
+  local:MODEL[@URL]       any OpenAI-compatible server (vLLM, llama.cpp, the mock server)
+  replay:PATH             recorded answers, e.g. pasted from a chat UI
+
+Each backend owns its client (and so its connection pool) and its rate
+limits; requests are always built in the OpenAI chat format and translated
+here. All backends feed the same grading pipeline. Both API backends
+mark the shared prompt prefix for the provider's prompt cache
+(prompt_layout.py) and report how much of it was read back.
+---------------------------------
+"""
+
+import os
+import json
+
+from call_metrics import cached_tokens
+from grade_cache import content_hash
+from prompt_layout import cache_breakpoints, message_text, prompt_cache_key
+from streaming import StreamAccumulator, stream_params
+
+
+# ---------------- Base ---------------- #
+class Backend:
+    """A model source. `complete` returns one text per requested choice."""
+
+    kind = "base"
+    # Responses are stored in the completion cache (replayed answers are not)
+    cacheable = True
+    # Can serve requests through the OpenAI Batch API (--batch)
+    supports_batch = False
+
+    def __init__(self, model: str, rate_limits: dict = None, max_concurrency: int = None):
+        self.model = model
+        self.rate_limits = rate_limits or {}
+        self.max_concurrency = max_concurrency
+
+    @property
+    def name(self) -> str:
+        """Label used in result file names and summaries."""
+        return self.model
+
+    async def complete(self, request: dict, call: dict = None, stream: bool = False,
+                       stop=None, context: dict = None) -> list:
+        """Answer one chat request; usage/timing go into `call` (see call_metrics.py).
+
+        `context` carries the unit's filename, strategy and dataset for
+        backends that need them (replay).
+        """
+        raise NotImplementedError
+
+    def recorded_answers(self, filename: str, strategies: tuple) -> str:
+        """Hash of the answers recorded ahead of time for a unit ("" for live
+        models), so editing them invalidates --incremental results."""
+        return ""
+
+
+# ---------------- OpenAI / OpenAI-compatible ---------------- #
+class OpenAIBackend(Backend):
+    kind = "openai"
+    supports_batch = True
+
+    def __init__(self, model: str, api_key: str = None, base_url: str = None, **kwargs):
+        super().__init__(model, **kwargs)
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        # None: the SDK falls back to OPENAI_BASE_URL
+        self.base_url = base_url
+        self._client = None
+
+    @property
+    def client(self):
+        # Created on first use so it binds to the running event loop
+        if self._client is None:
+            from openai import AsyncOpenAI
+            # Retries are handled by the engine (resilience.py), not the SDK
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    async def complete(self, request, call=None, stream=False, stop=None, context=None):
+        key = prompt_cache_key(request["messages"]) if self.kind == "openai" else None
+        if key is not None:
+            # Routes every strategy of a problem to the same cache shard
+            request = {**request, "extra_body": {**request.get("extra_body", {}), "prompt_cache_key": key}}
+        if stream:
+            acc = StreamAccumulator(request.get("n", 1), stop)
+            chunks = await self.client.chat.completions.create(**request, **stream_params())
+            try:
+                async for chunk in chunks:
+                    if acc.feed(chunk):
+                        break
+            finally:
+                await chunks.close()
+            if call is not None:
+                acc.fill_call(call, request)
+            return acc.contents()
+
+        response = await self.client.chat.completions.create(**request)
+        if call is not None and response.usage is not None:
+            call["prompt_tokens"] = response.usage.prompt_tokens
+            call["completion_tokens"] = response.usage.completion_tokens
+            call["cached_tokens"] = cached_tokens(response.usage)
+        return [choice.message.content.strip() for choice in response.choices]
+
+
+class LocalBackend(OpenAIBackend):
+    """OpenAI-compatible local server; no API key or Batch API needed."""
+
+    kind = "local"
+    supports_batch = False
+    DEFAULT_URL = "http://127.0.0.1:8000/v1"
+
+    def __init__(self, model: str, base_url: str = None, **kwargs):
+        kwargs.setdefault("api_key", os.environ.get("LOCAL_API_KEY", "local"))
+        super().__init__(model, base_url=base_url or os.environ.get("LOCAL_BASE_URL", self.DEFAULT_URL), **kwargs)
+
+    @property
+    def name(self) -> str:
+        return f"local_{self.model}"
+
+
+# ---------------- Anthropic ---------------- #
+def to_anthropic(request: dict) -> dict:
+    """Translate an OpenAI-style chat request into Messages API arguments."""
+    system = "\n\n".join(message_text(m) for m in request["messages"] if m["role"] == "system")
+    params = {
+        "model": request["model"],
+        "max_tokens": request.get("max_tokens", 4096),
+        "messages": cache_breakpoints([m for m in request["messages"] if m["role"] != "system"]),
+    }
+    if system:
+        params["system"] = system
+    if "temperature" in request:
+        params["temperature"] = min(request["temperature"], 1.0)
+    return params
+
+
+def anthropic_usage(usage) -> dict:
+    """Prompt/cached tokens of a Messages API usage object; cache reads and
+    writes are billed apart from `input_tokens`, so they are added back."""
+    read = getattr(usage, "cache_read_input_tokens", None) or 0
+    written = getattr(usage, "cache_creation_input_tokens", None) or 0
+    return {"prompt_tokens": usage.input_tokens + read + written, "cached_tokens": read}
+
+
+class AnthropicBackend(Backend):
+    kind = "anthropic"
+
+    def __init__(self, model: str, api_key: str = None, base_url: str = None, **kwargs):
+        super().__init__(model, **kwargs)
+        self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
+        self.base_url = base_url or os.environ.get("ANTHROPIC_BASE_URL")
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from anthropic import AsyncAnthropic
+            self._client = AsyncAnthropic(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    async def _one(self, params: dict, call: dict, stream: bool, stop, request: dict) -> str:
+        if not stream:
+            message = await self.client.messages.create(**params)
+            if call is not None:
+                usage = anthropic_usage(message.usage)
+                call["prompt_tokens"] = (call["prompt_tokens"] or 0) + usage["prompt_tokens"]
+                call["cached_tokens"] = (call["cached_tokens"] or 0) + usage["cached_tokens"]
+                call["completion_tokens"] = (call["completion_tokens"] or 0) + message.usage.output_tokens
+            return "".join(block.text for block in message.content if block.type == "text").strip()
+
+        acc = StreamAccumulator(1, stop)
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        events = await self.client.messages.create(**params, stream=True)
+        try:
+            async for event in events:
+                if event.type == "message_start":
+                    usage.update(anthropic_usage(event.message.usage))
+                elif event.type == "message_delta":
+                    usage["completion_tokens"] = event.usage.output_tokens
+                    acc.usage = dict(usage)
+                elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                    if acc.add(0, event.delta.text):
+                        break
+        finally:
+            await events.close()
+        if call is not None:
+            acc.fill_call(call, request)
+            # message_start's prompt usage is exact even if the stream stopped before message_delta
+            call.update(prompt_tokens=usage["prompt_tokens"], cached_tokens=usage["cached_tokens"])
+        return acc.contents()[0]
+
+    async def complete(self, request, call=None, stream=False, stop=None, context=None):
+        # The Messages API has no `n`; sampled choices are separate calls
+        params = to_anthropic(request)
+        if call is not None:
+            call["prompt_tokens"] = call["completion_tokens"] = call["cached_tokens"] = None
+        return [await self._one(params, call, stream, stop, request) for _ in range(request.get("n", 1))]
+
+
+# ---------------- Replay ---------------- #
+class ReplayBackend(Backend):
+    """Answers from a JSONL file instead of a model.
+
+    Each line has `filename`, an optional `strategy` (omitted: used for every
+    strategy) and the answer as `response` or `code`, so result files from
+    earlier runs can be replayed as-is. eval_claude.py --save writes this format.
+    """
+
+    kind = "replay"
+    cacheable = False
+
+    def __init__(self, path: str, model: str = None, **kwargs):
+        super().__init__(model or os.path.splitext(os.path.basename(path))[0], **kwargs)
+        self.path = path
+        self.answers = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                answer = row.get("response", row.get("code"))
+                if answer is not None:
+                    self.answers[(row["filename"], row.get("strategy"))] = answer
+
+    @property
+    def name(self) -> str:
+        return f"replay_{self.model}"
+
+    def answer(self, filename: str, strategy: str) -> str:
+        """The recorded answer for a unit (or for every strategy of its file); None if missing."""
+        return self.answers.get((filename, strategy), self.answers.get((filename, None)))
+
+    def recorded_answers(self, filename, strategies):
+        return content_hash(*(json.dumps(self.answer(filename, s)) for s in strategies))
+
+    async def complete(self, request, call=None, stream=False, stop=None, context=None):
+        context = context or {}
+        filename, strategy = context.get("filename"), context.get("strategy")
+        answer = self.answer(filename, strategy)
+        if answer is None:
+            raise KeyError(f"No recorded answer for {filename} [{strategy}] in {self.path}")
+        return [answer] * request.get("n", 1)
+
+
+# ---------------- Spec Parsing ---------------- #
+def parse_backend(spec: str, rate_limits: dict = None) -> Backend:
+    """Build a backend from `kind:model` (see module docstring); bare names pick by prefix."""
+    kind, _, rest = spec.partition(":")
+    if not rest:
+        kind, rest = ("anthropic" if spec.startswith("claude") else "openai"), spec
+    limits = (rate_limits or {}).get(rest.split("@")[0], {})
+    if kind == "openai":
+        return OpenAIBackend(rest, rate_limits=limits)
+    if kind == "anthropic":
+        return AnthropicBackend(rest, rate_limits=limits)
+    if kind == "local":
+        model, _, url = rest.partition("@")
+        return LocalBackend(model, base_url=url or None, rate_limits=limits)
+    if kind == "replay":
+        return ReplayBackend(rest)
+    raise ValueError(f"Unknown backend kind {kind!r} in {spec!r}")
@@ -0,0 +1,118 @@
+"""
+batch_mode.py - Batch API submission for offline sweeps
+---------------------------------
+Serializes pending requests into a batch JSONL file, submits it to the
+provider's batch endpoint, polls until it finishes, and stores the answers
+in the completion cache so the normal pipeline grades them without any
+further API calls
+---------------------------------
+"""
+
+import os
+import json
+import time
+
+from completion_cache import CompletionCache, pack_choices
+
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def write_batch_file(items: list, path: str) -> str:
+    """Write (custom_id, request) pairs in the batch input format."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for custom_id, request in items:
+            f.write(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": request,
+            }, ensure_ascii=False) + "\n")
+    return path
+
+
+def submit_batch(client, path: str):
+    """Upload the batch file and create the batch job."""
+    with open(path, "rb") as f:
+        batch_file = client.files.create(file=f, purpose="batch")
+    return client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+
+
+def wait_for_batch(client, batch_id: str, poll_interval: float = 30.0, timeout: float = None):
+    """Poll until the batch reaches a terminal status."""
+    started = time.monotonic()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        if timeout is not None and time.monotonic() - started > timeout:
+            raise TimeoutError(f"Batch {batch_id} still {batch.status} after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def read_batch_output(client, batch) -> dict:
+    """Map custom_id -> packed cache value (or an Exception for failed lines)."""
+    results = {}
+    for file_id in (batch.output_file_id, getattr(batch, "error_file_id", None)):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            response = row.get("response") or {}
+            if row.get("error") or response.get("status_code", 200) != 200:
+                results[row["custom_id"]] = RuntimeError(str(row.get("error") or response.get("body")))
+            else:
+                body = response["body"]
+                usage = body.get("usage") or {}
+                results[row["custom_id"]] = pack_choices(
+                    [c["message"]["content"].strip() for c in body["choices"]],
+                    {k: usage[k] for k in ("prompt_tokens", "completion_tokens") if k in usage},
+                )
+    return results
+
+
+def run_batch(client, units: list, cache: CompletionCache, batch_dir: str,
+              poll_interval: float = 30.0, timeout: float = None) -> dict:
+    """Fill the cache for all uncached (strategy, request) units via one batch job.
+
+    Custom ids are the cache keys, so identical requests are sent once and
+    answers land exactly where the pipeline looks for them.
+    """
+    pending = {}
+    for strategy, request in units:
+        key = CompletionCache.make_key(request, strategy)
+        if key not in pending and key not in cache:
+            pending[key] = request
+
+    summary = {"pending": len(pending), "completed": 0, "failed": 0, "batch_id": None}
+    if not pending:
+        return summary
+
+    path = os.path.join(batch_dir, f"batch_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+    write_batch_file(list(pending.items()), path)
+    batch = submit_batch(client, path)
+    summary["batch_id"] = batch.id
+    print(f"📦 Submitted batch {batch.id} with {len(pending)} requests ({path})")
+
+    batch = wait_for_batch(client, batch.id, poll_interval, timeout)
+    print(f"📦 Batch {batch.id} finished: {batch.status}")
+    if batch.status != "completed":
+        return summary
+
+    for key, value in read_batch_output(client, batch).items():
+        if key not in pending:
+            continue
+        if isinstance(value, Exception):
+            summary["failed"] += 1
+        else:
+            cache.put(key, value)
+            summary["completed"] += 1
+    return summary
@@ -0,0 +1,358 @@
+"""
+bench_harness.py - Benchmarks for the evaluation harness itself
+---------------------------------
+Measures how fast the harness is, not how good the model is:
+
+  clean_code     responses cleaned per second, over the stored result files
+  grade_*        synthetic HumanEval/MBPP/APPS candidates graded per second,
+                 in-process and through the sandbox pool: persistent workers,
+                 a forked child per candidate (zygote) and a fresh process per
+                 candidate
+  e2e            eval_gpt.py units per second against the mock LLM server
+
+Results are written as JSON and compared with a stored baseline; a metric
+more than --tolerance worse than its baseline is reported as a regression
+(exit code 1):
+
+    python scripts/bench_harness.py --out bench.json
+    python scripts/bench_harness.py --save-baseline      # after an intended change
+---------------------------------
+"""
+
+import os
+import sys
+import re
+import json
+import glob
+import time
+import shutil
+import argparse
+import itertools
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+import graders
+from sandbox import SandboxPool
+
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPTS_DIR)
+BASELINE_PATH = os.path.join(REPO_DIR, "results", "bench_baseline.json")
+CORPUS_GLOB = os.path.join(REPO_DIR, "results", "results_*.json")
+
+MIN_SECONDS = 0.5      # each timed round runs at least this long
+ROUNDS = 5             # best round is reported
+SYNTHETIC_TASKS = 200
+TESTS_PER_TASK = 20
+TOLERANCE = 0.20       # relative slowdown tolerated before flagging a regression
+
+# metric -> (unit, higher is better)
+METRICS = {
+    "clean_code": ("responses/s", True),
+    "clean_code_legacy": ("responses/s", True),
+    "clean_code_long": ("responses/s", True),
+    "clean_code_long_legacy": ("responses/s", True),
+    "clean_code_agreement": ("fraction", True),
+    "grade_humaneval": ("programs/s", True),
+    "grade_mbpp": ("programs/s", True),
+    "grade_apps": ("programs/s", True),
+    "grade_sandbox": ("programs/s", True),
+    "grade_sandbox_fork": ("programs/s", True),
+    "grade_sandbox_spawn": ("programs/s", True),
+    "e2e_units_per_second": ("units/s", True),
+    "e2e_wall_seconds": ("s", False),
+}
+
+
+# ---------------- Timing ---------------- #
+def best_rate(fn, items: int, min_seconds: float = MIN_SECONDS, rounds: int = ROUNDS) -> float:
+    """Best items/second over `rounds`; `fn()` processes `items` items and is
+    repeated within a round until it has run for `min_seconds`."""
+    best = 0.0
+    for _ in range(rounds):
+        done, started = 0, time.perf_counter()
+        while True:
+            fn()
+            done += items
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_seconds:
+                break
+        best = max(best, done / elapsed)
+    return best
+
+
+# ---------------- Corpus ---------------- #
+def load_corpus(pattern: str = CORPUS_GLOB) -> list:
+    """Raw model responses stored in result files (pretty JSON or JSONL)."""
+    responses = []
+    for path in sorted(glob.glob(pattern)) + sorted(glob.glob(os.path.splitext(pattern)[0] + ".jsonl")):
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                records = [json.loads(line) for line in f if line.strip()]
+            else:
+                records = json.load(f)
+        for record in records:
+            for result in record.get("strategies", {"": record}).values():
+                if isinstance(result, dict) and result.get("code"):
+                    responses.append(result["code"])
+    return responses
+
+
+def long_responses(count: int = 50, steps: int = 40) -> list:
+    """(response, entry point) pairs in chain-of-thought style: long prose,
+    the solution, then a usage block."""
+    responses = []
+    for i in range(count):
+        prose = "\n".join(f"Step {k}: consider case {k} of the input and note the expected output." for k in range(steps))
+        responses.append((
+            f"Let's think step by step.\n{prose}\n\n```python\ndef solve_{i}(xs):\n"
+            f"    return sorted(xs)[::-1]\n```\n\nExample usage:\n\n```python\nprint(solve_{i}([3, 1, 2]))\n```\n"
+            + "The function sorts the list and reverses it. " * steps,
+            f"solve_{i}",
+        ))
+    return responses
+
+
+def legacy_clean_code(code: str) -> str:
+    """clean_code before the single-pass extractor (regex + line scan), kept as a reference."""
+    # Method 1: Find code blocks
+    code_block_pattern = r'```(?:python)?\s*\n(.*?)\n```'
+    matches = re.findall(code_block_pattern, code, re.DOTALL)
+    
+    if matches:
+        return matches[-1].strip()
+    
+    # Method 2: Extract lines starting with def/import
+    lines = code.split('\n')
+    code_lines = []
+    in_code = False
+    
+    for line in lines:
+        stripped = line.strip()
+        
+        # Skip markdown and explanation text
+        if stripped.startswith('#') and any(word in stripped for word in ['Step', 'Plan', 'Example', 'Note']):
+            continue
+        if any(stripped.startswith(prefix) for prefix in ['##', '###', '**', 'To solve', 'Let\'s', 'Here\'s', 'Now,', 'The function', 'This implementation', 'CRITICAL']):
+            continue
+        
+        # Detect code start
+        if stripped.startswith(('def ', 'import ', 'from ', 'class ')):
+            in_code = True
+        
+        # Collect code lines
+        if in_code:
+            # Stop at explanation text
+            if stripped and not stripped.startswith(('#', 'def', 'import', 'from', 'class', ' ', '\t', '@')) and \
+               any(keyword in stripped.lower() for keyword in ['example usage', 'test case', 'output:', 'expected', 'explanation', 'mental', 'note:']):
+                break
+            code_lines.append(line)
+    
+    if code_lines:
+        return '\n'.join(code_lines).strip()
+    
+    return code.strip()
+
+
+def bench_clean_code(corpus: list) -> dict:
+    # clean_code directly: the memoized wrapper would time cache lookups
+    long = long_responses()
+    return {
+        "clean_code": best_rate(lambda: [graders.clean_code(r) for r in corpus], len(corpus)),
+        "clean_code_legacy": best_rate(lambda: [legacy_clean_code(r) for r in corpus], len(corpus)),
+        "clean_code_long": best_rate(lambda: [graders.clean_code(r, e) for r, e in long], len(long)),
+        "clean_code_long_legacy": best_rate(lambda: [legacy_clean_code(r) for r, _ in long], len(long)),
+        # Share of stored responses both extractors clean identically
+        "clean_code_agreement": sum(graders.clean_code(r) == legacy_clean_code(r) for r in corpus) / max(1, len(corpus)),
+    }
+
+
+# ---------------- Synthetic Problems ---------------- #
+def synthetic_tasks(dataset: str, count: int = SYNTHETIC_TASKS, tests: int = TESTS_PER_TASK) -> list:
+    """(problem, correct response) pairs with a distinct entry point each.
+
+    Responses contain a `{run}` placeholder; filling it with a new value per
+    pass makes every program new to the clean/compile caches, as candidates
+    from a real run are (test code stays cached, as it does across strategies).
+    """
+    tasks = []
+    for i in range(count):
+        name = f"add_{dataset.lower()}_{i}"
+        if dataset == "APPS":
+            response = f"```python\n# {{run}}\ndef {name}(pair):\n    return pair[0] + pair[1]\n```"
+            data = {"entry_point": name,
+                    "inputs": [[repr([j, i])] for j in range(tests)],
+                    "outputs": [[j + i] for j in range(tests)]}
+        else:
+            response = f"```python\n# {{run}}\ndef {name}(a, b):\n    return a + b\n```"
+            asserts = [f"assert {{f}}({j}, {i}) == {j + i}" for j in range(tests)]
+            if dataset == "HumanEval":
+                body = "\n".join("    " + a.format(f="candidate") for a in asserts)
+                data = {"entry_point": name, "test": f"def check(candidate):\n{body}\n"}
+            else:
+                data = {"entry_point": name, "test_list": [a.format(f=name) for a in asserts]}
+        tasks.append((data, response))
+    return tasks
+
+
+def bench_grading(count: int = SYNTHETIC_TASKS, workers: int = None) -> dict:
+    results = {}
+    for dataset in ("HumanEval", "MBPP", "APPS"):
+        tasks = synthetic_tasks(dataset, count)
+
+        def grade_all(runs=itertools.count()):
+            run = next(runs)
+            for data, response in tasks:
+                passed, error = graders.grade_code(data, dataset, response.format(run=run))
+                if not passed:
+                    raise RuntimeError(f"Synthetic {dataset} task failed: {error}")
+
+        results[f"grade_{dataset.lower()}"] = best_rate(grade_all, len(tasks))
+
+    # Same MBPP programs through worker processes (IPC + isolation overhead included)
+    tasks = synthetic_tasks("MBPP", count)
+    runs = itertools.count()
+
+    def grade_jobs():
+        run = next(runs)
+        return [(data, "MBPP", response.format(run=run)) for data, response in tasks]
+
+    variants = {
+        "grade_sandbox": {},
+        # Warm parent with the tests precompiled, one copy-on-write child per candidate
+        "grade_sandbox_fork": {"fork_per_candidate": True, "fixtures": [(data, "MBPP") for data, _ in tasks]},
+        # A new interpreter per candidate: what per-candidate isolation costs without the zygote
+        "grade_sandbox_spawn": {"max_tasks_per_worker": 1},
+    }
+    for name, options in variants.items():
+        with SandboxPool(workers, **options) as pool:
+            pool.grade_many(grade_jobs()[:pool.workers])  # warm up the workers
+            jobs = tasks if name != "grade_sandbox_spawn" else tasks[:max(20, len(tasks) // 10)]
+            results[name] = best_rate(lambda: pool.grade_many(grade_jobs()[:len(jobs)]), len(jobs), rounds=3)
+    return results
+
+
+# ---------------- End to End ---------------- #
+def bench_e2e(latency: float, concurrency: int, problems_dir: str, prose_words: int = 0) -> dict:
+    """Run eval_gpt.py (no cache) against an in-process mock server in a scratch dir."""
+    from mock_llm_server import start_in_thread
+
+    server, base_url = start_in_thread(latency=latency, prose_words=prose_words)
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    try:
+        os.symlink(os.path.abspath(problems_dir), os.path.join(workdir, "problems"))
+        env = dict(os.environ, OPENAI_API_KEY="bench", OPENAI_BASE_URL=base_url)
+        # A local backend has no RATE_LIMITS entry, so the limiter does not pace the run
+        cmd = [sys.executable, os.path.join(SCRIPTS_DIR, "eval_gpt.py"), "--no-cache",
+               "--concurrency", str(concurrency), "--models", f"local:mock@{base_url}"]
+        started = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - started
+        if proc.returncode != 0:
+            raise RuntimeError(f"eval_gpt.py failed:\n{proc.stderr[-2000:]}")
+        units = 0
+        for path in glob.glob(os.path.join(workdir, "results_*.jsonl")):
+            with open(path, "r", encoding="utf-8") as f:
+                units += sum(1 for line in f if line.strip())
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"e2e_units_per_second": units / wall, "e2e_wall_seconds": wall}
+
+
+# ---------------- Baseline Comparison ---------------- #
+def compare(current: dict, baseline: dict, tolerance: float = TOLERANCE) -> list:
+    """(metric, baseline, current, relative change, regressed) for metrics in both.
+
+    The relative change is signed so that positive always means better.
+    """
+    rows = []
+    for name, value in current.items():
+        base = baseline.get(name)
+        if base in (None, 0) or name not in METRICS:
+            continue
+        higher_is_better = METRICS[name][1]
+        change = (value - base) / base if higher_is_better else (base - value) / base
+        rows.append((name, base, value, change, change < -tolerance))
+    return rows
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation harness.")
+    parser.add_argument("--only", nargs="+", choices=["clean_code", "grading", "e2e"],
+                        default=["clean_code", "grading", "e2e"])
+    parser.add_argument("--out", help="Write results as JSON here")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--tasks", type=int, default=SYNTHETIC_TASKS, help="Synthetic problems per dataset")
+    parser.add_argument("--grade-workers", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock LLM latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--prose", type=int, default=0, help="Mock LLM prose words after the code")
+    parser.add_argument("--problems", default=os.path.join(REPO_DIR, "problems"))
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    metrics = {}
+    if "clean_code" in args.only:
+        corpus = load_corpus()
+        print(f"🧹 clean_code over {len(corpus)} stored responses...")
+        metrics.update(bench_clean_code(corpus))
+    if "grading" in args.only:
+        print(f"🧪 Grading {args.tasks} synthetic tasks per dataset...")
+        metrics.update(bench_grading(args.tasks, args.grade_workers))
+    if "e2e" in args.only:
+        print(f"🚀 End to end against the mock server (latency={args.latency}s, concurrency={args.concurrency})...")
+        metrics.update(bench_e2e(args.latency, args.concurrency, args.problems, args.prose))
+
+    report = {"environment": environment(), "metrics": metrics}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("metrics", {})
+    rows = {name: row for name, *row in compare(metrics, baseline, args.tolerance)}
+
+    print("\n" + "="*70)
+    print(f"   {'metric':24}{'current':>14}{'baseline':>14}{'change':>10}")
+    for name, value in metrics.items():
+        unit = METRICS[name][0]
+        if name in rows:
+            base, _, change, regressed = rows[name]
+            flag = "  ❌ regression" if regressed else ""
+            print(f"   {name:24}{value:14.2f}{base:14.2f}{change:+9.1%}{flag}  {unit}")
+        else:
+            print(f"   {name:24}{value:14.2f}{'-':>14}{'':>10}  {unit}")
+    print("="*70)
+
+    regressions = [name for name, row in rows.items() if row[3]]
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"⚠️  {len(regressions)} metric(s) regressed more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    elif baseline:
+        print(f"✅ No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+call_metrics.py - Per-call token/latency instrumentation
+---------------------------------
+One record per model call (cache hits included): prompt/completion tokens,
+prompt tokens the provider served from its prompt cache, time to first
+token, latency, time spent queued behind the concurrency and rate limits,
+retries and cache outcome. Records are stored with each strategy result,
+summarized as latency percentiles and tokens per pass, and exported as
+Prometheus text or CSV
+---------------------------------
+"""
+
+import os
+import csv
+import threading
+
+
+CALL_FIELDS = ("cache", "prompt_tokens", "completion_tokens", "cached_tokens", "ttft_seconds",
+               "latency_seconds", "queue_seconds", "retries", "stopped_early")
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def new_call(cache: str, usage: dict = None) -> dict:
+    """Empty call record; token counts come from the API (or the cached copy of it)."""
+    usage = usage or {}
+    return {
+        "cache": cache,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        # Prompt tokens read from the provider's prompt cache (API calls only)
+        "cached_tokens": None,
+        "ttft_seconds": None,
+        "latency_seconds": 0.0,
+        "queue_seconds": 0.0,
+        "retries": 0,
+        "stopped_early": False,
+    }
+
+
+def usage_dict(usage) -> dict:
+    """Plain dict of an SDK usage object (None-safe)."""
+    if usage is None:
+        return {}
+    return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens,
+            "cached_tokens": cached_tokens(usage)}
+
+
+def cached_tokens(usage) -> int:
+    """OpenAI-style usage.prompt_tokens_details.cached_tokens (None if not reported)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens")
+    return getattr(details, "cached_tokens", None)
+
+
+def percentile(values: list, q: float) -> float:
+    """Linear-interpolated percentile of `values` (q in [0, 1])."""
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+class CallMetrics:
+    """Call records of a run, each tagged with strategy, dataset and outcome."""
+
+    def __init__(self):
+        self.rows = []
+        self._lock = threading.Lock()
+
+    def add(self, call: dict, strategy: str, dataset: str, passed: bool):
+        if not call:
+            return
+        with self._lock:
+            self.rows.append({"strategy": strategy, "dataset": dataset, "passed": passed, **call})
+
+    def by_strategy(self) -> dict:
+        """strategy -> summary with latency percentiles (API calls only) and token totals."""
+        groups = {}
+        for row in self.rows:
+            groups.setdefault(row["strategy"], []).append(row)
+
+        summary = {}
+        for strategy, rows in groups.items():
+            api = [r for r in rows if r["cache"] == "miss"]
+            latencies = [r["latency_seconds"] for r in api]
+            ttfts = [r["ttft_seconds"] for r in api if r["ttft_seconds"] is not None]
+            tokens = sum((r["prompt_tokens"] or 0) + (r["completion_tokens"] or 0) for r in rows)
+            # Calls whose provider reported prompt caching at all
+            reported = [r for r in api if r.get("cached_tokens") is not None]
+            passed = sum(r["passed"] for r in rows)
+            summary[strategy] = {
+                "calls": len(rows),
+                "api_calls": len(api),
+                "cache_hits": len(rows) - len(api),
+                "retries": sum(r["retries"] for r in rows),
+                "early_stops": sum(bool(r.get("stopped_early")) for r in rows),
+                "prompt_tokens": sum(r["prompt_tokens"] or 0 for r in rows),
+                "completion_tokens": sum(r["completion_tokens"] or 0 for r in rows),
+                "cached_tokens": sum(r["cached_tokens"] for r in reported),
+                "cacheable_prompt_tokens": sum(r["prompt_tokens"] or 0 for r in reported),
+                "latency": {q: percentile(latencies, q) for q in QUANTILES},
+                "ttft": {q: percentile(ttfts, q) for q in QUANTILES},
+                "latency_sum": sum(latencies),
+                "passed": passed,
+                "tokens_per_pass": tokens / passed if passed else None,
+            }
+        return summary
+
+    # ---- Export ----
+    def write_csv(self, path: str):
+        columns = ("strategy", "dataset", "passed") + CALL_FIELDS
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+    def write_prometheus(self, path: str, model: str):
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list):
+            """samples: (labels, value) or (suffix, labels, value) for summary _sum/_count."""
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                suffix, labels, value = sample if len(sample) == 3 else ("", *sample)
+                if value is None:
+                    continue
+                label_text = ",".join(f'{k}="{v}"' for k, v in {"model": model, **labels}.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}")
+
+        summary = self.by_strategy()
+        latency = []
+        for strategy, s in summary.items():
+            latency += [({"strategy": strategy, "quantile": q}, s["latency"][q]) for q in QUANTILES]
+            latency += [("_sum", {"strategy": strategy}, s["latency_sum"]),
+                        ("_count", {"strategy": strategy}, s["api_calls"])]
+        metric("llm_call_latency_seconds", "summary", "API call latency (cache misses).", latency)
+        metric("llm_calls_total", "counter", "Model calls by cache outcome.",
+               [({"strategy": k, "cache": "hit"}, s["cache_hits"]) for k, s in summary.items()]
+               + [({"strategy": k, "cache": "miss"}, s["api_calls"]) for k, s in summary.items()])
+        metric("llm_call_retries_total", "counter", "Retries taken by the client.",
+               [({"strategy": k}, s["retries"]) for k, s in summary.items()])
+        metric("llm_tokens_total", "counter", "Tokens spent, including cached responses.",
+               [({"strategy": k, "kind": "prompt"}, s["prompt_tokens"]) for k, s in summary.items()]
+               + [({"strategy": k, "kind": "completion"}, s["completion_tokens"]) for k, s in summary.items()])
+        metric("llm_cached_prompt_tokens_total", "counter", "Prompt tokens served from the provider's prompt cache.",
+               [({"strategy": k}, s["cached_tokens"]) for k, s in summary.items()])
+        metric("llm_tokens_per_pass", "gauge", "Tokens spent per passing result.",
+               [({"strategy": k}, s["tokens_per_pass"]) for k, s in summary.items()])
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def export(self, path: str, model: str):
+        """Write CSV for a .csv path, Prometheus text format otherwise."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if path.endswith(".csv"):
+            self.write_csv(path)
+        else:
+            self.write_prometheus(path, model)
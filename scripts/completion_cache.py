@@ -0,0 +1,123 @@
+"""
+completion_cache.py - Persistent completion cache
+---------------------------------
+SQLite store of model responses keyed by a hash of the exact request payload
+---------------------------------
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+def pack_choices(contents: list, usage: dict = None) -> dict:
+    """Cache value for a response; single answers keep the plain {"content"} shape.
+
+    `usage` (prompt/completion tokens) is kept so cached re-runs still report cost.
+    """
+    value = {"content": contents[0]} if len(contents) == 1 else {"choices": contents}
+    if usage:
+        value["usage"] = usage
+    return value
+
+
+def unpack_choices(value: dict) -> list:
+    return value["choices"] if "choices" in value else [value["content"]]
+
+
+class CompletionCache:
+    """Content-addressed cache of API responses with age/size eviction."""
+
+    def __init__(self, path: str, max_age_days: float = 30, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(request: dict, strategy: str = "") -> str:
+        """Hash of the canonical JSON payload plus the strategy name."""
+        payload = json.dumps({"strategy": strategy, "request": request}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def __contains__(self, key: str) -> bool:
+        """Check for a live entry without touching the hit/miss counters."""
+        with self._lock:
+            row = self._conn.execute("SELECT created FROM completions WHERE key = ?", (key,)).fetchone()
+        return row is not None and not (self.max_age and time.time() - row[0] > self.max_age)
+
+    def put(self, key: str, value):
+        """Store a JSON-serializable value under `key`."""
+        text = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, text, len(text.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+
+    def evict(self):
+        """Drop expired entries, then least-recently-used ones until under max_bytes."""
+        with self._lock:
+            if self.max_age:
+                self._conn.execute("DELETE FROM completions WHERE created < ?", (time.time() - self.max_age,))
+            if self.max_bytes:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+                if total > self.max_bytes:
+                    rows = self._conn.execute("SELECT key, size FROM completions ORDER BY accessed").fetchall()
+                    stale = []
+                    for key, size in rows:
+                        if total <= self.max_bytes:
+                            break
+                        stale.append((key,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM completions WHERE key = ?", stale)
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
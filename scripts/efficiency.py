@@ -0,0 +1,464 @@
+"""
+efficiency.py - Runtime-efficiency scoring against the reference solution
+---------------------------------
+Pass/fail says nothing about speed: an O(n^2) `count_up_to` passes like a
+sieve. For each passing candidate this runs the candidate and the problem's
+reference (`canonical_solution`, or `code` for MBPP) on the test inputs
+scaled up until the reference takes about TARGET_SECONDS. It then reports
+the ratio of median CPU time and of peak traced memory (candidate /
+reference, so > 1 is worse). Tasks whose reference never reaches the target
+(inputs that cannot be scaled, e.g. APPS stdin text) are marked
+`uncalibrated` and left out of the summary: their ratios are timer noise.
+
+Timings come from one worker process pinned to a single CPU. Each program
+gets a warmup pass, enough loops per repeat to outlast the clock's noise,
+and several repeats (more while the spread is high). The program is
+re-executed before every repeat so memoization cannot carry over, and GC
+is off while the clock runs.
+
+    python scripts/efficiency.py results_gpt_4o_X.jsonl   # writes results_gpt_4o_X_efficiency.jsonl
+---------------------------------
+"""
+
+import os
+import gc
+import ast
+import copy
+import math
+import time
+import argparse
+import textwrap
+import tracemalloc
+
+from graders import defines, parses, entry_point_of, load_function, parsed_inputs, program_of
+from grade_cache import content_hash
+from call_metrics import percentile
+from results_io import read_jsonl, unit_key, write_jsonl
+from sandbox import CRASH, FAILED, OOM, TIMEOUT, Worker, isolate, mp_context, set_cpu_limit
+
+
+# Scale the test inputs (x SCALE_STEP each probe) until one reference pass takes this long
+TARGET_SECONDS = 0.05
+SCALE_STEP = 4
+MAX_SCALE = 4096
+# Repeats per program: at least MIN_REPEATS, up to MAX_REPEATS while the spread is high
+REPEATS = 7
+MIN_REPEATS = 3
+MAX_REPEATS = 21
+STABLE_SPREAD = 0.05
+WARMUP = 1
+# One repeat runs the inputs enough times to last at least this long (inputs are
+# copied per loop up front, hence the cap)
+MIN_REPEAT_SECONDS = 0.05
+MAX_LOOPS = 1000
+# CPU seconds a measurement may spend in total (fewer repeats for slow programs)
+MEASURE_BUDGET = 10.0
+PROBE_TIMEOUT = 5.0
+MEASURE_TIMEOUT = 60.0
+MEMORY_MB = 2048
+# Peaks below this are noise; floors the memory ratio's denominator
+MEMORY_FLOOR = 1024
+# Candidates this much slower than the reference are flagged in the summary
+SLOW_RATIO = 2.0
+DATASETS = ("HumanEval", "MBPP", "APPS")
+
+
+# ---------------- Reference and Inputs ---------------- #
+def reference_program(data, dataset: str) -> str:
+    """The reference as a runnable program defining the entry point, or None.
+
+    HumanEval's canonical_solution is usually just the body, so it is placed
+    under the prompt's signature.
+    """
+    source = data.get("code") if dataset == "MBPP" else data.get("canonical_solution")
+    entry_point = entry_point_of(data)
+    if not source or not entry_point:
+        return None
+    tree = parses(source)
+    if tree is not None and defines(tree, entry_point):
+        return source
+    body = textwrap.indent(textwrap.dedent(source).strip("\n"), "    ")
+    program = data["prompt"].rstrip() + "\n" + body + "\n"
+    return program if parses(program) is not None else None
+
+
+def _literal_calls(source: str, name: str) -> list:
+    """Argument tuples of every call to `name` in `source` with literal arguments."""
+    tree = parses(source)
+    calls = []
+    if tree is None:
+        return calls
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name):
+            continue
+        if node.keywords or any(isinstance(arg, ast.Starred) for arg in node.args):
+            continue
+        try:
+            args = tuple(ast.literal_eval(arg) for arg in node.args)
+        except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+            continue
+        if args not in calls:
+            calls.append(args)
+    return calls
+
+
+def test_calls(data, dataset: str) -> list:
+    """Argument tuples the tests call the entry point with."""
+    if dataset == "HumanEval":
+        return _literal_calls(data.get("test", ""), "candidate")
+    if dataset == "MBPP":
+        return _literal_calls("\n".join(data.get("test_list", [])), entry_point_of(data))
+    if dataset == "APPS" and data.get("inputs"):
+        # run_apps passes each input as the only argument
+        return [(value,) for value in parsed_inputs(data["inputs"])]
+    return []
+
+
+def stdin_style(data, dataset: str, calls: list) -> bool:
+    """APPS input given as one text block (a count line, then data): repeating it
+    yields malformed input, so its strings are not scaled."""
+    if dataset != "APPS":
+        return False
+    return entry_point_of(data) is None or any(isinstance(arg, str) and "\n" in arg
+                                               for args in calls for arg in args)
+
+
+def scale_value(value, factor: int, strings: bool = True):
+    """Grow one argument: sizes and counts x factor, elements left as they are."""
+    if isinstance(value, bool) or factor == 1:
+        return value
+    if isinstance(value, int):
+        # 0/1 are usually flags or base cases, not sizes
+        return value * factor if abs(value) >= 2 else value
+    if isinstance(value, str):
+        return value * factor if strings else value
+    if isinstance(value, (list, tuple)):
+        return value * factor
+    return value
+
+
+def scale_calls(calls: list, factor: int, strings: bool = True) -> list:
+    """Scale every argument of every call by the same factor, so a list and its
+    length argument (MBPP's find_Product(arr, n)) stay consistent."""
+    return [tuple(scale_value(arg, factor, strings) for arg in args) for args in calls]
+
+
+# ---------------- Profiling Worker ---------------- #
+def _timed_pass(func, batch: list) -> tuple:
+    # Wall clock: used only to size the measurement, and reliable on a fresh process
+    start = time.perf_counter()
+    outputs = [func(*args) for args in batch]
+    return time.perf_counter() - start, outputs
+
+
+def _profile(program: str, entry_point: str, calls: list, repeats: int, budget: float) -> dict:
+    """Time `entry_point` over `calls`; repeats=0 only probes (one pass)."""
+    first, outputs = _timed_pass(load_function(program, entry_point), copy.deepcopy(calls))
+    result = {"outputs": content_hash(repr(outputs)), "first_seconds": first}
+    if not repeats:
+        return result
+
+    for _ in range(WARMUP):
+        _timed_pass(load_function(program, entry_point), copy.deepcopy(calls))
+    # Autorange: enough loops per repeat to dwarf the clock resolution
+    loops = 1 if first >= MIN_REPEAT_SECONDS else min(MAX_LOOPS, math.ceil(MIN_REPEAT_SECONDS / max(first, 1e-7)))
+    cap = max(MIN_REPEATS, min(MAX_REPEATS, int(budget / max(first * loops, 1e-9))))
+    times, walls = [], []
+    while len(times) < min(repeats, cap) or (len(times) < cap and _spread(times) > STABLE_SPREAD):
+        # Fresh program (no carried-over caches) and fresh inputs, prepared off the clock
+        func = load_function(program, entry_point)
+        batches = [copy.deepcopy(calls) for _ in range(loops)]
+        gc.disable()
+        try:
+            start, wall = time.process_time(), time.perf_counter()
+            for batch in batches:
+                for args in batch:
+                    func(*args)
+            times.append((time.process_time() - start) / loops)
+            walls.append((time.perf_counter() - wall) / loops)
+        finally:
+            gc.enable()
+
+    func = load_function(program, entry_point)
+    batch = copy.deepcopy(calls)
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        for args in batch:
+            func(*args)
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+    result.update({
+        "cpu_seconds": percentile(times, 0.5),
+        "wall_seconds": percentile(walls, 0.5),
+        "spread": round(_spread(times), 4),
+        "repeats": len(times),
+        "loops": loops,
+        "peak_bytes": max(peak, 0),
+    })
+    return result
+
+
+def _spread(times: list) -> float:
+    """Interquartile range relative to the median."""
+    if len(times) < MIN_REPEATS:
+        return math.inf
+    median = percentile(times, 0.5)
+    return (percentile(times, 0.75) - percentile(times, 0.25)) / median if median else 0.0
+
+
+def _profile_main(conn, cpu_seconds: int, memory_mb: int, cpu: int = None):
+    """Profile jobs received over `conn` on one pinned CPU until the pipe closes."""
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+    isolate(memory_mb)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        set_cpu_limit(cpu_seconds)
+        try:
+            result = _profile(*job)
+        except MemoryError:
+            result = {"error": "MemoryError: memory limit exceeded", "kind": OOM}
+        except BaseException as e:  # SystemExit and friends from generated code
+            result = {"error": f"{type(e).__name__}: {e}", "kind": FAILED}
+        conn.send(result)
+
+
+def pinned_cpu() -> int:
+    """CPU for the profiling worker: the last one this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(os.sched_getaffinity(0))
+    return None
+
+
+class Profiler:
+    """One pinned worker process that runs timing jobs one at a time."""
+
+    def __init__(self, memory_mb: int = MEMORY_MB, cpu: int = None):
+        self.memory_mb = memory_mb
+        self.cpu = cpu if cpu is not None else pinned_cpu()
+        self._ctx = mp_context()
+        self._worker = self._spawn()
+
+    def _spawn(self) -> Worker:
+        cpu_seconds = int(MEASURE_TIMEOUT) + 1
+        return Worker(self._ctx, cpu_seconds, self.memory_mb, target=_profile_main, args=(self.cpu,))
+
+    def run(self, program: str, entry_point: str, calls: list, repeats: int = 0,
+            timeout: float = PROBE_TIMEOUT) -> dict:
+        """Result of _profile, or {"error", "kind"} if the job failed or overran."""
+        try:
+            self._worker.conn.send((program, entry_point, calls, repeats, MEASURE_BUDGET))
+            if self._worker.conn.poll(timeout):
+                return self._worker.conn.recv()
+            result = {"error": f"Timed out after {timeout}s", "kind": TIMEOUT}
+        except (EOFError, OSError):
+            result = {"error": "Profiling worker died", "kind": CRASH}
+        self._worker.kill()
+        self._worker = self._spawn()
+        return result
+
+    def close(self):
+        self._worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---------------- Scoring ---------------- #
+class EfficiencyScorer:
+    """Calibrates each task's reference once and scores candidates against it."""
+
+    def __init__(self, profiler: Profiler, repeats: int = REPEATS, target_seconds: float = TARGET_SECONDS):
+        self.profiler = profiler
+        self.repeats = repeats
+        self.target_seconds = target_seconds
+        # (dataset, reference, calls) hash -> calibrated reference or {"skipped": reason}
+        self.references = {}
+        # (reference key, program hash) -> measurement; identical programs are timed once
+        self.measured = {}
+
+    def _calibrate(self, program: str, entry_point: str, calls: list, strings: bool = True) -> dict:
+        scale = None
+        calibrated = False
+        factor = 1
+        while factor <= MAX_SCALE:
+            scaled = scale_calls(calls, factor, strings)
+            if factor > 1 and scaled == calls:
+                # Nothing in the inputs grows
+                break
+            probe = self.profiler.run(program, entry_point, scaled)
+            # Inputs the reference cannot handle are out of the problem's domain
+            if "error" in probe:
+                break
+            scale = factor
+            if probe["first_seconds"] >= self.target_seconds:
+                calibrated = True
+                break
+            factor *= SCALE_STEP
+        if scale is None:
+            return {"skipped": "reference fails on the test inputs"}
+        calls = scale_calls(calls, scale, strings)
+        measurement = self.profiler.run(program, entry_point, calls, self.repeats, MEASURE_TIMEOUT)
+        if "error" in measurement:
+            return {"skipped": f"reference: {measurement['error']}"}
+        return {"scale": scale, "calls": calls, "measurement": measurement, "calibrated": calibrated}
+
+    def reference(self, data, dataset: str) -> dict:
+        program = reference_program(data, dataset) if dataset in DATASETS else None
+        if program is None:
+            return {"skipped": "no runnable reference solution"}
+        calls = test_calls(data, dataset)
+        if not calls:
+            return {"skipped": "no literal test inputs to scale"}
+        key = content_hash(dataset, program, repr(calls))
+        if key not in self.references:
+            strings = not stdin_style(data, dataset, calls)
+            self.references[key] = {"key": key, **self._calibrate(program, entry_point_of(data), calls, strings)}
+        return self.references[key]
+
+    def score(self, data, dataset: str, response: str) -> dict:
+        """Candidate / reference CPU and memory ratios for one passing response."""
+        reference = self.reference(data, dataset)
+        if "skipped" in reference:
+            return {"skipped": reference["skipped"]}
+        entry_point = entry_point_of(data)
+        program = program_of(response, dataset, entry_point)
+        key = (reference["key"], content_hash(program))
+        if key not in self.measured:
+            self.measured[key] = self.profiler.run(program, entry_point, reference["calls"],
+                                                   self.repeats, MEASURE_TIMEOUT)
+        measured, ref = self.measured[key], reference["measurement"]
+        result = {"scale": reference["scale"], "reference_cpu_seconds": ref["cpu_seconds"],
+                  "reference_peak_kb": round(ref["peak_bytes"] / 1024, 1)}
+        if not reference["calibrated"]:
+            # The reference never reached the target time: ratios would measure the timer
+            result["uncalibrated"] = True
+        if "error" in measured:
+            # A timeout here is itself the answer: far slower than the reference
+            return {**result, "cpu_ratio": None, "memory_ratio": None,
+                    "failure_kind": measured["kind"], "error": measured["error"]}
+        return {
+            **result,
+            "cpu_seconds": measured["cpu_seconds"],
+            "peak_kb": round(measured["peak_bytes"] / 1024, 1),
+            "cpu_ratio": _ratio(measured, ref),
+            "memory_ratio": max(measured["peak_bytes"], MEMORY_FLOOR) / max(ref["peak_bytes"], MEMORY_FLOOR),
+            "spread": max(measured["spread"], ref["spread"]),
+            # Passing the tests but disagreeing on scaled inputs: ratio is suspect
+            "agrees": measured["outputs"] == ref["outputs"],
+        }
+
+
+def _ratio(measured: dict, reference: dict) -> float:
+    """CPU-time ratio; wall time on the idle pinned CPU if the process clock did not tick."""
+    if measured["cpu_seconds"] and reference["cpu_seconds"]:
+        return measured["cpu_seconds"] / reference["cpu_seconds"]
+    if measured["wall_seconds"] and reference["wall_seconds"]:
+        return measured["wall_seconds"] / reference["wall_seconds"]
+    return None
+
+
+def score_records(records: list, problems: dict, scorer: EfficiencyScorer) -> list:
+    """Efficiency rows for the passing records; `problems` maps filename -> (dataset, data)."""
+    rows = []
+    for record in records:
+        if not record.get("passed") or record["filename"] not in problems:
+            continue
+        dataset, data = problems[record["filename"]]
+        if dataset not in DATASETS:
+            continue
+        rows.append({
+            "filename": record["filename"],
+            "task_id": record.get("task_id"),
+            "dataset": dataset,
+            "strategy": record["strategy"],
+            **scorer.score(data, dataset, record["code"]),
+        })
+    return rows
+
+
+def _geomean(values: list) -> float:
+    return math.exp(sum(math.log(v) for v in values) / len(values)) if values else None
+
+
+def print_efficiency(rows: list, order: list = None):
+    """Per-strategy geometric-mean ratios, then one line per task and strategy."""
+    print(f"\n⚡ Efficiency vs reference solution (candidate / reference on scaled inputs; > 1 is worse):")
+    if not rows:
+        print("   No passing HumanEval/MBPP/APPS answers to score")
+        return
+    strategies = order or sorted({r["strategy"] for r in rows})
+    print(f"   {'':20}{'scored':>7}{'cpu x':>8}{'mem x':>8}{'>' + format(SLOW_RATIO, 'g') + 'x':>6}"
+          f"{'timeout':>8}{'differs':>8}{'uncal.':>8}{'skipped':>8}")
+    for strategy in strategies:
+        group = [r for r in rows if r["strategy"] == strategy]
+        if not group:
+            continue
+        scored = [r for r in group if r.get("cpu_ratio") is not None and r["agrees"] and not r.get("uncalibrated")]
+        cpu = _geomean([r["cpu_ratio"] for r in scored])
+        mem = _geomean([r["memory_ratio"] for r in scored])
+        slow = sum(r["cpu_ratio"] > SLOW_RATIO for r in scored)
+        timeouts = sum(r.get("failure_kind") == TIMEOUT for r in group)
+        differs = sum(r.get("agrees") is False for r in group)
+        uncalibrated = sum(bool(r.get("uncalibrated")) for r in group)
+        skipped = sum("skipped" in r for r in group)
+        print(f"   {strategy:20}{len(scored):7}{_fmt(cpu):>8}{_fmt(mem):>8}{slow:6}{timeouts:8}{differs:8}"
+              f"{uncalibrated:8}{skipped:8}")
+
+    print(f"\n   {'task':26}{'strategy':20}{'scale':>6}{'cpu x':>8}{'mem x':>8}{'ref cpu':>10}")
+    for r in sorted(rows, key=lambda r: (r["filename"], strategies.index(r["strategy"])
+                                          if r["strategy"] in strategies else 0)):
+        task = str(r.get("task_id") or r["filename"])[:25]
+        if "skipped" in r:
+            print(f"   {task:26}{r['strategy']:20}  skipped: {r['skipped']}")
+            continue
+        note = "" if r.get("agrees", True) else "  (differs on scaled inputs)"
+        if r.get("uncalibrated"):
+            note = "  (uncalibrated: reference below the target time)"
+        if r.get("failure_kind"):
+            note = f"  ({r['failure_kind']})"
+        print(f"   {task:26}{r['strategy']:20}{r['scale']:6}{_fmt(r.get('cpu_ratio')):>8}"
+              f"{_fmt(r.get('memory_ratio')):>8}{r['reference_cpu_seconds'] * 1000:8.1f}ms{note}")
+
+
+def _fmt(value) -> str:
+    return f"{value:.3g}" if value is not None else "-"
+
+
+# ---------------- CLI ---------------- #
+def main():
+    from problem_store import DEFAULT_DB, open_store
+
+    parser = argparse.ArgumentParser(description="Score passing answers' CPU time and memory against the reference.")
+    parser.add_argument("results", help="Results file (.jsonl) from eval_gpt.py")
+    parser.add_argument("--out", help="Efficiency rows (default: RESULTS_efficiency.jsonl)")
+    parser.add_argument("--problems", default="problems", help="Problem directory")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Problem index")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="Timed repeats per program")
+    parser.add_argument("--target-seconds", type=float, default=TARGET_SECONDS,
+                        help="Scale inputs until one reference pass takes this long")
+    args = parser.parse_args()
+
+    store = open_store(args.problems, args.db)
+    problems = {p.filename: (p.dataset, p) for p in store.iter(problem_dir=args.problems)}
+    records = list({unit_key(r): r for r in read_jsonl(args.results)}.values())
+    with Profiler() as profiler:
+        print(f"⏱  Profiling on CPU {profiler.cpu} ({args.repeats} repeats, target {args.target_seconds}s per reference pass)")
+        rows = score_records(records, problems, EfficiencyScorer(profiler, args.repeats, args.target_seconds))
+    out = args.out or os.path.splitext(args.results)[0] + "_efficiency.jsonl"
+    write_jsonl(rows, out)
+    print_efficiency(rows)
+    print(f"\n🗂  Efficiency rows written to {out}")
+
+
+if __name__ == "__main__":
+    main()
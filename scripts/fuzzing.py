@@ -0,0 +1,590 @@
+"""
+fuzzing.py - Differential fuzzing of passing answers against the reference
+---------------------------------
+MBPP has three asserts per task and APPS a handful of inputs, so wrong
+programs often pass. For each passing HumanEval/MBPP/APPS answer this runs
+the candidate on many generated inputs and compares it with the problem's
+reference (`canonical_solution`, or `code` for MBPP), reporting the first
+counterexample.
+
+Inputs are derived from the tests' own calls: each argument keeps its type,
+value range, alphabet and length range, and an int that equals another
+argument's length in every test (MBPP's find_Product(arr, n)) stays linked.
+Arguments without literal test inputs fall back to the signature's
+annotations. Inputs the reference rejects are dropped as out of domain.
+
+The generated inputs and the reference's outputs are cached per task in
+SQLite, so only the first run pays for the reference. Candidates are then
+checked in one worker call per batch of inputs, each call under a per-input
+limit, until FUZZ_SECONDS run out. Each program gets a fresh worker, so
+patched builtins or globals left by one candidate never reach the next.
+
+    python scripts/fuzzing.py results_gpt_4o_X.jsonl   # writes results_gpt_4o_X_fuzz.jsonl
+---------------------------------
+"""
+
+import os
+import re
+import ast
+import copy
+import math
+import time
+import pickle
+import random
+import signal
+import sqlite3
+import argparse
+import threading
+
+from graders import parses, entry_point_of, load_function, program_of
+from grade_cache import content_hash
+from results_io import read_jsonl, unit_key, write_jsonl
+from sandbox import CRASH, OOM, TIMEOUT, Worker, isolate, mp_context, set_cpu_limit
+from efficiency import reference_program, test_calls
+
+
+# Bump when input generation changes, so cached cases are regenerated
+FUZZ_VERSION = "1"
+# Inputs generated per task (before the reference filters them)
+FUZZ_INPUTS = 500
+# Seconds of checking per (task, distinct candidate program)
+FUZZ_SECONDS = 1.0
+# Seconds the reference may spend on a task's inputs, once (results are cached)
+REFERENCE_SECONDS = 10.0
+# Per-input limits: the reference, and a candidate (this many times slower is a failure)
+CALL_SECONDS = 0.1
+SLOWDOWN = 10
+# Inputs per worker call
+BATCH = 250
+# Generated sizes stay near the tests': at most this many elements / characters
+MAX_LENGTH = 64
+CACHE_PATH = os.path.join(".cache", "fuzz_cases.sqlite")
+MEMORY_MB = 2048
+CLIP = 200
+DATASETS = ("HumanEval", "MBPP", "APPS")
+
+WRONG = "wrong"      # different output
+ERROR = "error"      # raised where the reference returned
+
+
+# ---------------- Input Shapes ---------------- #
+def _annotation_shape(node):
+    """Shape for a signature annotation such as `List[int]` (None if unsupported)."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        # Quoted annotation
+        tree = parses(node.value)
+        node = tree.body[0].value if tree is not None and tree.body else None
+    if isinstance(node, ast.Name):
+        base = {"int": {"kind": "int", "lo": 0, "hi": 100}, "float": {"kind": "float", "lo": -100.0, "hi": 100.0},
+                "str": {"kind": "str", "alphabet": "abcdefghijklmnopqrstuvwxyz ", "min": 0, "max": 20},
+                "bool": {"kind": "bool"}}
+        return base.get(node.id)
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+        name = node.value.id.lower()
+        args = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+        shapes = [_annotation_shape(arg) for arg in args]
+        if None in shapes:
+            return None
+        if name == "list" and len(shapes) == 1:
+            return {"kind": "list", "item": shapes[0], "min": 0, "max": 10}
+        if name == "tuple" and len(shapes) > 0:
+            return {"kind": "tuple", "items": shapes}
+        if name == "dict" and len(shapes) == 2:
+            return {"kind": "dict", "key": shapes[0], "value": shapes[1], "min": 0, "max": 10}
+    return None
+
+
+def signature_shapes(program: str, entry_point: str) -> list:
+    """Per-argument shapes from the entry point's annotations, or None."""
+    tree = parses(program or "")
+    for node in ast.walk(tree) if tree is not None else ():
+        if isinstance(node, ast.FunctionDef) and node.name == entry_point:
+            args = node.args.args
+            shapes = [_annotation_shape(arg.annotation) if arg.annotation is not None else None for arg in args]
+            return shapes if args and None not in shapes else None
+    return None
+
+
+def _lengths(values: list) -> tuple:
+    sizes = [len(v) for v in values]
+    return min(sizes), max(sizes)
+
+
+def infer_shape(values: list):
+    """Shape covering the test inputs seen at one argument position (None if mixed)."""
+    if all(isinstance(v, bool) for v in values):
+        return {"kind": "bool"}
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        lo, hi = min(values), max(values)
+        # Keep the tests' sign: non-negative (or positive) inputs stay that way
+        return {"kind": "int", "lo": 1 if lo >= 1 else 0 if lo >= 0 else 2 * lo - 10, "hi": max(2 * hi, hi + 10)}
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        lo, hi = min(values), max(values)
+        return {"kind": "float", "lo": 0.0 if lo >= 0 else 2.0 * lo - 10, "hi": max(2.0 * hi, hi + 10)}
+    if all(isinstance(v, str) for v in values):
+        if any("\n" in v.strip() for v in values):
+            # stdin-style text: vary the numbers, keep the layout
+            return {"kind": "text", "seeds": values}
+        lo, hi = _lengths(values)
+        return {"kind": "str", "alphabet": "".join(sorted(set("".join(values)))) or "a",
+                "min": lo, "max": min(MAX_LENGTH, 2 * hi + 1), "seeds": values}
+    for kind, cls in (("list", list), ("tuple", tuple)):
+        if all(isinstance(v, cls) for v in values):
+            if kind == "tuple" and len({len(v) for v in values}) == 1 and values[0]:
+                items = [infer_shape([v[i] for v in values]) for i in range(len(values[0]))]
+                return {"kind": "tuple", "items": items} if None not in items else None
+            pooled = [item for v in values for item in v]
+            item = infer_shape(pooled) if pooled else {"kind": "int", "lo": 0, "hi": 10}
+            lo, hi = _lengths(values)
+            return {"kind": kind, "item": item, "min": lo, "max": min(MAX_LENGTH, 2 * hi + 1)} if item else None
+    if all(isinstance(v, dict) for v in values):
+        keys = [k for v in values for k in v]
+        key = infer_shape(keys) if keys else None
+        value = infer_shape([x for v in values for x in v.values()]) if keys else None
+        lo, hi = _lengths(values)
+        return {"kind": "dict", "key": key, "value": value, "min": lo, "max": min(MAX_LENGTH, 2 * hi + 1)} \
+            if key and value else None
+    if all(v is None for v in values):
+        return {"kind": "const", "value": None}
+    return None
+
+
+def length_links(calls: list) -> dict:
+    """int argument -> sized argument it equals the length of in every test call."""
+    links = {}
+    if len(calls) < 2:
+        return links
+    for j in range(len(calls[0])):
+        if not all(isinstance(c[j], int) and not isinstance(c[j], bool) for c in calls):
+            continue
+        for i in range(len(calls[0])):
+            if i != j and all(isinstance(c[i], (list, tuple, str)) and c[j] == len(c[i]) for c in calls):
+                links[j] = i
+                break
+    return links
+
+
+def _mutate_text(seed: str, rng: random.Random) -> str:
+    """Redraw the numbers after the first line (which usually holds counts)."""
+    head, sep, body = seed.partition("\n")
+
+    def redraw(match):
+        value = int(match.group())
+        bound = max(10, 2 * abs(value))
+        return str(rng.randint(0 if value >= 0 else -bound, bound))
+
+    return head + sep + re.sub(r"-?\d+", redraw, body)
+
+
+def _mutate_str(seed: str, shape: dict, rng: random.Random) -> str:
+    chars = list(seed)
+    for _ in range(rng.randint(1, 3)):
+        op = rng.random()
+        pos = rng.randint(0, len(chars))
+        if op < 0.4 and len(chars) < shape["max"]:
+            chars.insert(pos, rng.choice(shape["alphabet"]))
+        elif op < 0.7 and chars and len(chars) > shape["min"]:
+            del chars[min(pos, len(chars) - 1)]
+        elif chars:
+            chars[min(pos, len(chars) - 1)] = rng.choice(shape["alphabet"])
+    return "".join(chars)
+
+
+def generate(shape: dict, rng: random.Random):
+    kind = shape["kind"]
+    if kind == "bool":
+        return rng.random() < 0.5
+    if kind == "int":
+        # Boundaries are where wrong programs usually break
+        if rng.random() < 0.2:
+            return rng.choice([shape["lo"], shape["lo"] + 1, shape["hi"]])
+        return rng.randint(shape["lo"], shape["hi"])
+    if kind == "float":
+        return round(rng.uniform(shape["lo"], shape["hi"]), rng.choice([0, 1, 2, 6]))
+    if kind == "str":
+        if shape.get("seeds") and rng.random() < 0.5:
+            return _mutate_str(rng.choice(shape["seeds"]), shape, rng)
+        return "".join(rng.choice(shape["alphabet"]) for _ in range(rng.randint(shape["min"], shape["max"])))
+    if kind == "text":
+        return _mutate_text(rng.choice(shape["seeds"]), rng)
+    if kind in ("list", "tuple") and "item" in shape:
+        items = [generate(shape["item"], rng) for _ in range(rng.randint(shape["min"], shape["max"]))]
+        return items if kind == "list" else tuple(items)
+    if kind == "tuple":
+        return tuple(generate(item, rng) for item in shape["items"])
+    if kind == "dict":
+        return {generate(shape["key"], rng): generate(shape["value"], rng)
+                for _ in range(rng.randint(shape["min"], shape["max"]))}
+    return shape.get("value")
+
+
+def generate_inputs(seeds: list, shapes: list, links: dict, count: int, rng: random.Random) -> list:
+    """`count` distinct argument tuples (fewer if the shapes allow fewer)."""
+    inputs, seen = [], {repr(args) for args in seeds}
+    for _ in range(count * 3):
+        if len(inputs) >= count:
+            break
+        args = [generate(shape, rng) for shape in shapes]
+        for j, i in links.items():
+            args[j] = len(args[i])
+        args = tuple(args)
+        key = repr(args)
+        if key not in seen:
+            seen.add(key)
+            inputs.append(args)
+    return inputs
+
+
+def fuzz_plan(data, dataset: str) -> dict:
+    """Reference program, entry point and argument shapes for a task, or {"skipped": reason}."""
+    program = reference_program(data, dataset) if dataset in DATASETS else None
+    entry_point = entry_point_of(data)
+    if program is None:
+        return {"skipped": "no runnable reference solution"}
+    seeds = test_calls(data, dataset)
+    arities = [len(args) for args in seeds]
+    if seeds:
+        arity = max(set(arities), key=arities.count)
+        seeds = [args for args in seeds if len(args) == arity]
+        shapes = [infer_shape([args[i] for args in seeds]) for i in range(arity)]
+        typed = signature_shapes(program, entry_point) or []
+        # Mixed test values: fall back to the annotation for that argument
+        shapes = [shape or (typed[i] if i < len(typed) else None) for i, shape in enumerate(shapes)]
+    else:
+        shapes = signature_shapes(program, entry_point)
+    if not shapes or None in shapes:
+        return {"skipped": "no literal test inputs or typed signature to derive inputs from"}
+    return {"program": program, "entry_point": entry_point, "seeds": seeds, "shapes": shapes,
+            "links": length_links(seeds)}
+
+
+# ---------------- Fuzzing Worker ---------------- #
+class _CallTimeout(BaseException):
+    """Raised in the worker when one input overruns (not catchable by `except Exception`)."""
+
+
+def _on_alarm(signum, frame):
+    raise _CallTimeout()
+
+
+def _call(func, args: tuple, limit: float):
+    args = copy.deepcopy(args)
+    if limit and hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_REAL, limit)
+    try:
+        return func(*args)
+    finally:
+        if limit and hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def same(expected, got) -> bool:
+    """Output equality with float tolerance, element-wise through containers."""
+    if isinstance(expected, float) or isinstance(got, float):
+        if isinstance(expected, (int, float)) and isinstance(got, (int, float)) \
+                and not isinstance(expected, bool) and not isinstance(got, bool):
+            return (math.isnan(expected) and math.isnan(got)) or math.isclose(expected, got, rel_tol=1e-6, abs_tol=1e-9)
+        return False
+    if isinstance(expected, (list, tuple)) and type(expected) is type(got):
+        return len(expected) == len(got) and all(same(a, b) for a, b in zip(expected, got))
+    if isinstance(expected, dict) and isinstance(got, dict):
+        return expected.keys() == got.keys() and all(same(expected[k], got[k]) for k in expected)
+    try:
+        return bool(expected == got)
+    except Exception:
+        return False
+
+
+def _clip(value) -> str:
+    text = repr(value)
+    return text if len(text) <= CLIP else text[:CLIP] + "..."
+
+
+def _reference_outputs(program: str, entry_point: str, inputs: list, limit: float, budget: float) -> dict:
+    """Outputs of the reference for the inputs it accepts within `limit` each."""
+    func = load_function(program, entry_point)
+    cases, deadline = [], time.perf_counter() + budget
+    for args in inputs:
+        if time.perf_counter() > deadline:
+            break
+        try:
+            output = _call(func, args, limit)
+            pickle.dumps(output)
+        except (Exception, _CallTimeout):
+            continue  # Out of the reference's domain (or unpicklable)
+        cases.append((args, output))
+    return {"cases": cases}
+
+
+def _check(program: str, entry_point: str, cases: list, limit: float, budget: float) -> dict:
+    """Run the candidate on `cases` until the first disagreement or the budget runs out."""
+    func = load_function(program, entry_point)
+    deadline = time.perf_counter() + budget
+    for checked, (args, expected) in enumerate(cases):
+        if time.perf_counter() > deadline:
+            return {"checked": checked}
+        kind = None
+        try:
+            got = _call(func, args, limit)
+            if not same(expected, got):
+                kind, got = WRONG, _clip(got)
+        except _CallTimeout:
+            kind, got = TIMEOUT, f"no answer within {limit:g}s"
+        except MemoryError:
+            kind, got = OOM, "MemoryError"
+        except Exception as e:
+            kind, got = ERROR, f"{type(e).__name__}: {e}"[:CLIP]
+        if kind:
+            return {"checked": checked + 1, "counterexample": {
+                "kind": kind, "input": _clip(args), "expected": _clip(expected), "got": got}}
+    return {"checked": len(cases)}
+
+
+def _fuzz_main(conn, cpu_seconds: int, memory_mb: int):
+    """Run fuzzing jobs received over `conn` until the pipe closes."""
+    isolate(memory_mb)
+    signal.signal(signal.SIGALRM, _on_alarm)
+    jobs = {"reference": _reference_outputs, "check": _check}
+    while True:
+        try:
+            name, job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        set_cpu_limit(cpu_seconds)
+        try:
+            result = jobs[name](*job)
+        except MemoryError:
+            result = {"error": "MemoryError: memory limit exceeded", "kind": OOM}
+        except BaseException as e:  # the program failed to load, SystemExit, ...
+            result = {"error": f"{type(e).__name__}: {e}", "kind": ERROR}
+        try:
+            conn.send(result)
+        except Exception as e:
+            conn.send({"error": f"Unsendable result: {e}", "kind": CRASH})
+
+
+# ---------------- Case Cache ---------------- #
+class CaseCache:
+    """Generated inputs and reference outputs per task, pickled in SQLite."""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cases (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                           "created REAL NOT NULL)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cases WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, key: str, cases: list):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO cases VALUES (?, ?, ?)",
+                               (key, pickle.dumps(cases), time.time()))
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+# ---------------- Fuzzer ---------------- #
+class Fuzzer:
+    """Builds each task's cases once and checks candidates on them, each program in a fresh worker."""
+
+    def __init__(self, cache: CaseCache = None, inputs: int = FUZZ_INPUTS, seconds: float = FUZZ_SECONDS,
+                 memory_mb: int = MEMORY_MB):
+        self.cache = cache or CaseCache()
+        self.inputs = inputs
+        self.seconds = seconds
+        self.memory_mb = memory_mb
+        self._ctx = mp_context()
+        self._worker = None
+        # task key -> {"key", "cases"} or {"skipped"}
+        self.tasks = {}
+        # (task key, program hash) -> check result; identical programs are fuzzed once
+        self.checked = {}
+
+    def _spawn(self) -> Worker:
+        cpu_seconds = int(max(REFERENCE_SECONDS, self.seconds + CALL_SECONDS * SLOWDOWN)) + 5
+        return Worker(self._ctx, cpu_seconds, self.memory_mb, target=_fuzz_main)
+
+    def _fresh_worker(self):
+        """Replace the worker so nothing the previous program changed carries over."""
+        if self._worker is not None:
+            self._worker.stop()
+        self._worker = self._spawn()
+
+    def _run(self, name: str, job: tuple, timeout: float) -> dict:
+        try:
+            self._worker.conn.send((name, job))
+            if self._worker.conn.poll(timeout):
+                return self._worker.conn.recv()
+            result = {"error": f"Timed out after {timeout:g}s", "kind": TIMEOUT}
+        except (EOFError, OSError):
+            result = {"error": "Fuzzing worker died", "kind": CRASH}
+        self._worker.kill()
+        self._worker = self._spawn()
+        return result
+
+    def cases(self, data, dataset: str) -> dict:
+        """The task's (input, reference output) cases, generated and cached on first use."""
+        plan = fuzz_plan(data, dataset)
+        if "skipped" in plan:
+            return plan
+        key = content_hash(FUZZ_VERSION, dataset, plan["program"], plan["entry_point"],
+                           repr(plan["seeds"]), repr(plan["shapes"]), str(self.inputs))
+        if key in self.tasks:
+            return self.tasks[key]
+        cases = self.cache.get(key)
+        if cases is None:
+            # Seeded by the task, so a regenerated cache holds the same inputs
+            rng = random.Random(int(key[:16], 16))
+            inputs = generate_inputs(plan["seeds"], plan["shapes"], plan["links"], self.inputs, rng)
+            self._fresh_worker()
+            result = self._run("reference", (plan["program"], plan["entry_point"], inputs, CALL_SECONDS,
+                                             REFERENCE_SECONDS), REFERENCE_SECONDS * 2 + 5)
+            if "error" in result:
+                self.tasks[key] = {"skipped": f"reference: {result['error']}"}
+                return self.tasks[key]
+            cases = result["cases"]
+            self.cache.put(key, cases)
+        self.tasks[key] = {"key": key, "entry_point": plan["entry_point"], "cases": cases} if cases else \
+            {"skipped": "the reference rejects every generated input"}
+        return self.tasks[key]
+
+    def check(self, data, dataset: str, response: str) -> dict:
+        """{"checked", "counterexample"?} for one passing response, or {"skipped"}."""
+        task = self.cases(data, dataset)
+        if "skipped" in task:
+            return {"skipped": task["skipped"]}
+        program = program_of(response, dataset, task["entry_point"])
+        key = (task["key"], content_hash(program))
+        if key not in self.checked:
+            limit = CALL_SECONDS * SLOWDOWN
+            cases = task["cases"]
+            result = {"checked": 0}
+            deadline = time.perf_counter() + self.seconds
+            self._fresh_worker()
+            for start in range(0, len(cases), BATCH):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                batch = self._run("check", (program, task["entry_point"], cases[start:start + BATCH], limit,
+                                            remaining), remaining + limit + 5)
+                if "error" in batch:
+                    # A hang in C code or a crash: the batch is the counterexample
+                    batch = {"checked": 1, "counterexample": {"kind": batch["kind"], "input": f"one of inputs "
+                             f"{start}-{start + BATCH - 1}", "expected": "", "got": batch["error"]}}
+                result["checked"] += batch["checked"]
+                if "counterexample" in batch:
+                    result["counterexample"] = batch["counterexample"]
+                    break
+            self.checked[key] = {**result, "cases": len(cases)}
+        return self.checked[key]
+
+    def close(self):
+        if self._worker is not None:
+            self._worker.stop()
+        self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fuzz_records(records: list, problems: dict, fuzzer: Fuzzer) -> list:
+    """Fuzzing rows for the passing records; `problems` maps filename -> (dataset, data)."""
+    rows = []
+    for record in records:
+        if not record.get("passed") or record["filename"] not in problems:
+            continue
+        dataset, data = problems[record["filename"]]
+        if dataset not in DATASETS:
+            continue
+        rows.append({
+            "filename": record["filename"],
+            "task_id": record.get("task_id"),
+            "dataset": dataset,
+            "strategy": record["strategy"],
+            **fuzzer.check(data, dataset, record["code"]),
+        })
+    return rows
+
+
+def print_fuzz(rows: list, order: list = None, totals: dict = None):
+    """Per-strategy counterexample counts, then each counterexample.
+
+    With `totals` (strategy -> graded units) the pass rate after fuzzing is shown too.
+    """
+    print(f"\n🧪 Differential fuzzing vs reference solution (passing answers; {FUZZ_SECONDS:g}s budget each):")
+    if not rows:
+        print("   No passing HumanEval/MBPP/APPS answers to fuzz")
+        return
+    strategies = order or sorted({r["strategy"] for r in rows})
+    print(f"   {'':20}{'fuzzed':>7}{'inputs':>8}{'wrong':>7}{'error':>7}{'timeout':>8}{'skipped':>8}"
+          + (f"{'pass':>8}{'w/ fuzz':>8}" if totals else ""))
+    for strategy in strategies:
+        group = [r for r in rows if r["strategy"] == strategy]
+        if not group:
+            continue
+        fuzzed = [r for r in group if "skipped" not in r]
+        found = [r["counterexample"]["kind"] for r in fuzzed if "counterexample" in r]
+        inputs = sum(r["checked"] for r in fuzzed) / len(fuzzed) if fuzzed else 0
+        line = (f"   {strategy:20}{len(fuzzed):7}{inputs:8.0f}{found.count(WRONG):7}{found.count(ERROR):7}"
+                f"{found.count(TIMEOUT):8}{len(group) - len(fuzzed):8}")
+        if totals and totals.get(strategy):
+            line += f"{len(group) / totals[strategy] * 100:7.1f}%{(len(group) - len(found)) / totals[strategy] * 100:7.1f}%"
+        print(line)
+
+    found = [r for r in rows if "counterexample" in r]
+    if found:
+        print(f"\n   {'task':26}{'strategy':20}counterexample")
+        for r in sorted(found, key=lambda r: (r["filename"], r["strategy"])):
+            c = r["counterexample"]
+            task = str(r.get("task_id") or r["filename"])[:25]
+            print(f"   {task:26}{r['strategy']:20}[{c['kind']}] input {c['input']}: "
+                  f"expected {c['expected']}, got {c['got']}")
+
+
+# ---------------- CLI ---------------- #
+def main():
+    from problem_store import DEFAULT_DB, open_store
+
+    parser = argparse.ArgumentParser(description="Fuzz passing answers against the reference solution.")
+    parser.add_argument("results", help="Results file (.jsonl) from eval_gpt.py")
+    parser.add_argument("--out", help="Fuzzing rows (default: RESULTS_fuzz.jsonl)")
+    parser.add_argument("--problems", default="problems", help="Problem directory")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Problem index")
+    parser.add_argument("--inputs", type=int, default=FUZZ_INPUTS, help="Inputs generated per task")
+    parser.add_argument("--seconds", type=float, default=FUZZ_SECONDS,
+                        help="Checking budget per task and distinct program")
+    args = parser.parse_args()
+
+    store = open_store(args.problems, args.db)
+    problems = {p.filename: (p.dataset, p) for p in store.iter(problem_dir=args.problems)}
+    records = list({unit_key(r): r for r in read_jsonl(args.results)}.values())
+    with Fuzzer(inputs=args.inputs, seconds=args.seconds) as fuzzer:
+        rows = fuzz_records(records, problems, fuzzer)
+        print(f"🗃  Case cache: {fuzzer.cache.hits} tasks reused, {fuzzer.cache.misses} generated")
+    out = args.out or os.path.splitext(args.results)[0] + "_fuzz.jsonl"
+    write_jsonl(rows, out)
+    print_fuzz(rows)
+    print(f"\n🗂  Fuzzing rows written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+grade_cache.py - Grading caches
+---------------------------------
+LRU-bounded memoization for the grading path: cleaned responses and compiled
+code objects (per worker process), and verdicts for byte-identical programs
+(in the evaluator, shared across strategies and samples)
+---------------------------------
+"""
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+COMPILE_CACHE_SIZE = 512
+VERDICT_CACHE_SIZE = 4096
+
+
+def content_hash(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe mapping that drops the least recently used entry past maxsize."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ---------------- Per-process memoization ---------------- #
+_cleaned = LRUCache(COMPILE_CACHE_SIZE)
+_compiled = LRUCache(COMPILE_CACHE_SIZE)
+
+
+def memo_clean(clean, code: str, entry_point: str = None) -> str:
+    """clean(code, entry_point), memoized by content hash."""
+    key = content_hash(code, entry_point or "")
+    cleaned = _cleaned.get(key)
+    if cleaned is None:
+        cleaned = clean(code, entry_point)
+        _cleaned.put(key, cleaned)
+    return cleaned
+
+
+def compile_cached(source: str, filename: str = "<string>"):
+    """compile(source, filename, 'exec'), memoized by content hash.
+
+    Task test code (HumanEval `test`, MBPP `test_list`) is therefore compiled
+    once per worker and reused for every strategy and sample.
+    """
+    key = (filename, content_hash(source))
+    code = _compiled.get(key)
+    if code is None:
+        code = compile(source, filename, "exec")
+        _compiled.put(key, code)
+    return code
+
+
+def precompile(sources: list):
+    """Compile `sources` into the cache, growing it so they all stay resident."""
+    _compiled.maxsize = max(_compiled.maxsize, len(_compiled) + len(sources) + COMPILE_CACHE_SIZE)
+    for source in sources:
+        compile_cached(source)
+
+
+# ---------------- Verdict cache ---------------- #
+class VerdictCache:
+    """Reuses verdicts for identical (task tests, cleaned program) pairs."""
+
+    def __init__(self, maxsize: int = VERDICT_CACHE_SIZE):
+        self._cache = LRUCache(maxsize)
+        self.graded = 0
+        # key -> Event set when the thread grading that program is done
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def task_fingerprint(dataset: str, view: dict) -> str:
+        """Hash of everything the grader reads for a task."""
+        return content_hash(dataset, json.dumps(view, sort_keys=True, default=str))
+
+    def grade(self, fingerprint: str, program: str, grade):
+        """Return a cached verdict for `program`, or call `grade()` and store it.
+
+        A program another thread is already grading is waited for, not graded twice.
+        """
+        key = (fingerprint, content_hash(program))
+        while True:
+            verdict = self._cache.get(key)
+            if verdict is not None:
+                return verdict
+            with self._lock:
+                done = self._in_flight.get(key)
+                if done is None:
+                    done = self._in_flight[key] = threading.Event()
+                    break
+            # An uncached outcome (timeout/crash) is graded again by one of the waiters
+            done.wait()
+        try:
+            verdict = grade()
+            with self._lock:
+                self.graded += 1
+            # Timeouts/crashes can be load-dependent, so only cache clean outcomes
+            if verdict["failure_kind"] in ("", "failed"):
+                self._cache.put(key, verdict)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            done.set()
+        return verdict
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits
+
+    def stats(self) -> dict:
+        return {"served_from_cache": self._cache.hits, "graded": self.graded, "entries": len(self._cache)}
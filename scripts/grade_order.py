@@ -0,0 +1,105 @@
+"""
+grade_order.py - Learned per-task test ordering
+---------------------------------
+Tracks how often each test of a task fails and how long it takes, and orders
+tests so cheap, discriminating ones run first. Tests with no history are
+ordered shortest-first by source size.
+---------------------------------
+"""
+
+import os
+import json
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves from concurrent processes may lose updates
+    fcntl = None
+
+
+# Seconds per source character, used to estimate cost before a test was timed
+_SIZE_COST = 1e-7
+
+
+def _load(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _merge(stats: dict, delta: dict):
+    """Add the counters of `delta` into `stats`."""
+    for fingerprint, tests in delta.items():
+        history = stats.setdefault(fingerprint, {})
+        for index, counts in tests.items():
+            entry = history.setdefault(index, {"runs": 0, "fails": 0, "seconds": 0.0})
+            for key, value in counts.items():
+                entry[key] += value
+
+
+class TestOrderStore:
+    """Per-task test statistics persisted as JSON between runs.
+
+    Several processes (sweep workers sharing one .cache/) may save to the
+    same file: each save adds this process's new outcomes to what is on disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = _load(path) if os.path.exists(path) else {}
+        # Outcomes recorded since the last save
+        self._unsaved = {}
+
+    def order(self, fingerprint: str, sizes: list) -> list:
+        """Test indices, highest failure probability per second first."""
+        with self._lock:
+            history = self._stats.get(fingerprint, {})
+
+            def priority(i: int) -> float:
+                entry = history.get(str(i))
+                if entry and entry["runs"]:
+                    cost = entry["seconds"] / entry["runs"]
+                    fail_rate = (entry["fails"] + 1) / (entry["runs"] + 2)
+                else:
+                    cost = sizes[i] * _SIZE_COST
+                    fail_rate = 0.5
+                return fail_rate / max(cost, 1e-9)
+
+            return sorted(range(len(sizes)), key=lambda i: (-priority(i), i))
+
+    def update(self, fingerprint: str, tests: list):
+        """Fold per-test outcomes from one grade into the history."""
+        delta = {fingerprint: {}}
+        for test in tests:
+            entry = delta[fingerprint].setdefault(str(test["index"]), {"runs": 0, "fails": 0, "seconds": 0.0})
+            entry["runs"] += 1
+            entry["fails"] += int(not test["passed"])
+            entry["seconds"] += test["seconds"]
+        with self._lock:
+            _merge(self._stats, delta)
+            _merge(self._unsaved, delta)
+
+    def save(self):
+        """Read-merge-write under a file lock, so concurrent saves add up."""
+        with self._lock:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".lock", "w") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    stats = _load(self.path)
+                    _merge(stats, self._unsaved)
+                    tmp = f"{self.path}.{os.getpid()}.tmp"
+                    with open(tmp, "w") as f:
+                        json.dump(stats, f)
+                    os.replace(tmp, self.path)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+            # Pick up what other processes saved as well
+            self._stats = stats
+            self._unsaved = {}
@@ -0,0 +1,442 @@
+"""
+graders.py - Code extraction and dataset graders
+---------------------------------
+Shared by the evaluator and the sandboxed grading workers
+---------------------------------
+"""
+
+import re
+import ast
+import copy
+import time
+from functools import lru_cache
+
+from grade_cache import COMPILE_CACHE_SIZE, LRUCache, compile_cached, content_hash, memo_clean, precompile
+
+
+# Grading modes: stop at the first failing test, or run all for a per-test breakdown
+FIRST_FAILURE = "first_failure"
+FULL = "full"
+# Bump whenever a change here (cleaning, comparison, harness) can alter a
+# verdict, so eval_gpt.py --incremental regrades earlier results
+GRADER_VERSION = "4"
+
+_IMMUTABLE = (str, bytes, int, float, complex, bool, type(None))
+_parsed_inputs = LRUCache(256)
+
+
+# ---------------- Code Cleaning Function ---------------- #
+# Fence tags taken as Python (lowercased first word after the backticks)
+_PYTHON_TAGS = ("", "python", "py", "python3", "py3")
+# Fence tags extract_patch takes as a diff
+_DIFF_TAGS = ("diff", "patch")
+_DIFF_START = re.compile(r"^(diff --git |--- )", re.MULTILINE)
+# Line heuristics for responses without fenced code (see _code_lines)
+_HEADING_WORDS = ("Step", "Plan", "Example", "Note")
+_PROSE_PREFIXES = ("##", "###", "**", "To solve", "Let's", "Here's", "Now,", "The function",
+                   "This implementation", "CRITICAL")
+_CODE_START = ("def ", "import ", "from ", "class ")
+_CODE_LINE = ("#", "def", "import", "from", "class", " ", "\t", "@")
+_STOP_WORDS = ("example usage", "test case", "output:", "expected", "explanation", "mental", "note:")
+
+
+def parses(source: str):
+    """AST of `source`, or None if it does not parse."""
+    try:
+        return ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+
+def defines(tree, name: str) -> bool:
+    """`tree` defines a top-level function or class called `name`."""
+    return any(isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node.name == name
+               for node in tree.body)
+
+
+def load_function(program: str, entry_point: str):
+    """Execute `program` and return `entry_point`, or the last callable it defines."""
+    env = {}
+    exec(compile(program, "<program>", "exec"), env)
+    if entry_point in env:
+        return env[entry_point]
+    return [v for v in env.values() if callable(v)][-1]
+
+
+def _fences(code: str, tags: tuple = None) -> list:
+    """(tag, body, closed) of every fenced block (with a tag in `tags`, if
+    given), in order, in one scan.
+
+    Backticks are found with single-character str.find (memchr), so long
+    prose around the code costs next to nothing. Inside a block, a line
+    starting with ``` closes it whatever follows on that line (```  # end,
+    ``` and that's it); a closing fence glued to the last code line, and an
+    unclosed final block (truncated response), are accepted too.
+    """
+    blocks = []
+    find = code.find
+    size = len(code)
+    pos = find("`")
+    while pos != -1:
+        if code.startswith("```python\n", pos) and (not pos or code[pos - 1] == "\n"):
+            tag, body_start = "python", pos + 10  # the usual opener, no info string to parse
+        else:
+            if not code.startswith("```", pos):
+                pos = find("`", pos + 1)
+                continue
+            line_end = find("\n", pos)
+            if line_end == -1:
+                line_end = size
+            if pos and code[pos - 1] != "\n" and code[code.rfind("\n", 0, pos) + 1:pos].strip():
+                pos = find("`", line_end)  # ``` inside a line of prose
+                continue
+            words = code[pos + 3:line_end].split(None, 1)
+            tag = words[0].lower() if words else ""
+            body_start = line_end + 1
+        # Closed by the first line that starts with ```, or ends with it (glued)
+        end = find("```", body_start)
+        while end != -1:
+            line_end = find("\n", end)
+            if line_end == -1:
+                line_end = size
+            line_start = end if code[end - 1] == "\n" else code.rfind("\n", 0, end) + 1
+            if line_start == end or not code[line_start:end].strip():
+                if tags is None or tag in tags:
+                    blocks.append((tag, code[body_start:line_start].strip(), True))
+                break
+            line = code[line_start:line_end].rstrip()
+            if line.endswith("```"):
+                if tags is None or tag in tags:
+                    blocks.append((tag, (code[body_start:line_start] + line.rstrip("`")).strip(), True))
+                break
+            end = find("```", line_end)
+        else:
+            if tags is None or tag in tags:
+                blocks.append((tag, code[body_start:].strip(), False))
+            break
+        pos = find("`", line_end)
+    return blocks
+
+
+def _is_patch_block(tag: str, body: str) -> bool:
+    return tag in _DIFF_TAGS or _DIFF_START.search(body) is not None
+
+
+def answer_block_closed(text: str, dataset: str = None) -> bool:
+    """True once `text` has a closed block that program_of would grade: a
+    ```python (or untagged) block, or for SWE a diff. Blocks in other
+    languages (a ```text example, a shell snippet) do not count."""
+    for tag, body, closed in _fences(text):
+        if not closed:
+            continue
+        if dataset == "SWE" and _is_patch_block(tag, body):
+            return True
+        if dataset != "SWE" and tag in _PYTHON_TAGS:
+            return True
+    return False
+
+
+def _code_lines(code: str) -> list:
+    """Line heuristics for responses without fenced code."""
+    code_lines = []
+    in_code = False
+    for line in code.split("\n"):
+        stripped = line.strip()
+
+        # Skip markdown and explanation text
+        if stripped.startswith("#") and any(word in stripped for word in _HEADING_WORDS):
+            continue
+        if stripped.startswith(_PROSE_PREFIXES):
+            continue
+
+        # Detect code start
+        if stripped.startswith(_CODE_START):
+            in_code = True
+
+        # Collect code lines
+        if in_code:
+            # Stop at explanation text
+            if stripped and not stripped.startswith(_CODE_LINE):
+                lowered = stripped.lower()
+                if any(keyword in lowered for keyword in _STOP_WORDS):
+                    break
+            code_lines.append(line)
+    return code_lines
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def _check_block(block: str, entry_point: str = None) -> tuple:
+    """(compiles, defines `entry_point` at module level) for a fenced block.
+
+    Compiling catches everything ast.parse does, and the code object lands
+    in compile_cached, where the grader picks it up instead of compiling the
+    cleaned program again. Memoized, since responses are cleaned on every
+    grade and identical blocks recur across strategies and samples.
+    """
+    try:
+        code = compile_cached(block)
+    except (SyntaxError, ValueError, RecursionError):
+        return False, False
+    # Module-level def/class bodies are code objects among the module's constants
+    return True, bool(entry_point) and any(
+        getattr(const, "co_name", None) == entry_point for const in code.co_consts)
+
+
+def clean_code(code: str, entry_point: str = None) -> str:
+    """Extract pure Python code from GPT output.
+
+    Fenced Python blocks win: the last one that parses and defines
+    `entry_point`, else the last one that parses, else the last one. Without
+    fences, lines are collected from the first def/import on, skipping prose.
+    """
+    blocks = _fences(code, _PYTHON_TAGS)
+    if blocks and entry_point:
+        # Usually one block spells out the definition: check it first
+        function, cls = f"def {entry_point}(", f"class {entry_point}"
+        for _, candidate, _ in reversed(blocks):
+            if (function in candidate or cls in candidate) and _check_block(candidate, entry_point)[1]:
+                return candidate
+    if blocks:
+        candidates = [body for _, body, _ in blocks]
+        parsed = None
+        for candidate in reversed(candidates):
+            valid, defining = _check_block(candidate, entry_point)
+            if valid and (entry_point is None or defining):
+                return candidate
+            if valid and parsed is None:
+                parsed = candidate
+        return parsed if parsed is not None else candidates[-1]
+
+    code_lines = _code_lines(code)
+    if code_lines:
+        return "\n".join(code_lines).strip()
+
+    return code.strip()
+
+
+def entry_point_of(data) -> str:
+    """Function the tests call: `entry_point`, or the name in APPS starter code."""
+    name = data.get("entry_point", "")
+    if not name and data.get("starter_code") and "def " in data["starter_code"]:
+        name = data["starter_code"].split("def ")[1].split("(")[0].strip()
+    return name or None
+
+
+def extract_patch(text: str) -> str:
+    """Extract a unified diff from model output (```diff block or bare diff)."""
+    blocks = re.findall(r'```(?:diff|patch)\s*\n(.*?)\n```', text, re.DOTALL)
+    if not blocks:
+        blocks = [b for b in re.findall(r'```\w*\s*\n(.*?)\n```', text, re.DOTALL)
+                  if re.search(r'^(diff --git |--- )', b, re.MULTILINE)]
+    if blocks:
+        text = blocks[-1]
+    match = re.search(r'^(diff --git |--- )', text, re.MULTILINE)
+    return text[match.start():].rstrip("\n") + "\n" if match else ""
+
+
+def program_of(response: str, dataset: str, entry_point: str = None) -> str:
+    """What actually gets graded: the cleaned code, or the diff for SWE."""
+    if dataset == "SWE":
+        return extract_patch(response)
+    return memo_clean(clean_code, response, entry_point)
+
+
+# ---------------- Evaluation Logic ---------------- #
+def run_humaneval(entry_point: str, test_code: str, model_code: str) -> tuple[bool, str]:
+    """Run HumanEval tests."""
+    env = {}
+    try:
+        model_code = memo_clean(clean_code, model_code, entry_point)
+        exec(compile_cached(model_code), env)
+        exec(compile_cached(test_code), env)
+        env["check"](env[entry_point])
+        return True, ""
+    except MemoryError:
+        # Let the sandbox report this as an OOM rather than a test failure
+        raise
+    except Exception as e:
+        return False, str(e)
+
+
+def _record(report: list, index: int, passed: bool, started: float, error: str = ""):
+    if report is not None:
+        report.append({"index": index, "passed": passed,
+                       "seconds": round(time.perf_counter() - started, 6), "error": error})
+
+
+def run_mbpp(entry_point: str, test_list: list, model_code: str,
+             order: list = None, mode: str = FIRST_FAILURE, report: list = None,
+             setup_code: str = "") -> tuple[bool, str]:
+    """Run MBPP tests, after the task's `setup_code` (test_setup_code).
+
+    `order` is the sequence of test indices to run; per-test outcomes and
+    timings are appended to `report` when given.
+    """
+    env = {}
+    try:
+        model_code = memo_clean(clean_code, model_code, entry_point)
+        exec(compile_cached(model_code), env)
+    except MemoryError:
+        raise
+    except Exception as e:
+        return False, str(e)
+    if setup_code:
+        try:
+            exec(compile_cached(setup_code), env)
+        except MemoryError:
+            raise
+        except Exception as e:
+            return False, f"Test setup failed: {e}"
+
+    first_error = None
+    for i in (order if order is not None else range(len(test_list))):
+        started = time.perf_counter()
+        try:
+            exec(compile_cached(test_list[i]), env)
+            _record(report, i, True, started)
+        except MemoryError:
+            raise
+        except Exception as e:
+            _record(report, i, False, started, str(e))
+            if first_error is None:
+                first_error = str(e)
+            if mode == FIRST_FAILURE:
+                break
+    if first_error is not None:
+        return False, first_error
+    return True, ""
+
+
+def parsed_inputs(inputs: list) -> list:
+    """eval() each APPS input once per worker; cached by content hash."""
+    key = content_hash(repr(inputs))
+    values = _parsed_inputs.get(key)
+    if values is None:
+        values = [eval(inp[0]) for inp in inputs]
+        _parsed_inputs.put(key, values)
+    return values
+
+
+def _fresh(value):
+    """Copy cached inputs that a candidate could mutate."""
+    return value if isinstance(value, _IMMUTABLE) else copy.deepcopy(value)
+
+
+def run_apps(data: dict, model_code: str,
+             order: list = None, mode: str = FIRST_FAILURE, report: list = None) -> tuple[bool, str]:
+    """Run APPS tests (see run_mbpp for order/mode/report)."""
+    env = {}
+    try:
+        func_name = entry_point_of(data)
+        model_code = memo_clean(clean_code, model_code, func_name)
+        exec(compile_cached(model_code), env)
+        
+        if func_name and func_name in env:
+            func = env[func_name]
+        else:
+            func = [v for v in env.values() if callable(v)][-1]
+        
+        inputs = parsed_inputs(data["inputs"])
+    except MemoryError:
+        raise
+    except Exception as e:
+        return False, str(e)
+
+    outputs = data["outputs"]
+    first_error = None
+    for i in (order if order is not None else range(min(len(inputs), len(outputs)))):
+        started = time.perf_counter()
+        try:
+            expected_val = outputs[i][0]
+            result = func(_fresh(inputs[i]))
+            if result != expected_val:
+                raise AssertionError(f"Expected {expected_val}, got {result}")
+            _record(report, i, True, started)
+        except MemoryError:
+            raise
+        except Exception as e:
+            _record(report, i, False, started, str(e))
+            if first_error is None:
+                first_error = str(e)
+            if mode == FIRST_FAILURE:
+                break
+    if first_error is not None:
+        return False, first_error
+    return True, ""
+
+
+def run_swe(data: dict, model_code: str) -> tuple[bool, str]:
+    """Run SWE-bench FAIL_TO_PASS/PASS_TO_PASS tests (see swe_harness.py)."""
+    from swe_harness import SWEHarness  # swe_harness -> sandbox -> graders
+    verdict = SWEHarness().grade(data, model_code)
+    return verdict["passed"], verdict["error"]
+
+
+# ---------------- Grading Dispatcher ---------------- #
+# Problem fields each grader needs; only these are sent to grading workers
+GRADING_FIELDS = {
+    "HumanEval": ("entry_point", "test"),
+    "MBPP": ("entry_point", "test_setup_code", "test_list"),
+    "APPS": ("entry_point", "starter_code", "inputs", "outputs"),
+    "SWE": ("instance_id", "repo", "version", "base_commit", "test_patch",
+            "FAIL_TO_PASS", "PASS_TO_PASS"),
+}
+
+
+def grading_view(data, dataset: str) -> dict:
+    """Plain dict with just the fields grade_code needs for `dataset`."""
+    fields = GRADING_FIELDS.get(dataset, ())
+    return {f: data[f] for f in fields if f in data}
+
+
+def preload_fixtures(items: list):
+    """Compile each task's tests and parse its APPS inputs ahead of grading.
+
+    `items` are (grading view, dataset) pairs. Run in the sandbox's forking
+    parent, so every forked grader starts with them cached.
+    """
+    sources, inputs = [], []
+    for data, dataset in items:
+        if dataset == "HumanEval" and data.get("test"):
+            sources.append(data["test"])
+        elif dataset == "MBPP":
+            if data.get("test_setup_code"):
+                sources.append(data["test_setup_code"])
+            sources.extend(data.get("test_list", []))
+        elif dataset == "APPS" and data.get("inputs"):
+            inputs.append(data["inputs"])
+    precompile(sources)
+    _parsed_inputs.maxsize = max(_parsed_inputs.maxsize, len(_parsed_inputs) + len(inputs))
+    for values in inputs:
+        try:
+            parsed_inputs(values)
+        except Exception:
+            pass  # Reported when the task is graded
+
+
+def test_sizes(data: dict, dataset: str) -> list:
+    """Source size of each individual test, used as a first cost estimate."""
+    if dataset == "MBPP":
+        return [len(t) for t in data.get("test_list", [])]
+    if dataset == "APPS":
+        return [len(inp[0]) for inp in data.get("inputs", [])]
+    return []
+
+
+def grade_code(data: dict, dataset: str, code: str, order: list = None,
+               mode: str = FIRST_FAILURE, report: list = None) -> tuple[bool, str]:
+    """Run the dataset's tests against a model response.
+
+    `order`, `mode` and `report` apply to datasets with individual tests
+    (MBPP, APPS); HumanEval's single check() and SWE ignore them.
+    """
+    if dataset == "HumanEval":
+        return run_humaneval(data["entry_point"], data["test"], code)
+    elif dataset == "MBPP":
+        return run_mbpp(data["entry_point"], data["test_list"], code, order, mode, report,
+                        data.get("test_setup_code", ""))
+    elif dataset == "APPS":
+        return run_apps(data, code, order, mode, report)
+    elif dataset == "SWE":
+        return run_swe(data, code)
+    return False, "Unknown dataset"
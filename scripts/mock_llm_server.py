@@ -0,0 +1,463 @@
+"""
+mock_llm_server.py - Local OpenAI-compatible mock server
+---------------------------------
+Answers /v1/chat/completions (and Anthropic-style /v1/messages) with a
+canned code block so the harness can be exercised offline, optionally
+followed by prose (--prose) and streamed as server-sent events when the
+request asks for it. Faults can be injected (random 5xx, 429 above a
+concurrency cap, a full outage window) to exercise the client's
+retry/backoff/circuit-breaker layer. It also fakes the files/batches
+endpoints used by batch mode, and a provider prompt cache: a prompt prefix
+seen before is reported as cached tokens (at any content part boundary for
+chat completions, at `cache_control` blocks for messages). Point the
+harness at it with:
+
+    python scripts/mock_llm_server.py --port 8000 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python scripts/eval_gpt.py
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8000 python scripts/eval_gpt.py --models claude-sonnet-4-5
+---------------------------------
+"""
+
+import re
+import json
+import hashlib
+import time
+import uuid
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def content_parts(message: dict) -> list:
+    """Text blocks of a message whose content is a string or a list of parts."""
+    content = message.get("content") or ""
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}]
+    return [part for part in content if part.get("type", "text") == "text"]
+
+
+def message_text(message: dict) -> str:
+    return "".join(part.get("text", "") for part in content_parts(message))
+
+
+def find_entry_point(messages: list) -> str:
+    """Guess the function name the prompt asks for."""
+    text = "\n".join(message_text(m) for m in messages)
+    match = re.search(r"Function name (?:MUST|must) be(?: exactly)?: (\w+)", text)
+    if not match:
+        match = re.search(r"def (\w+)\(", text)
+    return match.group(1) if match else "solution"
+
+
+def canned_response(messages: list, prose_words: int = 0) -> str:
+    entry_point = find_entry_point(messages)
+    code = f"```python\ndef {entry_point}(*args, **kwargs):\n    return None\n```"
+    if prose_words:
+        # Explanation after the code, like chain_of_thought answers
+        code += "\n\n" + " ".join(["explanation"] * prose_words)
+    return code
+
+
+class MockState:
+    """Counters shared by all handler threads."""
+
+    def __init__(self, latency: float = 0.0, prose_words: int = 0, token_delay: float = 0.0,
+                 faults: dict = None):
+        self.latency = latency
+        self.prose_words = prose_words
+        self.token_delay = token_delay
+        self.faults = faults or {}
+        self.started = time.monotonic()
+        self.injected = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.files = {}
+        self.batches = {}
+        self.cancelled_streams = 0
+        self.prefixes = set()
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self.in_flight
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "batches": len(self.batches),
+                "cancelled_streams": self.cancelled_streams,
+                "cached_prefixes": len(self.prefixes),
+                "injected": dict(self.injected),
+            }
+
+    def prefix_cache(self, blocks: list) -> tuple:
+        """(cached, cacheable) prompt tokens for (text, is_breakpoint) blocks.
+
+        `cached` is the longest breakpoint prefix seen before; every breakpoint
+        prefix of this prompt is stored, `cacheable` is the longest one's size.
+        """
+        digest = hashlib.sha256()
+        chars = cached = cacheable = 0
+        with self.lock:
+            for text, breakpoint in blocks:
+                digest.update(text.encode())
+                chars += len(text)
+                if not breakpoint:
+                    continue
+                key = digest.hexdigest()
+                if key in self.prefixes:
+                    cached = chars // 4
+                self.prefixes.add(key)
+                cacheable = chars // 4
+        return cached, cacheable
+
+    def fault_for(self, in_flight: int):
+        """(status, headers) of an injected failure for this request, or None."""
+        faults = self.faults
+        elapsed = time.monotonic() - self.started
+        fault = None
+        if faults.get("outage") and faults["outage"][0] <= elapsed < sum(faults["outage"]):
+            fault = (503, {})
+        elif faults.get("max_concurrent") and in_flight > faults["max_concurrent"]:
+            fault = (429, {"Retry-After": str(faults.get("retry_after", 1))})
+        elif faults.get("error_rate") and random.random() < faults["error_rate"]:
+            fault = (random.choice((500, 502, 503)), {})
+        if fault is not None:
+            with self.lock:
+                self.injected[fault[0]] = self.injected.get(fault[0], 0) + 1
+        return fault
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _not_found(self):
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        state = self.server.state
+        if path == "/stats":
+            self._send_json(200, state.snapshot())
+        elif re.fullmatch(r"/v1/batches/[\w-]+", path):
+            batch = state.batches.get(path.rsplit("/", 1)[1])
+            if batch is None:
+                self._not_found()
+            else:
+                self._send_json(200, batch)
+        elif re.fullmatch(r"/v1/files/[\w-]+/content", path):
+            entry = state.files.get(path.split("/")[3])
+            if entry is None:
+                self._not_found()
+                return
+            body = entry["content"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._not_found()
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path.endswith("/files"):
+            self._upload_file()
+        elif path.endswith("/batches"):
+            self._create_batch()
+        elif path.endswith("/chat/completions"):
+            self._chat_completion()
+        elif path.endswith("/messages"):
+            self._chat_completion(anthropic=True)
+        else:
+            self._not_found()
+
+    # ---- Fake batch API ----
+    def _upload_file(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        message = BytesParser().parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + raw
+        )
+        fields = {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                  for part in message.get_payload()}
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.server.state.files[file_id] = {"content": fields.get("file", b""),
+                                            "purpose": (fields.get("purpose") or b"").decode()}
+        self._send_json(200, file_object(file_id, len(fields.get("file", b""))))
+
+    def _create_batch(self):
+        request = self._read_json()
+        state = self.server.state
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": request.get("endpoint"),
+            "input_file_id": request.get("input_file_id"),
+            "completion_window": request.get("completion_window"),
+            "status": "in_progress",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        state.batches[batch_id] = batch
+        threading.Thread(target=run_fake_batch, args=(state, batch), daemon=True).start()
+        self._send_json(200, batch)
+
+    def _chat_completion(self, anthropic: bool = False):
+        request = self._read_json()
+        state = self.server.state
+        fault = state.fault_for(state.enter())
+        try:
+            if fault is not None:
+                status, headers = fault
+                message = "Rate limit reached" if status == 429 else "Injected server error"
+                self._send_json(status, {"error": {"message": message, "type": "mock_fault"}}, headers)
+                return
+            if state.latency:
+                time.sleep(state.latency)
+            content = canned_response(request.get("messages", []), state.prose_words)
+            cache = state.prefix_cache(prompt_blocks(request, anthropic))
+            if anthropic and request.get("stream"):
+                self._stream_message(request, content, cache)
+            elif anthropic:
+                self._send_json(200, message_payload(request, content, cache))
+            elif request.get("stream"):
+                self._stream_completion(request, content, cache)
+            else:
+                self._send_json(200, completion_payload(request, content, cache))
+        finally:
+            state.leave()
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def _stream_cancelled(self):
+        # Client cancelled the stream early
+        with self.server.state.lock:
+            self.server.state.cancelled_streams += 1
+
+    def _stream_completion(self, request: dict, content: str, cache: tuple = (0, 0)):
+        """Send `content` as SSE chunks of ~4 characters (one fake token each)."""
+        self._start_stream()
+        chunk_id = f"chatcmpl-mock-{time.time_ns()}"
+        n = request.get("n") or 1
+
+        def event(choices: list, usage: dict = None):
+            payload = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": request.get("model", "mock"), "choices": choices}
+            if usage is not None:
+                payload["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+            for piece in pieces:
+                if self.server.state.token_delay:
+                    time.sleep(self.server.state.token_delay)
+                event([{"index": i, "delta": {"content": piece}, "finish_reason": None} for i in range(n)])
+            event([{"index": i, "delta": {}, "finish_reason": "stop"} for i in range(n)])
+            if (request.get("stream_options") or {}).get("include_usage"):
+                usage = completion_payload(request, content, cache)["usage"]
+                usage["completion_tokens"] = len(pieces) * n
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                event([], usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self._stream_cancelled()
+
+    def _stream_message(self, request: dict, content: str, cache: tuple = (0, 0)):
+        """Messages API event stream of `content`, ~4 characters per delta."""
+        self._start_stream()
+        message = message_payload(request, "", cache)
+
+        def event(kind: str, payload: dict):
+            self.wfile.write(f"event: {kind}\ndata: {json.dumps({'type': kind, **payload})}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+            event("message_start", {"message": {**message, "content": [], "stop_reason": None}})
+            event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            for piece in pieces:
+                if self.server.state.token_delay:
+                    time.sleep(self.server.state.token_delay)
+                event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": piece}})
+            event("content_block_stop", {"index": 0})
+            event("message_delta", {"delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                    "usage": {"output_tokens": len(pieces)}})
+            event("message_stop", {})
+        except (BrokenPipeError, ConnectionResetError):
+            self._stream_cancelled()
+
+
+def prompt_blocks(request: dict, anthropic: bool = False) -> list:
+    """The prompt as (text, is_breakpoint) blocks, in provider cache order.
+
+    Chat completions cache automatically, so every part ends a cacheable
+    prefix; the Messages API only caches up to `cache_control` blocks.
+    """
+    blocks = []
+    if anthropic:
+        system = request.get("system") or ""
+        parts = [{"text": system}] if isinstance(system, str) else system
+        blocks.extend((part.get("text", ""), "cache_control" in part) for part in parts)
+    for message in request.get("messages", []):
+        blocks.extend((part.get("text", ""), not anthropic or "cache_control" in part)
+                      for part in content_parts(message))
+    return blocks
+
+
+def completion_payload(request: dict, content: str, cache: tuple = (0, 0)) -> dict:
+    prompt_tokens = sum(len(m) for m, _ in prompt_blocks(request)) // 4
+    completion_tokens = len(content) // 4 * (request.get("n") or 1)
+    return {
+        "id": f"chatcmpl-mock-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{
+            "index": i,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        } for i in range(request.get("n") or 1)],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cache[0]},
+        },
+    }
+
+
+def message_payload(request: dict, content: str, cache: tuple = (0, 0)) -> dict:
+    """Anthropic Messages API response; input_tokens excludes cache reads/writes."""
+    prompt_tokens = sum(len(text) for text, _ in prompt_blocks(request, anthropic=True)) // 4
+    read, cacheable = cache
+    written = cacheable - read
+    return {
+        "id": f"msg_mock_{time.time_ns()}",
+        "type": "message",
+        "role": "assistant",
+        "model": request.get("model", "mock"),
+        "content": [{"type": "text", "text": content}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": prompt_tokens - read - written, "output_tokens": len(content) // 4,
+                  "cache_read_input_tokens": read, "cache_creation_input_tokens": written},
+    }
+
+
+def file_object(file_id: str, size: int) -> dict:
+    return {"id": file_id, "object": "file", "bytes": size, "created_at": int(time.time()),
+            "filename": f"{file_id}.jsonl", "purpose": "batch", "status": "processed"}
+
+
+def run_fake_batch(state: MockState, batch: dict):
+    """Answer every line of the batch input file, then mark the batch completed."""
+    lines = state.files[batch["input_file_id"]]["content"].decode().splitlines()
+    output = []
+    for line in filter(str.strip, lines):
+        row = json.loads(line)
+        if state.latency:
+            time.sleep(state.latency / 10)
+        body = completion_payload(row["body"], canned_response(row["body"].get("messages", [])))
+        output.append(json.dumps({
+            "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+            "custom_id": row["custom_id"],
+            "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": body},
+            "error": None,
+        }))
+    output_id = f"file-{uuid.uuid4().hex[:12]}"
+    state.files[output_id] = {"content": ("\n".join(output) + "\n").encode(), "purpose": "batch_output"}
+    batch["request_counts"] = {"total": len(output), "completed": len(output), "failed": 0}
+    batch["output_file_id"] = output_id
+    batch["status"] = "completed"
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                prose_words: int = 0, token_delay: float = 0.0, faults: dict = None) -> ThreadingHTTPServer:
+    """Create (but do not start) a mock server; port 0 picks a free port.
+
+    `faults` keys: error_rate (0-1), max_concurrent + retry_after, outage (start, seconds).
+    """
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(latency, prose_words, token_delay, faults)
+    return server
+
+
+def start_in_thread(**kwargs) -> tuple[ThreadingHTTPServer, str]:
+    """Start a mock server on a background thread; returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait per request")
+    parser.add_argument("--prose", type=int, default=0, help="Words of explanation after the code block")
+    parser.add_argument("--token-delay", type=float, default=0.0,
+                        help="Seconds between streamed chunks (stream=True requests)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 500/502/503")
+    parser.add_argument("--max-concurrent", type=int, default=0,
+                        help="Answer 429 when more calls than this are in flight")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--outage", type=float, nargs=2, metavar=("START", "SECONDS"),
+                        help="Answer every call with 503 during this window after startup")
+    args = parser.parse_args()
+
+    faults = {"error_rate": args.error_rate, "max_concurrent": args.max_concurrent,
+              "retry_after": args.retry_after, "outage": args.outage}
+    server = make_server(args.host, args.port, args.latency, args.prose, args.token_delay, faults)
+    print(f"🧪 Mock LLM server on http://{args.host}:{args.port}/v1 (latency={args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
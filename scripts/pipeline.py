@@ -0,0 +1,183 @@
+"""
+pipeline.py - Pipelined generate -> grade runner
+---------------------------------
+Generations stream into a bounded queue while a grading stage drains it, so
+API latency and grading CPU overlap instead of adding up
+---------------------------------
+"""
+
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+_DONE = object()
+
+
+# ---------------- Metrics ---------------- #
+class StageMetrics:
+    """Item count, busy time and wall-clock span of one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, started: float, ended: float, error: bool = False):
+        self.items += 1
+        self.errors += int(error)
+        self.busy += ended - started
+        self.first_start = started if self.first_start is None else min(self.first_start, started)
+        self.last_end = ended if self.last_end is None else max(self.last_end, ended)
+
+    @property
+    def span(self) -> float:
+        if self.first_start is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    def report(self) -> dict:
+        span = self.span
+        return {
+            "items": self.items,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy, 3),
+            "span_seconds": round(span, 3),
+            "throughput": round(self.items / span, 3) if span > 0 else None,
+        }
+
+
+class QueueMetrics:
+    """Queue depth sampled on every put/get."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.samples = 0
+        self.total = 0
+        self.max_depth = 0
+        self.full_waits = 0
+
+    def sample(self, depth: int):
+        self.samples += 1
+        self.total += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def report(self) -> dict:
+        return {
+            "maxsize": self.maxsize,
+            "max_depth": self.max_depth,
+            "mean_depth": round(self.total / self.samples, 2) if self.samples else 0.0,
+            "producer_waits": self.full_waits,
+        }
+
+
+# ---------------- Pipeline ---------------- #
+class Pipeline:
+    """Producer/consumer runner over a list of work units.
+
+    `generate(unit)` is a coroutine returning the model response.
+    `grade(unit, response)` is a blocking call run on a thread pool.
+    Results are returned in unit order as (response, verdict) pairs; a
+    failed generation yields (exception, None) and is not graded. With
+    `collect=False` results are only passed to `on_result(i, response, verdict)`
+    and not kept in memory.
+    """
+
+    def __init__(self, generate, grade, generate_workers: int = 8, grade_workers: int = 1,
+                 queue_size: int = 32, on_result=None, collect: bool = True):
+        self.generate = generate
+        self.grade = grade
+        self.generate_workers = generate_workers
+        self.grade_workers = grade_workers
+        self.queue_size = queue_size
+        self.on_result = on_result
+        self.collect = collect
+        self.generation = StageMetrics("generation")
+        self.grading = StageMetrics("grading")
+        self.queue = QueueMetrics(queue_size)
+        self.wall = 0.0
+
+    async def _produce(self, units: list, next_index: list, queue: asyncio.Queue):
+        while next_index[0] < len(units):
+            i = next_index[0]
+            next_index[0] += 1
+            started = time.perf_counter()
+            try:
+                response = await self.generate(units[i])
+                error = False
+            except Exception as e:
+                response, error = e, True
+            self.generation.record(started, time.perf_counter(), error)
+
+            if queue.full():
+                self.queue.full_waits += 1
+            # Blocks while the grading stage is behind (backpressure)
+            await queue.put((i, response))
+            self.queue.sample(queue.qsize())
+
+    async def _consume(self, units: list, queue: asyncio.Queue, results: list, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            self.queue.sample(queue.qsize())
+            if item is _DONE:
+                break
+            i, response = item
+            if isinstance(response, BaseException):
+                verdict = None
+            else:
+                started = time.perf_counter()
+                try:
+                    verdict = await loop.run_in_executor(executor, self.grade, units[i], response)
+                    error = False
+                except Exception as e:
+                    verdict, error = {"passed": False, "error": str(e), "failure_kind": "crash"}, True
+                self.grading.record(started, time.perf_counter(), error)
+            if self.collect:
+                results[i] = (response, verdict)
+            if self.on_result is not None:
+                self.on_result(i, response, verdict)
+
+    async def _run(self, units: list) -> list:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        results = [None] * len(units)
+        next_index = [0]
+        executor = ThreadPoolExecutor(max_workers=self.grade_workers)
+        consumers = [
+            asyncio.create_task(self._consume(units, queue, results, executor))
+            for _ in range(self.grade_workers)
+        ]
+        producers = [
+            asyncio.create_task(self._produce(units, next_index, queue))
+            for _ in range(min(self.generate_workers, len(units)) or 1)
+        ]
+        try:
+            await asyncio.gather(*producers)
+            for _ in consumers:
+                await queue.put(_DONE)
+            await asyncio.gather(*consumers)
+        finally:
+            # Clean shutdown on errors/Ctrl-C: stop both stages, drop queued grades
+            for task in producers + consumers:
+                task.cancel()
+            await asyncio.gather(*producers, *consumers, return_exceptions=True)
+            executor.shutdown(wait=True, cancel_futures=True)
+        return results
+
+    def run(self, units: list) -> list:
+        started = time.perf_counter()
+        try:
+            return asyncio.run(self._run(units))
+        finally:
+            self.wall = time.perf_counter() - started
+
+    def report(self) -> dict:
+        return {
+            "wall_seconds": round(self.wall, 3),
+            "generation": self.generation.report(),
+            "grading": self.grading.report(),
+            "queue": self.queue.report(),
+        }
@@ -0,0 +1,334 @@
+"""
+problem_store.py - Indexed problem store
+---------------------------------
+SQLite index over the problem set: small fields live in the index row, large
+ones (patches, test data, reference solutions) are loaded only when accessed.
+
+    python scripts/problem_store.py build problems/ extra_problems.jsonl
+    python scripts/problem_store.py list --dataset APPS --difficulty interview
+    python scripts/problem_store.py show HumanEval/96
+---------------------------------
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+import threading
+from collections.abc import Mapping
+
+
+DEFAULT_DB = os.path.join(".cache", "problems.sqlite")
+# Fields larger than this (as JSON), or listed in LAZY_FIELDS, are stored out
+# of line and loaded lazily
+LAZY_FIELD_BYTES = 1024
+LAZY_FIELDS = {"patch", "test_patch", "hints_text", "canonical_solution"}
+# Bumped when keys or columns change meaning; an older index is rebuilt
+SCHEMA_VERSION = 2
+
+
+# ---------------- Dataset Detection ---------------- #
+def detect_dataset(filename: str) -> str:
+    """Detect dataset type from filename."""
+    fname_upper = filename.upper()
+    if "HE" in fname_upper or "HUMANEVAL" in fname_upper:
+        return "HumanEval"
+    elif "MBPP" in fname_upper:
+        return "MBPP"
+    elif "APPS" in fname_upper:
+        return "APPS"
+    elif "SWE" in fname_upper:
+        return "SWE"
+    return "Unknown"
+
+
+def infer_dataset(data: dict, filename: str = "") -> str:
+    """Detect dataset type from the problem's fields, falling back to the filename."""
+    if "test_list" in data:
+        return "MBPP"
+    if "FAIL_TO_PASS" in data or "test_patch" in data:
+        return "SWE"
+    if "inputs" in data and "outputs" in data:
+        return "APPS"
+    if "test" in data and "entry_point" in data:
+        return "HumanEval"
+    return detect_dataset(filename)
+
+
+# ---------------- Lazy Problem ---------------- #
+class LazyProblem(Mapping):
+    """Read-only problem dict whose large fields are fetched on first access."""
+
+    def __init__(self, store, key: str, small: dict, lazy_fields: list):
+        self._store = store
+        self._key = key
+        self._data = dict(small)
+        self._lazy = [f for f in lazy_fields if f not in self._data]
+        self.key = key
+
+    def __getitem__(self, name):
+        if name not in self._data and name in self._lazy:
+            self._data[name] = self._store.load_field(self._key, name)
+        return self._data[name]
+
+    def __contains__(self, name):
+        return name in self._data or name in self._lazy
+
+    def __iter__(self):
+        yield from self._data
+        yield from (f for f in self._lazy if f not in self._data)
+
+    def __len__(self):
+        return len(set(self._data) | set(self._lazy))
+
+    def subset(self, fields) -> dict:
+        """Plain dict with only `fields` (e.g. for pickling to a grading worker)."""
+        return {f: self[f] for f in fields if f in self}
+
+    def __reduce__(self):
+        # Pickles as a fully materialized dict
+        return dict, (dict(self.items()),)
+
+
+# ---------------- Store ---------------- #
+class ProblemStore:
+    """SQLite-backed problem index with lazy loading of large fields."""
+
+    def __init__(self, path: str = DEFAULT_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Lazy fields may be loaded from grading threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.executescript("DROP TABLE IF EXISTS problems; DROP TABLE IF EXISTS fields; "
+                                     f"DROP TABLE IF EXISTS sources; PRAGMA user_version = {SCHEMA_VERSION};")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS problems (
+                key TEXT PRIMARY KEY,
+                task_id TEXT,
+                dataset TEXT NOT NULL,
+                difficulty TEXT,
+                source TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                small TEXT NOT NULL,
+                lazy_fields TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS problems_task_id ON problems (task_id);
+            CREATE INDEX IF NOT EXISTS problems_dataset ON problems (dataset, difficulty);
+            CREATE TABLE IF NOT EXISTS fields (
+                key TEXT NOT NULL,
+                name TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (key, name)
+            );
+            CREATE TABLE IF NOT EXISTS sources (
+                source TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            """
+        )
+
+    # ---- Import ----
+    def _source_unchanged(self, source: str) -> bool:
+        st = os.stat(source)
+        row = self._conn.execute("SELECT mtime, size FROM sources WHERE source = ?", (source,)).fetchone()
+        return row is not None and row[0] == st.st_mtime and row[1] == st.st_size
+
+    def _insert(self, key: str, data: dict, source: str, position: int, filename: str) -> bool:
+        dataset = infer_dataset(data, filename)
+        if dataset == "Unknown":
+            return False
+        small, lazy = {}, []
+        for name, value in data.items():
+            encoded = json.dumps(value, ensure_ascii=False)
+            if name in LAZY_FIELDS or len(encoded) > LAZY_FIELD_BYTES:
+                lazy.append(name)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO fields (key, name, value) VALUES (?, ?, ?)", (key, name, encoded)
+                )
+            else:
+                small[name] = value
+        task_id = data.get("task_id", data.get("instance_id"))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO problems VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, None if task_id is None else str(task_id), dataset, data.get("difficulty"),
+             source, position, filename, json.dumps(small, ensure_ascii=False), json.dumps(lazy)),
+        )
+        return True
+
+    def _forget_source(self, source: str):
+        keys = [r[0] for r in self._conn.execute("SELECT key FROM problems WHERE source = ?", (source,))]
+        self._conn.executemany("DELETE FROM fields WHERE key = ?", [(k,) for k in keys])
+        self._conn.execute("DELETE FROM problems WHERE source = ?", (source,))
+        self._conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+
+    def import_file(self, source: str, root: str = None) -> tuple[int, int]:
+        """Import a .json problem or a .jsonl file of problems; returns (imported, skipped).
+
+        Problems are keyed on the source path, so same-named files in different
+        directories stay apart; `filename` is the path relative to `root`
+        (default: the file's own directory).
+        """
+        source = os.path.normpath(source)
+        if self._source_unchanged(source):
+            return 0, 0
+        self._forget_source(source)
+        filename = os.path.relpath(source, root) if root else os.path.basename(source)
+        stem = os.path.splitext(source)[0].replace(os.sep, "/")
+        imported = skipped = 0
+        if source.endswith(".jsonl"):
+            with open(source, encoding="utf-8") as f:
+                for position, line in enumerate(f):
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    task_id = data.get("task_id", data.get("instance_id"))
+                    key = f"{stem}:{task_id if task_id is not None else position}"
+                    if self._insert(key, data, source, position, f"{filename}#{position + 1}"):
+                        imported += 1
+                    else:
+                        skipped += 1
+        else:
+            with open(source, encoding="utf-8") as f:
+                data = json.load(f)
+            if self._insert(stem, data, source, 0, filename):
+                imported += 1
+            else:
+                skipped += 1
+        st = os.stat(source)
+        self._conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (source, st.st_mtime, st.st_size))
+        self._conn.commit()
+        return imported, skipped
+
+    def sync_dir(self, problem_dir: str) -> tuple[int, int]:
+        """Import new/changed files under `problem_dir` (recursively) and drop deleted ones."""
+        problem_dir = os.path.normpath(problem_dir)
+        sources = sorted(
+            os.path.join(dirpath, f)
+            for dirpath, _, files in os.walk(problem_dir) for f in files
+            if f.endswith((".json", ".jsonl"))
+        )
+        imported = skipped = 0
+        for source in sources:
+            n, s = self.import_file(source, problem_dir)
+            imported += n
+            skipped += s
+        prefix = os.path.join(problem_dir, "")
+        known = [r[0] for r in self._conn.execute("SELECT source FROM sources")]
+        for source in known:
+            if source.startswith(prefix) and source not in sources:
+                self._forget_source(source)
+        self._conn.commit()
+        return imported, skipped
+
+    # ---- Queries ----
+    def _problem(self, row) -> LazyProblem:
+        key, dataset, filename, small, lazy = row
+        problem = LazyProblem(self, key, json.loads(small), json.loads(lazy))
+        problem.dataset = dataset
+        problem.filename = filename
+        return problem
+
+    def get(self, task_id: str) -> LazyProblem:
+        """Fetch by store key (e.g. 'problems/HE_1'), its last path part ('HE_1')
+        or the problem's own task_id."""
+        row = self._conn.execute(
+            "SELECT key, dataset, filename, small, lazy_fields FROM problems "
+            "WHERE key = ? OR task_id = ? OR substr(key, -length(?) - 1) = '/' || ? "
+            "ORDER BY key = ? DESC, task_id = ? DESC LIMIT 1",
+            (task_id, str(task_id), task_id, task_id, task_id, str(task_id))
+        ).fetchone()
+        if row is None:
+            raise KeyError(task_id)
+        return self._problem(row)
+
+    def iter(self, dataset: str = None, difficulty: str = None, problem_dir: str = None):
+        """Yield problems in import order, optionally filtered; with `problem_dir`,
+        only those imported from files under it (the index may hold other directories)."""
+        query = "SELECT key, dataset, filename, small, lazy_fields FROM problems WHERE 1=1"
+        params = []
+        if dataset:
+            query += " AND dataset = ?"
+            params.append(dataset)
+        if difficulty:
+            query += " AND difficulty = ?"
+            params.append(difficulty)
+        if problem_dir:
+            prefix = os.path.join(os.path.normpath(problem_dir), "")
+            query += " AND substr(source, 1, ?) = ?"
+            params += [len(prefix), prefix]
+        query += " ORDER BY source, position"
+        # fetchall: callers may load lazy fields (new queries) while iterating
+        for row in self._conn.execute(query, params).fetchall():
+            yield self._problem(row)
+
+    def load_field(self, key: str, name: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM fields WHERE key = ? AND name = ?", (key, name)
+            ).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return json.loads(row[0])
+
+    def count(self) -> dict:
+        return dict(self._conn.execute("SELECT dataset, COUNT(*) FROM problems GROUP BY dataset").fetchall())
+
+    def close(self):
+        self._conn.close()
+
+
+def open_store(problem_dir: str, db_path: str = DEFAULT_DB) -> ProblemStore:
+    """Open the store and bring it up to date with `problem_dir` (query it with
+    `iter(problem_dir=...)` to leave out other directories in the same index)."""
+    store = ProblemStore(db_path)
+    store.sync_dir(problem_dir)
+    return store
+
+
+# ---------------- CLI ---------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the problem store.")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Import problem directories and .json/.jsonl files")
+    build.add_argument("sources", nargs="+")
+
+    ls = sub.add_parser("list", help="List problems")
+    ls.add_argument("--dataset")
+    ls.add_argument("--difficulty")
+    ls.add_argument("--problems", help="Only problems imported from this directory")
+
+    show = sub.add_parser("show", help="Print one problem")
+    show.add_argument("task_id")
+
+    args = parser.parse_args()
+    store = ProblemStore(args.db)
+
+    if args.command == "build":
+        imported = skipped = 0
+        for source in args.sources:
+            if os.path.isdir(source):
+                n, s = store.sync_dir(source)
+            else:
+                n, s = store.import_file(source)
+            imported += n
+            skipped += s
+        print(f"📦 Imported {imported} problems ({skipped} rows without problem fields skipped)")
+        print(f"   {store.count()}")
+    elif args.command == "list":
+        for problem in store.iter(args.dataset, args.difficulty, args.problems):
+            print(f"{problem.key:24} {problem.dataset:10} {problem.get('difficulty') or '':14} {problem.filename}")
+    elif args.command == "show":
+        print(json.dumps(dict(store.get(args.task_id).items()), indent=2, ensure_ascii=False))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
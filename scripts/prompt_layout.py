@@ -0,0 +1,92 @@
+"""
+prompt_layout.py - Request assembly around a shared, cacheable prompt prefix
+---------------------------------
+Providers bill a repeated prompt prefix at a discount and start answering
+sooner: OpenAI caches exact prefixes automatically, Anthropic up to each
+`cache_control` breakpoint. The original layout puts every strategy's own
+system prompt first and wraps the problem in its own template, so no two
+calls of a task share more than a few tokens.
+
+The "prefix" layout sends, for every strategy of a task:
+
+    system:  SHARED_SYSTEM                      (same for every call)
+    user:    [problem text] [strategy instructions]
+
+The problem is its own content part, so it can carry a breakpoint, and
+the strategy's system remainder and template text follow it. Repair turns
+are appended after that. "legacy" reproduces the original requests.
+---------------------------------
+"""
+
+from grade_cache import content_hash
+
+
+PREFIX = "prefix"
+LEGACY = "legacy"
+LAYOUTS = (PREFIX, LEGACY)
+# Opening sentence every strategy's system prompt shares; the rest moves after the problem
+SHARED_SYSTEM = "You are a professional Python programmer."
+
+
+def message_text(message: dict) -> str:
+    """Text of a chat message whose content is a string or a list of text parts."""
+    content = message.get("content") or ""
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content)
+
+
+def instructions(strategy_config: dict) -> str:
+    """What a strategy adds after the problem: its own system sentences, then the
+    template text after `{prompt}`. Text before `{prompt}` is a label ("Problem: ")
+    and is dropped so the problem part is identical across strategies."""
+    system = strategy_config["system"]
+    if system.startswith(SHARED_SYSTEM):
+        system = system[len(SHARED_SYSTEM):]
+    _, _, tail = strategy_config["user_template"].partition("{prompt}")
+    return "\n\n".join(part for part in (system.strip(), tail.strip()) if part)
+
+
+def build_messages(prompt: str, strategy_config: dict, layout: str = PREFIX) -> list:
+    """Chat messages for one strategy in the given layout."""
+    if layout == LEGACY:
+        return [
+            {"role": "system", "content": strategy_config["system"]},
+            {"role": "user", "content": strategy_config["user_template"].format(prompt=prompt)},
+        ]
+    parts = [{"type": "text", "text": prompt}]
+    extra = instructions(strategy_config)
+    if extra:
+        parts.append({"type": "text", "text": "\n\n" + extra})
+    return [
+        {"role": "system", "content": SHARED_SYSTEM},
+        {"role": "user", "content": parts},
+    ]
+
+
+def prompt_cache_key(messages: list) -> str:
+    """Routing key for OpenAI's prompt cache: the system prompt and problem part.
+
+    None unless the request uses the prefix layout.
+    """
+    user = next((m for m in messages if m["role"] == "user"), None)
+    if user is None or isinstance(user["content"], str):
+        return None
+    system = "".join(message_text(m) for m in messages if m["role"] == "system")
+    return content_hash(system, user["content"][0]["text"])[:32]
+
+
+def cache_breakpoints(messages: list) -> list:
+    """Anthropic messages with `cache_control` on the shared problem part and, in a
+    multi-turn conversation, on the last turn (so the next round reads it back)."""
+    marked = []
+    for message in messages:
+        content = message["content"]
+        blocks = [{"type": "text", "text": content}] if isinstance(content, str) else [dict(p) for p in content]
+        marked.append({"role": message["role"], "content": blocks})
+    first_user = next((m for m in marked if m["role"] == "user"), None)
+    if first_user is not None and len(first_user["content"]) > 1:
+        first_user["content"][0]["cache_control"] = {"type": "ephemeral"}
+    if len(marked) > 1:
+        marked[-1]["content"][-1]["cache_control"] = {"type": "ephemeral"}
+    return marked
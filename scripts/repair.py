@@ -0,0 +1,145 @@
+"""
+repair.py - Multi-turn repair loop driven by real test failures
+---------------------------------
+The `self_repair` variant starts from the self_debugging answer and, while
+the tests fail, sends the grader's error and the failing test back to the
+model, for up to --repair-rounds extra turns. Turns are appended to the
+conversation, never rewritten, so the prompt prefix stays byte-identical and
+providers with prompt caching only bill the new suffix in full. Each round's
+verdict, tokens and latency are kept for the accuracy-per-cost summary.
+---------------------------------
+"""
+
+import asyncio
+
+from sandbox import ENV_ERROR, FAILED
+
+
+REPAIR_STRATEGY = "self_repair"
+# The first turn is the self_debugging request, so it shares that answer's cache
+# entry (or its in-flight call, see eval_gpt.make_generator)
+FIRST_TURN_STRATEGY = "self_debugging"
+FEEDBACK_CHARS = 1500
+
+ROUND_FIELDS = ("cache", "prompt_tokens", "completion_tokens", "latency_seconds", "queue_seconds")
+
+
+def _clip(text: str, limit: int = FEEDBACK_CHARS) -> str:
+    text = str(text)
+    return text if len(text) <= limit else text[:limit] + " ...[truncated]"
+
+
+def failing_test(verdict: dict, data: dict, dataset: str) -> str:
+    """Source / input of the first failing test, when the grader reported one."""
+    failed = [t for t in verdict.get("tests", []) if not t.get("passed")]
+    if not failed:
+        return ""
+    test = failed[0]
+    if dataset == "SWE":
+        return "Failing tests:\n" + "\n".join(t["id"] for t in failed[:10])
+    index = test.get("index")
+    if dataset == "MBPP" and index is not None:
+        return f"Failing test:\n{data['test_list'][index]}"
+    if dataset == "APPS" and index is not None:
+        return (f"Failing test input:\n{_clip(data['inputs'][index][0])}\n"
+                f"Expected output:\n{_clip(data['outputs'][index][0])}")
+    return ""
+
+
+def _test_source(verdict: dict, data: dict, dataset: str) -> str:
+    test = failing_test(verdict, data, dataset)
+    if not test and dataset == "HumanEval" and data.get("test"):
+        # check() is a single test, so show it whole
+        test = f"Tests:\n{_clip(data['test'])}"
+    return test
+
+
+def feedback_message(verdict: dict, data: dict, dataset: str) -> str:
+    """User turn telling the model how its last answer failed."""
+    parts = ["Your solution failed the tests."]
+    test = _test_source(verdict, data, dataset)
+    if test:
+        parts.append(test)
+    # Bare `assert` failures carry no message
+    kind = verdict.get("failure_kind")
+    error = verdict.get("error") or ("AssertionError" if kind in (FAILED, None) else kind)
+    parts.append(f"Error: {_clip(error)}")
+    if dataset == "SWE":
+        parts.append("Fix the patch. Reply with the complete corrected unified diff in a ```diff code block.")
+    else:
+        parts.append("Fix the code. Reply with the complete corrected function in a single ```python code block.")
+    return "\n\n".join(parts)
+
+
+def round_record(index: int, verdict: dict, call: dict = None) -> dict:
+    record = {"round": index, "passed": verdict["passed"], "error": _clip(verdict["error"], 200)}
+    for field in ROUND_FIELDS:
+        record[field] = (call or {}).get(field)
+    return record
+
+
+def total_call(rounds: list) -> dict:
+    """One call record (see call_metrics.py) covering every round of a repair."""
+    def total(field):
+        return sum(r[field] or 0 for r in rounds)
+
+    return {
+        "cache": "hit" if all(r["cache"] == "hit" for r in rounds) else "miss",
+        "prompt_tokens": total("prompt_tokens"),
+        "completion_tokens": total("completion_tokens"),
+        "ttft_seconds": None,
+        "latency_seconds": round(total("latency_seconds"), 6),
+        "queue_seconds": round(total("queue_seconds"), 6),
+        "retries": 0,
+        "stopped_early": False,
+    }
+
+
+async def run_repair(generate, grade, request: dict, max_rounds: int, feedback) -> tuple:
+    """Answer, grade and feed failures back until the tests pass or rounds run out.
+
+    `generate(strategy, request)` is awaited for each turn and returns the
+    response and that turn's call record, `grade(response)` (blocking) runs
+    in a thread and `feedback(verdict)` builds the next user turn.
+    Returns (final response, per-round records).
+    """
+    rounds = []
+    strategy = FIRST_TURN_STRATEGY
+    for index in range(max_rounds + 1):
+        response, call = await generate(strategy, request)
+        verdict = await asyncio.to_thread(grade, response)
+        rounds.append(round_record(index, verdict, call))
+        # A missing environment will not be fixed by the model
+        if verdict["passed"] or verdict.get("failure_kind") == ENV_ERROR or index == max_rounds:
+            return response, rounds
+        request = {**request, "messages": request["messages"] + [
+            {"role": "assistant", "content": response},
+            {"role": "user", "content": feedback(verdict)},
+        ]}
+        strategy = REPAIR_STRATEGY
+
+
+def round_curve(histories: list, prices: dict = None) -> list:
+    """Per round k: share of tasks solved by round k and mean cost up to it.
+
+    A task that stopped early (passed) keeps its last outcome and cost.
+    """
+    if not histories:
+        return []
+    prices = prices or {}
+    depth = max(len(h) for h in histories)
+    curve = []
+    for k in range(depth):
+        passed = seconds = tokens = dollars = 0.0
+        for history in histories:
+            done = history[:k + 1]
+            passed += done[-1]["passed"]
+            seconds += sum(r["latency_seconds"] or 0 for r in done)
+            prompt = sum(r["prompt_tokens"] or 0 for r in done)
+            completion = sum(r["completion_tokens"] or 0 for r in done)
+            tokens += prompt + completion
+            dollars += (prompt * prices.get("prompt", 0) + completion * prices.get("completion", 0)) / 1e6
+        n = len(histories)
+        curve.append({"round": k, "pass_rate": passed / n, "seconds": seconds / n,
+                      "tokens": tokens / n, "dollars": dollars / n})
+    return curve
@@ -0,0 +1,195 @@
+"""
+resilience.py - Retry, adaptive concurrency and circuit breaking
+---------------------------------
+Provider-agnostic pieces used by the async engine to ride out rate limits
+and transient server errors:
+
+  RetryPolicy         jittered exponential backoff that honors Retry-After
+  AdaptiveLimit       AIMD concurrency limit driven by 429 responses
+  CircuitBreaker      fails fast after repeated errors, probes after a cooldown
+---------------------------------
+"""
+
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+
+
+RETRY_STATUS = (408, 409, 429, 500, 502, 503, 504)
+# SDK exception names for transport failures (openai / anthropic share them)
+_TRANSPORT_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+
+# ---------------- Error Classification ---------------- #
+def status_of(error: BaseException):
+    return getattr(error, "status_code", None)
+
+
+def is_rate_limit(error: BaseException) -> bool:
+    return status_of(error) == 429
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, CircuitOpenError):
+        return True
+    if status_of(error) in RETRY_STATUS:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    return any(cls.__name__ in _TRANSPORT_ERRORS for cls in type(error).__mro__)
+
+
+def retry_after(error: BaseException):
+    """Seconds the server asked us to wait (retry-after-ms / Retry-After), or None."""
+    if isinstance(error, CircuitOpenError):
+        return error.retry_after
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+# ---------------- Retry Policy ---------------- #
+class RetryPolicy:
+    """Full-jitter exponential backoff; a Retry-After hint replaces the computed delay."""
+
+    def __init__(self, max_attempts: int = 6, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, error: BaseException) -> float:
+        """Seconds to wait after failed attempt number `attempt` (1-based)."""
+        hint = retry_after(error)
+        if hint is not None:
+            # Small jitter so clients told the same Retry-After do not return in lockstep
+            return min(self.max_delay, hint) + random.uniform(0, 0.1 * self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def should_retry(self, attempt: int, error: BaseException) -> bool:
+        return attempt < self.max_attempts and is_retryable(error)
+
+
+# ---------------- AIMD Concurrency ---------------- #
+class AdaptiveLimit:
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    Each success adds 1/limit (about +1 per limit's worth of calls); each 429
+    multiplies the limit by `decrease`, at most once per `cooldown` seconds
+    so a burst of 429s from one overload counts once.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease: float = 0.5, cooldown: float = 1.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.limit = float(max_limit)
+        self.lowest = float(max_limit)
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._cond = None
+
+    async def acquire(self):
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, success: bool = True, rate_limited: bool = False):
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if rate_limited:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self.lowest = min(self.lowest, self.limit)
+                    self.decreases += 1
+                    self._last_decrease = now
+            elif success:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+# ---------------- Circuit Breaker ---------------- #
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit open; retrying in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures -> half-open after
+    `reset_timeout` (one probe call) -> closed on success, open again (with doubled
+    timeout, capped at `max_reset_timeout`) on failure.
+
+    Rate-limit errors are handled by the adaptive limit and do not trip the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 30.0,
+                 max_reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now."""
+        if self.state == self.CLOSED:
+            return
+        remaining = self._opened_at + self.reset_timeout - time.monotonic()
+        if self.state == self.OPEN and remaining <= 0:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        raise CircuitOpenError(max(remaining, 0.5))
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.reset_timeout = self.base_reset_timeout
+        self._probing = False
+
+    def record_failure(self, error: BaseException):
+        if is_rate_limit(error) or not is_retryable(error):
+            # Throttling, or a bad request that says nothing about service health
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+            return
+        if self.state == self.HALF_OPEN:
+            self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            self._open()
+            return
+        self.failures += 1
+        if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.trips += 1
+        self._opened_at = time.monotonic()
+        self._probing = False
@@ -0,0 +1,159 @@
+"""
+results_io.py - Streaming results storage
+---------------------------------
+Appends one JSONL record per (task, strategy) as it finishes, reads them back
+for --resume, and converts JSONL into the pretty JSON results format:
+
+    python scripts/results_io.py results_gpt_4o_X.jsonl [results_gpt_4o_X.json]
+---------------------------------
+"""
+
+import os
+import sys
+import json
+import time
+
+
+# Fields copied from a task into every per-strategy record
+TASK_FIELDS = ("task_id", "dataset", "prompt", "filename")
+
+
+def _drop_partial_line(path: str):
+    """Truncate a half-written final record so appends start on a fresh line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Scan back to the last complete line
+        pos = size - 1
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            idx = chunk.rfind(b"\n")
+            if idx != -1:
+                pos = pos - step + idx + 1
+                break
+            pos -= step
+        f.truncate(pos)
+
+
+class JsonlWriter:
+    """Append-only JSONL writer with batched fsync."""
+
+    def __init__(self, path: str, fsync_every: int = 20, fsync_interval: float = 5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        _drop_partial_line(path)
+        self._file = open(path, "a", encoding="utf-8")
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._pending += 1
+        if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_jsonl(path: str) -> list:
+    """Read records, ignoring a truncated final line left by a crash."""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def write_jsonl(rows: list, path: str):
+    """Write `rows` to `path` as JSONL, replacing the file."""
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def unit_key(record: dict) -> tuple:
+    """Identity of a work unit: (problem file, strategy)."""
+    return record["filename"], record["strategy"]
+
+
+def completed_units(path: str) -> dict:
+    """Map unit_key -> latest record for every unit already in `path`."""
+    return {unit_key(r): r for r in read_jsonl(path)}
+
+
+def group_records(records: list) -> list:
+    """Fold per-strategy records into the per-task results format."""
+    latest = {}
+    for record in records:
+        latest[unit_key(record)] = record
+
+    tasks = {}
+    for record in sorted(latest.values(), key=lambda r: r.get("seq", 0)):
+        task = tasks.get(record["filename"])
+        if task is None:
+            task = {field: record.get(field) for field in TASK_FIELDS if field != "filename"}
+            task["strategies"] = {}
+            task["filename"] = record["filename"]
+            tasks[record["filename"]] = task
+        task["strategies"][record["strategy"]] = {
+            k: v for k, v in record.items()
+            if k not in TASK_FIELDS and k not in ("strategy", "seq")
+        }
+    return list(tasks.values())
+
+
+def jsonl_to_json(src: str, dst: str = None) -> str:
+    """Convert a JSONL results file into the pretty JSON format; returns dst."""
+    dst = dst or os.path.splitext(src)[0] + ".json"
+    results = group_records(read_jsonl(src))
+    tmp = dst + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp, dst)
+    return dst
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python scripts/results_io.py RESULTS.jsonl [OUTPUT.json]")
+        sys.exit(1)
+    dst = jsonl_to_json(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"🗂  Wrote {dst}")
+
+
+if __name__ == "__main__":
+    main()
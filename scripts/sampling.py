@@ -0,0 +1,66 @@
+"""
+sampling.py - pass@k sampling helpers
+---------------------------------
+Deduplicates sampled programs before grading and computes the unbiased
+pass@k estimator (Chen et al., 2021): 1 - C(n-c, k) / C(n, k)
+---------------------------------
+"""
+
+from math import comb
+
+from graders import clean_code
+
+
+PASS_AT_K = (1, 5, 10)
+
+
+def pass_at_k(n: int, c: int, k: int) -> float:
+    """Unbiased pass@k for n samples of which c are correct."""
+    if n - c < k:
+        return 1.0
+    return 1.0 - comb(n - c, k) / comb(n, k)
+
+
+def dedupe_programs(responses: list, key=clean_code) -> tuple[list, list]:
+    """Group responses by their cleaned program (`key(response)`).
+
+    Returns (representatives, index) where representatives[j] is the first raw
+    response of each distinct program and index[i] is the group of responses[i].
+    """
+    groups, representatives, index = {}, [], []
+    for response in responses:
+        program = key(response)
+        if program not in groups:
+            groups[program] = len(representatives)
+            representatives.append(response)
+        index.append(groups[program])
+    return representatives, index
+
+
+def grade_samples(responses: list, grade, key=clean_code) -> dict:
+    """Grade each distinct program once via `grade(response)` and summarize.
+
+    The top-level passed/error/failure_kind describe the first sample, so the
+    regular per-strategy tables stay a single-sample (pass@1) measurement.
+    """
+    representatives, index = dedupe_programs(responses, key)
+    unique_verdicts = [grade(r) for r in representatives]
+    verdicts = [unique_verdicts[j] for j in index]
+
+    n = len(responses)
+    c = sum(v["passed"] for v in verdicts)
+    first = verdicts[0]
+    return {
+        "passed": first["passed"],
+        "error": first["error"],
+        "failure_kind": first["failure_kind"],
+        "num_samples": n,
+        "num_unique": len(representatives),
+        "num_correct": c,
+        "pass@k": {str(k): round(pass_at_k(n, c, k), 6) for k in PASS_AT_K if k <= n},
+        "samples": [
+            {"passed": v["passed"], "error": v["error"] if not v["passed"] else "",
+             "failure_kind": v["failure_kind"], "code": r}
+            for r, v in zip(responses, verdicts)
+        ],
+    }
@@ -0,0 +1,310 @@
+"""
+sandbox.py - Process-pool grading backend
+---------------------------------
+Runs model code in recycled worker processes with wall-clock/CPU timeouts
+and a memory rlimit, so a runaway candidate only takes down its own worker.
+
+With fork_per_candidate, each worker is instead a warm parent (zygote) that
+never runs model code: it imports the modules generated code commonly uses,
+compiles every task's tests once, then forks a copy-on-write child per
+candidate. Each candidate gets a pristine process for about the cost of a
+fork, and the parent never needs recycling.
+---------------------------------
+"""
+
+import os
+import sys
+import gc
+import time
+import queue
+import pickle
+import select
+import signal
+import importlib
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, wall-clock timeout still applies
+    resource = None
+
+import graders
+
+
+# Failure kinds recorded alongside each result
+PASSED = ""
+FAILED = "failed"      # tests ran and failed, or the code raised
+TIMEOUT = "timeout"    # wall-clock or CPU limit exceeded
+OOM = "oom"            # memory limit exceeded
+CRASH = "crash"        # worker died for any other reason
+ENV_ERROR = "env_error"  # task environment unavailable (e.g. SWE mirror/venv missing)
+
+# Imported once in each zygote, so forked graders find them in sys.modules
+PRELOAD_MODULES = ("re", "math", "collections", "functools", "itertools", "heapq", "bisect",
+                   "string", "operator", "typing", "copy", "random", "statistics", "fractions", "decimal")
+# Seconds the pool waits past `timeout` for a zygote to report its own kill
+ZYGOTE_GRACE = 2.0
+
+
+def mp_context():
+    """Start method for worker processes: forkserver where available."""
+    methods = mp.get_all_start_methods()
+    return mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+# ---------------- Worker Process ---------------- #
+def set_cpu_limit(cpu_seconds: int):
+    """RLIMIT_CPU is cumulative, so move the soft limit to usage + budget per task."""
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + cpu_seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def isolate(memory_mb: int):
+    """Memory rlimit and silenced output for a worker process."""
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    # Generated code may print freely; keep it out of the evaluator's output
+    devnull = open(os.devnull, "w")
+    sys.stdout = sys.stderr = devnull
+
+
+def _grade(data: dict, dataset: str, code: str, options: dict) -> tuple:
+    """(passed, error, failure kind, per-test report) for one candidate."""
+    report = []
+    try:
+        passed, error = graders.grade_code(data, dataset, code, report=report, **options)
+        return passed, error, PASSED if passed else FAILED, report
+    except MemoryError:
+        return False, "MemoryError: memory limit exceeded", OOM, report
+    except BaseException as e:  # SystemExit and friends from generated code
+        return False, f"{type(e).__name__}: {e}", FAILED, report
+
+
+def _worker_main(conn, cpu_seconds: int, memory_mb: int):
+    """Grade jobs received over `conn` until the pipe closes."""
+    isolate(memory_mb)
+
+    while True:
+        try:
+            data, dataset, code, options = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        set_cpu_limit(cpu_seconds)
+        verdict = _grade(data, dataset, code, options)
+        try:
+            conn.send(verdict)
+        except MemoryError:
+            conn.send((False, "MemoryError: memory limit exceeded", OOM, []))
+
+
+# ---------------- Zygote Worker ---------------- #
+def _forked_child(job: tuple, wfd: int, cpu_seconds: int, memory_mb: int):
+    """Runs in the forked child: limits, grade, pickle the verdict to `wfd`, exit."""
+    try:
+        if resource is not None:
+            if memory_mb:
+                limit = memory_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+            if cpu_seconds:
+                # A forked child's CPU time starts at zero
+                _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+                resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, hard))
+        try:
+            payload = pickle.dumps(_grade(*job))
+        except MemoryError:
+            payload = pickle.dumps((False, "MemoryError: memory limit exceeded", OOM, []))
+        with os.fdopen(wfd, "wb") as f:
+            f.write(payload)
+    finally:
+        # Skip atexit handlers and buffered state inherited from the zygote
+        os._exit(0)
+
+
+def _read_child(rfd: int, timeout: float) -> tuple:
+    """(pickled verdict or b"", timed out) from a child's pipe."""
+    chunks = []
+    deadline = time.monotonic() + timeout
+    with os.fdopen(rfd, "rb", buffering=0) as f:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([f], [], [], remaining)[0]:
+                return b"", True
+            chunk = f.read(65536)
+            if not chunk:
+                return b"".join(chunks), False
+            chunks.append(chunk)
+
+
+def _fork_grade(job: tuple, cpu_seconds: int, memory_mb: int, timeout: float) -> tuple:
+    rfd, wfd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(rfd)
+        _forked_child(job, wfd, cpu_seconds, memory_mb)
+    os.close(wfd)
+    payload, timed_out = _read_child(rfd, timeout)
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    _, status = os.waitpid(pid, 0)
+    if payload:
+        try:
+            return pickle.loads(payload)
+        except Exception:
+            pass  # Truncated by a crash mid-write
+    if timed_out:
+        return False, f"Timed out after {timeout}s", TIMEOUT, []
+    if os.WIFSIGNALED(status):
+        sig = os.WTERMSIG(status)
+        if sig == getattr(signal, "SIGXCPU", None):
+            return False, f"CPU time limit exceeded ({cpu_seconds}s)", TIMEOUT, []
+        if sig == signal.SIGKILL:
+            return False, "Worker killed (out of memory)", OOM, []
+    return False, f"Worker exited unexpectedly (exit code {os.waitstatus_to_exitcode(status)})", CRASH, []
+
+
+def _zygote_main(conn, cpu_seconds: int, memory_mb: int, timeout: float, fixtures: list = None):
+    """Preload, then fork one child per job received over `conn` until the pipe closes."""
+    devnull = open(os.devnull, "w")
+    sys.stdout = sys.stderr = devnull
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    graders.preload_fixtures(fixtures or [])
+    # Keep the preloaded objects out of GC passes, which would dirty shared pages in every child
+    gc.freeze()
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        conn.send(_fork_grade(job, cpu_seconds, memory_mb, timeout))
+
+
+class Worker:
+    """One sandbox process plus the parent's end of its pipe.
+
+    `target` replaces the grading loop (e.g. efficiency._profile_main); it is
+    called with the pipe, the limits and `args`.
+    """
+
+    def __init__(self, ctx, cpu_seconds: int, memory_mb: int, target=None, args: tuple = ()):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=target or _worker_main, args=(child_conn, cpu_seconds, memory_mb, *args), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        self.conn.close()
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+
+
+# ---------------- Pool ---------------- #
+class SandboxPool:
+    """Grades candidates in a pool of isolated worker processes.
+
+    Each call to `grade` is blocking and thread-safe; `grade_many` fans jobs
+    out across all workers and returns verdicts in job order.
+    """
+
+    def __init__(self, workers: int = None, timeout: float = 10.0, cpu_seconds: int = 10,
+                 memory_mb: int = 2048, max_tasks_per_worker: int = 50,
+                 fork_per_candidate: bool = False, fixtures: list = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        # Zygote workers need os.fork (not on Windows)
+        self.fork_per_candidate = fork_per_candidate and hasattr(os, "fork")
+        # (grading view, dataset) pairs whose tests zygotes compile before forking
+        self.fixtures = fixtures or []
+        self._ctx = mp_context()
+        self._idle = queue.Queue()
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> Worker:
+        if self.fork_per_candidate:
+            return Worker(self._ctx, self.cpu_seconds, self.memory_mb, target=_zygote_main,
+                           args=(self.timeout, self.fixtures))
+        return Worker(self._ctx, self.cpu_seconds, self.memory_mb)
+
+    def _classify_death(self, worker: Worker) -> tuple[str, str]:
+        worker.process.join(timeout=1)
+        code = worker.process.exitcode
+        if code == -getattr(signal, "SIGXCPU", -1):
+            return TIMEOUT, f"CPU time limit exceeded ({self.cpu_seconds}s)"
+        if code == -signal.SIGKILL:
+            # Not killed by us, so most likely the kernel OOM killer
+            return OOM, "Worker killed (out of memory)"
+        return CRASH, f"Worker exited unexpectedly (exit code {code})"
+
+    def grade(self, data: dict, dataset: str, code: str, options: dict = None) -> dict:
+        """Grade one candidate; returns passed/error/failure_kind (+ per-test `tests`).
+
+        `options` are passed to graders.grade_code (test `order`, grading `mode`).
+        """
+        worker = self._idle.get()
+        tests = []
+        # A zygote enforces the timeout on its child and reports it
+        wait = self.timeout + ZYGOTE_GRACE if self.fork_per_candidate else self.timeout
+        try:
+            worker.conn.send((data, dataset, code, options or {}))
+            if worker.conn.poll(wait):
+                passed, error, kind, tests = worker.conn.recv()
+            else:
+                worker.kill()
+                worker = self._spawn()
+                passed, error, kind = False, f"Timed out after {self.timeout}s", TIMEOUT
+        except (EOFError, OSError):
+            kind, error = self._classify_death(worker)
+            passed = False
+            worker.kill()
+            worker = self._spawn()
+
+        worker.tasks += 1
+        # Zygotes never run model code, so only plain workers are recycled
+        if not self.fork_per_candidate and worker.tasks >= self.max_tasks_per_worker:
+            worker.stop()
+            worker = self._spawn()
+        self._idle.put(worker)
+        verdict = {"passed": passed, "error": error, "failure_kind": kind}
+        if tests:
+            verdict["tests"] = tests
+        return verdict
+
+    def grade_many(self, jobs: list) -> list:
+        """Grade (data, dataset, code) jobs in parallel; verdicts keep job order."""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(lambda job: self.grade(*job), jobs))
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
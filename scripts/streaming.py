@@ -0,0 +1,95 @@
+"""
+streaming.py - Streamed completions with early stop
+---------------------------------
+Accumulates streamed chat chunks per choice and tells the caller when a
+stop condition holds for every choice (by default: the fenced block the
+grader will pick has been closed), so the stream can be cancelled instead
+of paying for the prose that strategies like chain_of_thought append after
+the code
+---------------------------------
+"""
+
+import time
+from functools import partial
+
+from call_metrics import usage_dict
+from graders import answer_block_closed
+from prompt_layout import message_text
+
+
+def code_block_closed(text: str, dataset: str = None) -> bool:
+    """A ```python (or untagged) block, or a diff for SWE, has been closed;
+    earlier blocks in other languages (plans, shell snippets) are streamed past."""
+    return answer_block_closed(text, dataset)
+
+
+# --stop-on choices; None streams the whole transcript
+STOP_CONDITIONS = {
+    "code_block": code_block_closed,
+    "none": None,
+}
+
+
+def unit_stop(stop, dataset: str = None):
+    """`stop` bound to the unit's dataset (SWE answers close a diff, not Python)."""
+    return partial(stop, dataset=dataset) if stop is not None else None
+
+
+def stream_params() -> dict:
+    """Extra create() arguments for a streamed request that still reports usage."""
+    return {"stream": True, "stream_options": {"include_usage": True}}
+
+
+class StreamAccumulator:
+    """Collects streamed deltas for `n` choices and checks the stop condition."""
+
+    def __init__(self, n: int = 1, stop=None):
+        self.buffers = [[] for _ in range(n)]
+        self.stop = stop
+        # Created before the request is sent, so TTFT includes the wait for headers
+        self.started = time.perf_counter()
+        self.ttft = None
+        self.chunks = 0
+        self.usage = None
+        self.stopped_early = False
+        self._satisfied = [False] * n
+
+    def feed(self, chunk) -> bool:
+        """Add one OpenAI chat chunk; returns True once every choice meets the stop condition."""
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = usage_dict(chunk.usage)
+        for choice in chunk.choices or ():
+            delta = choice.delta.content if choice.delta else None
+            if delta:
+                self.add(choice.index, delta)
+        return self.stopped_early
+
+    def add(self, index: int, delta: str) -> bool:
+        """Add text to choice `index` (provider-neutral form of feed)."""
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+        self.chunks += 1
+        self.buffers[index].append(delta)
+        # Fences are made of backticks, so only re-check when one arrives
+        if self.stop is not None and "`" in delta and not self._satisfied[index]:
+            self._satisfied[index] = self.stop("".join(self.buffers[index]))
+            if all(self._satisfied):
+                self.stopped_early = True
+        return self.stopped_early
+
+    def contents(self) -> list:
+        return ["".join(parts).strip() for parts in self.buffers]
+
+    def fill_call(self, call: dict, request: dict):
+        """Copy timing/usage into a call record (see call_metrics.py).
+
+        A cancelled stream never receives the usage chunk, so tokens are then
+        approximated: prompt characters / 4, and one token per content chunk.
+        """
+        call["ttft_seconds"] = round(self.ttft, 6) if self.ttft is not None else None
+        call["stopped_early"] = self.stopped_early
+        if self.usage:
+            call.update(self.usage)
+        else:
+            call["prompt_tokens"] = sum(len(message_text(m)) for m in request.get("messages", [])) // 4
+            call["completion_tokens"] = self.chunks
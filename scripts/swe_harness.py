@@ -0,0 +1,300 @@
+"""
+swe_harness.py - SWE-bench grading from local mirrors
+---------------------------------
+Grades a model patch against one SWE-bench instance without cloning or
+installing anything per task:
+
+  mirrors/<owner>__<name>.git        bare `git clone --mirror` per repo
+  venvs/<owner>__<name>__<version>/  prebuilt virtualenv per (repo, version)
+  worktrees/                         throwaway `git worktree` at base_commit
+
+The model diff and the instance's test_patch are applied to a fresh worktree,
+then only the FAIL_TO_PASS / PASS_TO_PASS test ids are run, split across
+parallel pytest processes. Grading never touches the network; mirrors and
+venvs are seeded beforehand with:
+
+    python scripts/swe_harness.py mirror problems/SWE_*.json
+    python scripts/swe_harness.py venv problems/SWE_*.json
+---------------------------------
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: worktree add/remove is serialized per process only
+    fcntl = None
+
+from graders import extract_patch
+from sandbox import PASSED, FAILED, TIMEOUT, ENV_ERROR
+
+
+SWE_HOME = os.environ.get("SWE_HOME", os.path.join(".cache", "swe"))
+SWE_TEST_WORKERS = 4
+SWE_TIMEOUT = 900.0
+GIT_TIMEOUT = 300.0
+
+# pytest -rA summary statuses that count as a pass (same as the SWE-bench harness)
+_PASS_STATUSES = ("PASSED", "XFAIL")
+_STATUS_LINE = re.compile(r"^(PASSED|FAILED|ERROR|SKIPPED|XFAIL|XPASS) (.+)$")
+
+
+class SWEEnvError(Exception):
+    """The instance could not be set up (missing mirror/venv, bad test_patch)."""
+
+
+def repo_slug(repo: str) -> str:
+    return repo.replace("/", "__")
+
+
+def _git(*args, cwd: str = None, timeout: float = GIT_TIMEOUT) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, timeout=timeout)
+
+
+def parse_pytest_report(output: str) -> dict:
+    """Map test id -> status from the `pytest -rA` short summary."""
+    statuses = {}
+    for line in output.splitlines():
+        match = _STATUS_LINE.match(line.strip())
+        if match:
+            status, rest = match.groups()
+            statuses[rest.split(" - ")[0].strip()] = status
+    return statuses
+
+
+class SWEHarness:
+    """Grades SWE-bench instances in git worktrees of pre-seeded mirrors."""
+
+    def __init__(self, home: str = SWE_HOME, test_workers: int = SWE_TEST_WORKERS,
+                 timeout: float = SWE_TIMEOUT):
+        self.home = home
+        self.test_workers = max(1, test_workers)
+        self.timeout = timeout
+
+    # ---- Layout ----
+    def mirror_path(self, repo: str) -> str:
+        return os.path.join(self.home, "mirrors", repo_slug(repo) + ".git")
+
+    def venv_path(self, repo: str, version: str) -> str:
+        return os.path.join(self.home, "venvs", f"{repo_slug(repo)}__{version}")
+
+    def venv_python(self, repo: str, version: str) -> str:
+        bindir = "Scripts" if os.name == "nt" else "bin"
+        return os.path.join(self.venv_path(repo, version), bindir, "python")
+
+    @contextmanager
+    def _mirror_lock(self, mirror: str):
+        """git worktree add/remove are not safe to run concurrently on one repo."""
+        with open(mirror + ".lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @contextmanager
+    def worktree(self, repo: str, commit: str, name: str):
+        """Detached worktree of `repo` at `commit`, removed on exit."""
+        mirror = self.mirror_path(repo)
+        if not os.path.isdir(mirror):
+            raise SWEEnvError(f"No mirror for {repo} at {mirror} (run `swe_harness.py mirror`)")
+        path = os.path.abspath(os.path.join(self.home, "worktrees", f"{name}-{uuid.uuid4().hex[:8]}"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._mirror_lock(mirror):
+            # Worktrees left behind by killed runs
+            _git("--git-dir", mirror, "worktree", "prune")
+            proc = _git("--git-dir", mirror, "worktree", "add", "--detach", path, commit)
+        if proc.returncode != 0:
+            raise SWEEnvError(f"git worktree add {commit[:12]} failed: {proc.stderr.strip()}")
+        try:
+            yield path
+        finally:
+            with self._mirror_lock(mirror):
+                _git("--git-dir", mirror, "worktree", "remove", "--force", path)
+            shutil.rmtree(path, ignore_errors=True)
+
+    # ---- Grading ----
+    @staticmethod
+    def apply_patch(worktree: str, patch: str) -> str:
+        """Apply a unified diff; returns an error message or "" on success."""
+        if not patch.endswith("\n"):
+            patch += "\n"
+        proc = subprocess.run(["git", "apply", "--whitespace=nowarn", "-"], cwd=worktree,
+                              input=patch, capture_output=True, text=True, timeout=GIT_TIMEOUT)
+        if proc.returncode == 0:
+            return ""
+        # Model diffs often have slightly-off hunk offsets; let patch(1) fuzz them
+        fallback = subprocess.run(["patch", "--batch", "--fuzz=5", "-p1", "--forward"], cwd=worktree,
+                                  input=patch, capture_output=True, text=True, timeout=GIT_TIMEOUT)
+        if fallback.returncode == 0:
+            return ""
+        return proc.stderr.strip() or fallback.stdout.strip()
+
+    def run_tests(self, python: str, worktree: str, test_ids: list) -> dict:
+        """Run `test_ids` split across parallel pytest processes; returns id -> status.
+
+        The timeout covers the whole instance, not each process.
+        """
+        chunks = [test_ids[i::self.test_workers] for i in range(self.test_workers)]
+        env = dict(os.environ, PYTHONPATH=worktree, PYTHONDONTWRITEBYTECODE="1")
+        procs = [
+            subprocess.Popen(
+                [python, "-m", "pytest", "-rA", "-p", "no:cacheprovider", "--no-header", *chunk],
+                cwd=worktree, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            )
+            for chunk in chunks if chunk
+        ]
+        statuses = {}
+        deadline = time.monotonic() + self.timeout
+        try:
+            for proc in procs:
+                output, _ = proc.communicate(timeout=max(0.0, deadline - time.monotonic()))
+                statuses.update(parse_pytest_report(output))
+        finally:
+            for proc in procs:
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+        return statuses
+
+    def grade(self, data: dict, response: str) -> dict:
+        """Grade one response; same verdict shape as SandboxPool.grade."""
+        def verdict(passed, error, kind, tests=None):
+            result = {"passed": passed, "error": error, "failure_kind": kind}
+            if tests:
+                result["tests"] = tests
+            return result
+
+        patch = extract_patch(response)
+        if not patch:
+            return verdict(False, "No diff found in response", FAILED)
+
+        fail_to_pass = list(data.get("FAIL_TO_PASS", []))
+        pass_to_pass = list(data.get("PASS_TO_PASS", []))
+        try:
+            python = self.venv_python(data["repo"], data["version"])
+            if not os.path.exists(python):
+                raise SWEEnvError(f"No venv for {data['repo']} {data['version']} (run `swe_harness.py venv`)")
+            with self.worktree(data["repo"], data["base_commit"], data["instance_id"]) as path:
+                error = self.apply_patch(path, patch)
+                if error:
+                    return verdict(False, f"Patch failed to apply: {error}", FAILED)
+                # The gold tests conflict with the candidate's own test edits: the candidate failed
+                error = self.apply_patch(path, data["test_patch"]) if data.get("test_patch") else ""
+                if error:
+                    return verdict(False, f"test_patch failed to apply on top of the model patch: {error}",
+                                   FAILED)
+                statuses = self.run_tests(python, path, fail_to_pass + pass_to_pass)
+        except subprocess.TimeoutExpired:
+            return verdict(False, f"Tests timed out after {self.timeout}s", TIMEOUT)
+        except (SWEEnvError, OSError) as e:
+            return verdict(False, str(e), ENV_ERROR)
+
+        tests = [
+            {"id": test_id, "kind": kind, "passed": statuses.get(test_id) in _PASS_STATUSES,
+             "status": statuses.get(test_id, "MISSING")}
+            for kind, ids in (("FAIL_TO_PASS", fail_to_pass), ("PASS_TO_PASS", pass_to_pass))
+            for test_id in ids
+        ]
+        failing = [t["id"] for t in tests if not t["passed"]]
+        if failing:
+            return verdict(False, f"{len(failing)}/{len(tests)} tests failed: {', '.join(failing[:3])}",
+                           FAILED, tests)
+        return verdict(True, "", PASSED, tests)
+
+    # ---- Seeding (needs network) ----
+    def seed_mirror(self, repo: str, url: str = None) -> str:
+        mirror = self.mirror_path(repo)
+        if os.path.isdir(mirror):
+            proc = _git("--git-dir", mirror, "remote", "update", "--prune", timeout=None)
+        else:
+            os.makedirs(os.path.dirname(mirror), exist_ok=True)
+            proc = _git("clone", "--mirror", url or f"https://github.com/{repo}.git", mirror, timeout=None)
+        if proc.returncode != 0:
+            raise SWEEnvError(proc.stderr.strip())
+        return mirror
+
+    def seed_venv(self, data: dict, system_site_packages: bool = False) -> str:
+        """Build the (repo, version) venv from environment_setup_commit.
+
+        The package is installed editable from a build worktree; at grading
+        time the task worktree comes first on sys.path and shadows it.
+        """
+        venv = self.venv_path(data["repo"], data["version"])
+        if os.path.exists(self.venv_python(data["repo"], data["version"])):
+            return venv
+        cmd = [sys.executable, "-m", "venv", venv]
+        if system_site_packages:
+            cmd.append("--system-site-packages")
+        subprocess.run(cmd, check=True)
+        python = self.venv_python(data["repo"], data["version"])
+        build = os.path.join(self.home, "builds", os.path.basename(venv))
+        if not os.path.isdir(build):
+            proc = _git("--git-dir", self.mirror_path(data["repo"]), "worktree", "add", "--detach",
+                        os.path.abspath(build), data.get("environment_setup_commit") or data["base_commit"])
+            if proc.returncode != 0:
+                raise SWEEnvError(proc.stderr.strip())
+        subprocess.run([python, "-m", "pip", "install", "-q", "pytest", "-e", build], check=True)
+        return venv
+
+
+def load_instances(paths: list) -> list:
+    instances = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            instances.append(json.load(f))
+    return instances
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed mirrors/venvs and grade SWE-bench instances offline.")
+    parser.add_argument("--home", default=SWE_HOME)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    mirror = sub.add_parser("mirror", help="Clone or update the mirror of each instance's repo")
+    mirror.add_argument("problems", nargs="+")
+    mirror.add_argument("--url", help="Clone from this URL instead of GitHub (single repo)")
+
+    venv = sub.add_parser("venv", help="Build the (repo, version) virtualenvs")
+    venv.add_argument("problems", nargs="+")
+    venv.add_argument("--system-site-packages", action="store_true")
+
+    grade = sub.add_parser("grade", help="Grade a response file against one instance")
+    grade.add_argument("problem")
+    grade.add_argument("response", help="File with the model output, or - for the gold patch")
+    grade.add_argument("--workers", type=int, default=SWE_TEST_WORKERS)
+    args = parser.parse_args()
+
+    harness = SWEHarness(args.home, getattr(args, "workers", SWE_TEST_WORKERS))
+    if args.command == "mirror":
+        for repo in sorted({d["repo"] for d in load_instances(args.problems)}):
+            print(f"🪞 {repo} -> {harness.seed_mirror(repo, args.url)}")
+    elif args.command == "venv":
+        seen = set()
+        for data in load_instances(args.problems):
+            if (data["repo"], data["version"]) not in seen:
+                seen.add((data["repo"], data["version"]))
+                print(f"🐍 {data['repo']} {data['version']} -> {harness.seed_venv(data, args.system_site_packages)}")
+    elif args.command == "grade":
+        data = load_instances([args.problem])[0]
+        if args.response == "-":
+            response = f"```diff\n{data['patch']}\n```"
+        else:
+            with open(args.response, "r", encoding="utf-8") as f:
+                response = f.read()
+        print(json.dumps(harness.grade(data, response), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+work_queue.py - Leased work queue for sweeps split across machines
+---------------------------------
+A coordinator publishes work units into a SQLite file; workers lease a few
+at a time, run them and ack each result (or report a failure). Leases
+expire, so units held by a dead worker go back to the queue after
+`lease_seconds`; live workers keep theirs with `LeaseKeeper`. The first ack
+of a unit wins and later ones are ignored.
+
+Workers on the same machine open the SQLite file directly. Workers on other
+machines use the coordinator's HTTP front (no external service needed).
+It listens on 127.0.0.1 unless given a host, and every request must carry
+the shared token from --token or $WORK_QUEUE_TOKEN:
+
+    WORK_QUEUE_TOKEN=... python scripts/work_queue.py serve sweep.sqlite --host 0.0.0.0
+    WORK_QUEUE_TOKEN=... python scripts/work_queue.py status http://HOST:8780
+---------------------------------
+"""
+
+import os
+import hmac
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+LEASE_SECONDS = 300.0
+# Leases per unit before it is given up on (worker errors and expired leases both count)
+MAX_ATTEMPTS = 3
+# Environment variable holding the shared token of the HTTP front
+TOKEN_ENV = "WORK_QUEUE_TOKEN"
+
+
+# ---------------- SQLite Queue ---------------- #
+class WorkQueue:
+    """One sweep's units in a SQLite file, safe to share between processes."""
+
+    def __init__(self, path: str, lease_seconds: float = LEASE_SECONDS, max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Autocommit; writes take the database lock explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS units (
+                id TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                fingerprint TEXT,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                finished INTEGER,
+                result TEXT,
+                error TEXT
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS units_state ON units (state, seq)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _write(self, fn):
+        """Run `fn(conn)` in one write transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _next_finished(self, conn) -> int:
+        return conn.execute("SELECT COALESCE(MAX(finished), 0) + 1 FROM units").fetchone()[0]
+
+    # ---- coordinator side ---- #
+    def publish(self, units: list, config: dict = None) -> int:
+        """Make `units` (id, seq, fingerprint, payload) the queue's sweep.
+
+        Units already done with the same fingerprint keep their result; any
+        other unit is (re)queued, and units not in `units` are dropped.
+        Returns how many are left to run.
+        """
+        def publish(conn):
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS sweep (id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM sweep")
+            conn.executemany("INSERT INTO sweep VALUES (?)", [(u[0],) for u in units])
+            conn.execute("DELETE FROM units WHERE id NOT IN (SELECT id FROM sweep)")
+            conn.executemany(
+                """INSERT INTO units (id, seq, fingerprint, payload, state) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET
+                       seq = excluded.seq, fingerprint = excluded.fingerprint, payload = excluded.payload,
+                       state = excluded.state, worker = NULL, lease_until = NULL, attempts = 0,
+                       finished = NULL, result = NULL, error = NULL
+                   WHERE units.state != 'done' OR units.fingerprint IS NOT excluded.fingerprint""",
+                [(uid, seq, fingerprint, json.dumps(payload), PENDING) for uid, seq, fingerprint, payload in units],
+            )
+            if config is not None:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('config', ?)", (json.dumps(config),))
+            return conn.execute("SELECT COUNT(*) FROM units WHERE state != 'done'").fetchone()[0]
+
+        return self._write(publish)
+
+    def results(self, after: int = 0) -> list:
+        """(finished, id, state, record or error) of units that finished after `after`, in order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT finished, id, state, result, error FROM units WHERE finished > ? ORDER BY finished",
+                (after,),
+            ).fetchall()
+        return [(finished, uid, state, json.loads(result) if state == DONE else error)
+                for finished, uid, state, result, error in rows]
+
+    # ---- worker side ---- #
+    def config(self) -> dict:
+        """Settings the coordinator published with the sweep (None before it has)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def lease(self, worker: str, limit: int = 1) -> list:
+        """Lease up to `limit` runnable units to `worker`; returns (id, payload) pairs."""
+        def lease(conn):
+            now = time.time()
+            # Expired leases that used up their attempts are given up on
+            expired = conn.execute(
+                "SELECT id FROM units WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            ).fetchall()
+            for (uid,) in expired:
+                conn.execute(
+                    "UPDATE units SET state = 'failed', finished = ?, error = ? WHERE id = ?",
+                    (self._next_finished(conn), f"Lease expired {self.max_attempts} times", uid),
+                )
+            rows = conn.execute(
+                """SELECT id, payload FROM units
+                   WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?)
+                   ORDER BY seq LIMIT ?""",
+                (now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE units SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                [(worker, now + self.lease_seconds, uid) for uid, _ in rows],
+            )
+            return [(uid, json.loads(payload)) for uid, payload in rows]
+
+        return self._write(lease)
+
+    def extend(self, ids: list, worker: str) -> int:
+        """Renew `worker`'s leases on `ids`; returns how many it still holds."""
+        def extend(conn):
+            until = time.time() + self.lease_seconds
+            return sum(conn.execute(
+                "UPDATE units SET lease_until = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                (until, uid, worker),
+            ).rowcount for uid in ids)
+
+        return self._write(extend)
+
+    def ack(self, uid: str, worker: str, record: dict) -> bool:
+        """Store a unit's result record; False if it had already finished."""
+        def ack(conn):
+            return conn.execute(
+                """UPDATE units SET state = 'done', worker = ?, result = ?, error = NULL, finished = ?
+                   WHERE id = ? AND state NOT IN ('done', 'failed')""",
+                (worker, json.dumps(record, ensure_ascii=False), self._next_finished(conn), uid),
+            ).rowcount == 1
+
+        return self._write(ack)
+
+    def fail(self, uid: str, worker: str, error: str) -> bool:
+        """Report that `worker` could not run a unit: requeue it, or give up after max_attempts.
+
+        Returns True if the unit was given up on.
+        """
+        def fail(conn):
+            row = conn.execute(
+                "SELECT attempts FROM units WHERE id = ? AND worker = ? AND state = 'leased'", (uid, worker)
+            ).fetchone()
+            if row is None:
+                return False
+            if row[0] >= self.max_attempts:
+                conn.execute("UPDATE units SET state = 'failed', error = ?, finished = ? WHERE id = ?",
+                             (error, self._next_finished(conn), uid))
+                return True
+            conn.execute("UPDATE units SET state = 'pending', worker = NULL, lease_until = NULL, error = ? "
+                         "WHERE id = ?", (error, uid))
+            return False
+
+        return self._write(fail)
+
+    def status(self) -> dict:
+        """Unit count per state."""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM units GROUP BY state").fetchall()
+        counts = {state: 0 for state in (PENDING, LEASED, DONE, FAILED)}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        self._conn.close()
+
+
+# ---------------- HTTP Front ---------------- #
+# Methods a remote worker may call, with their JSON arguments
+REMOTE_METHODS = ("config", "lease", "extend", "ack", "fail", "status")
+
+
+def _handler(queue: WorkQueue, token: str):
+    expected = f"Bearer {token}".encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not hmac.compare_digest(self.headers.get("Authorization", "").encode(), expected):
+                self._reply(401, {"error": "Missing or wrong queue token"})
+                return
+            name = self.path.strip("/")
+            if name not in REMOTE_METHODS:
+                self.send_error(404, f"Unknown method {name!r}")
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+            try:
+                result = getattr(queue, name)(**json.loads(body or b"{}"))
+                status, payload = 200, {"result": result}
+            except Exception as e:
+                status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+            self._reply(status, payload)
+
+        def _reply(self, status: int, payload: dict):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class QueueServer:
+    """Serves a WorkQueue over HTTP in a background thread.
+
+    Requests without the shared `token` (default: $WORK_QUEUE_TOKEN) are refused.
+    """
+
+    def __init__(self, queue: WorkQueue, host: str = "127.0.0.1", port: int = 8780, token: str = None):
+        token = token or os.environ.get(TOKEN_ENV)
+        if not token:
+            raise ValueError(f"Serving a queue needs a shared token (--token or ${TOKEN_ENV})")
+        self.httpd = ThreadingHTTPServer((host, port), _handler(queue, token))
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class RemoteQueue:
+    """Client for a QueueServer with the worker-side WorkQueue methods."""
+
+    def __init__(self, url: str, token: str = None, timeout: float = 60.0):
+        self.url = url.rstrip("/")
+        self.token = token or os.environ.get(TOKEN_ENV, "")
+        self.timeout = timeout
+
+    def _call(self, name: str, **kwargs):
+        request = urllib.request.Request(f"{self.url}/{name}", data=json.dumps(kwargs).encode(),
+                                         headers={"Content-Type": "application/json",
+                                                  "Authorization": f"Bearer {self.token}"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())["result"]
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Queue {name} failed: {e.read().decode(errors='replace')}") from None
+
+    def config(self):
+        return self._call("config")
+
+    def lease(self, worker, limit=1):
+        return [tuple(pair) for pair in self._call("lease", worker=worker, limit=limit)]
+
+    def extend(self, ids, worker):
+        return self._call("extend", ids=list(ids), worker=worker)
+
+    def ack(self, uid, worker, record):
+        return self._call("ack", uid=uid, worker=worker, record=record)
+
+    def fail(self, uid, worker, error):
+        return self._call("fail", uid=uid, worker=worker, error=error)
+
+    def status(self):
+        return self._call("status")
+
+    def close(self):
+        pass
+
+
+def is_remote(spec: str) -> bool:
+    return spec.startswith(("http://", "https://"))
+
+
+def open_queue(spec: str, lease_seconds: float = LEASE_SECONDS, token: str = None):
+    """A RemoteQueue for http(s):// URLs, otherwise the SQLite queue at `spec`."""
+    if is_remote(spec):
+        return RemoteQueue(spec, token)
+    return WorkQueue(spec, lease_seconds)
+
+
+# ---------------- Lease Keeper ---------------- #
+class LeaseKeeper:
+    """Renews a worker's leases in the background while its units run."""
+
+    def __init__(self, queue, worker: str, interval: float = LEASE_SECONDS / 3):
+        self.queue = queue
+        self.worker = worker
+        self.interval = interval
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def hold(self, ids):
+        with self._lock:
+            self._held.update(ids)
+
+    def release(self, uid: str):
+        with self._lock:
+            self._held.discard(uid)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                held = list(self._held)
+            if held:
+                try:
+                    self.queue.extend(held, self.worker)
+                except Exception as e:
+                    # Lost leases are re-run elsewhere; the acks still count
+                    print(f"⚠️  Could not renew {len(held)} leases: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# ---------------- CLI ---------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or serve a sweep work queue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Serve a SQLite queue to workers on other machines")
+    serve.add_argument("path")
+    serve.add_argument("--host", default="127.0.0.1", help="0.0.0.0 accepts workers on other machines")
+    serve.add_argument("--port", type=int, default=8780)
+    status = sub.add_parser("status", help="Unit counts per state")
+    status.add_argument("queue", help="SQLite path or http://HOST:PORT")
+    for command in (serve, status):
+        command.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                             help=f"Shared token of the HTTP front (default: ${TOKEN_ENV})")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(json.dumps(open_queue(args.queue, token=args.token).status()))
+        return
+    if not args.token:
+        parser.error(f"serve needs a shared token (--token or ${TOKEN_ENV})")
+    with QueueServer(WorkQueue(args.path), args.host, args.port, args.token) as server:
+        print(f"📮 Serving {args.path} at {server.url}")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import json
+import time
+import asyncio
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+from async_engine import AsyncEngine
+from mock_llm_server import start_in_thread
+from resilience import CircuitBreaker, RetryPolicy
+
+REQUEST = {"model": "gpt-4o", "messages": [{"role": "user", "content": "def add(a, b):"}], "max_tokens": 64}
+
+
+class StatusError(Exception):
+    """Shaped like the SDKs' APIStatusError: a status code and the response headers."""
+
+    def __init__(self, status: int, headers: dict):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(headers={k.lower(): v for k, v in headers.items()})
+
+
+def mock_send(base_url):
+    """An engine `send` posting to the mock server with the standard library."""
+    def post(request):
+        body = json.dumps(request).encode()
+        http = urllib.request.Request(f"{base_url}/chat/completions", data=body,
+                                      headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(http, timeout=10) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            e.read()
+            raise StatusError(e.code, dict(e.headers)) from None
+
+    async def send(request):
+        return await asyncio.to_thread(post, request)
+
+    return send
+
+
+def run(server_kwargs: dict, count: int, **engine_kwargs):
+    server, url = start_in_thread(**server_kwargs)
+    try:
+        engine = AsyncEngine(mock_send(url), **engine_kwargs)
+        started = time.monotonic()
+        results = engine.run([REQUEST] * count)
+        return engine, results, time.monotonic() - started, server.state.snapshot()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_429s_shrink_the_concurrency_limit():
+    engine, results, _, _ = run({"latency": 0.1, "faults": {"max_concurrent": 2, "retry_after": 0.05}}, 20,
+                                max_concurrency=5, retry=RetryPolicy(20, 0.01, 0.1))
+    assert not [r for r in results if isinstance(r, Exception)]
+    stats = engine.stats()
+    assert stats["rate_limited"] >= 1
+    assert stats["limit_decreases"] >= 1
+    assert stats["lowest_limit"] < 5
+
+
+def test_retry_after_replaces_the_backoff():
+    assert 2.0 <= RetryPolicy(base_delay=0.01).delay(1, StatusError(429, {"Retry-After": "2"})) <= 2.01
+    # The second request is refused while the first is in flight, and told to come back in 1s
+    engine, results, elapsed, _ = run({"latency": 0.3, "faults": {"max_concurrent": 1, "retry_after": 1}}, 2,
+                                      max_concurrency=2, retry=RetryPolicy(10, 0.01, 5.0))
+    assert not [r for r in results if isinstance(r, Exception)]
+    assert engine.retries >= 1
+    assert elapsed >= 1.0
+
+
+def test_breaker_opens_during_an_outage_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.2)
+    engine, results, _, served = run({"faults": {"outage": (0, 0.6)}}, 3, max_concurrency=1,
+                                      retry=RetryPolicy(50, 0.02, 0.05), breaker=breaker)
+    assert not [r for r in results if isinstance(r, Exception)]
+    assert engine.stats()["breaker_trips"] >= 1
+    assert breaker.state == CircuitBreaker.CLOSED
+    # While open, attempts fail fast without reaching the server
+    assert served["requests"] < len(results) + engine.retries
+
+
+def test_rate_limits_do_not_trip_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=2)
+    for _ in range(5):
+        breaker.record_failure(StatusError(429, {}))
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure(StatusError(503, {}))
+    breaker.record_failure(StatusError(503, {}))
+    assert breaker.state == CircuitBreaker.OPEN
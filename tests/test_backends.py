@@ -0,0 +1,35 @@
+import os
+import sys
+import json
+import subprocess
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), os.pardir, "scripts")
+
+PROBLEM = {
+    "task_id": "HumanEval/0",
+    "prompt": "def add(a, b):\n    \"\"\"Return a + b.\"\"\"\n",
+    "entry_point": "add",
+    "canonical_solution": "    return a + b\n",
+    "test": "def check(candidate):\n    assert candidate(1, 2) == 3\n",
+}
+
+
+def test_replay_runs_without_openai_key(tmp_path):
+    os.mkdir(tmp_path / "problems")
+    (tmp_path / "problems" / "HE_0.json").write_text(json.dumps(PROBLEM))
+    answer = "```python\ndef add(a, b):\n    return a + b\n```"
+    (tmp_path / "answers.jsonl").write_text(json.dumps({"filename": "HE_0.json", "response": answer}) + "\n")
+    env = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "OPENAI_BASE_URL")}
+    proc = subprocess.run([sys.executable, os.path.join(SCRIPTS, "eval_gpt.py"), "--models", "replay:answers.jsonl"],
+                          cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    [results] = [p for p in os.listdir(tmp_path) if p.startswith("results_replay_answers") and p.endswith(".jsonl")]
+    records = [json.loads(line) for line in open(tmp_path / results)]
+    assert records and all(r["passed"] for r in records if "strategy" in r)
+
+
+def test_eval_gpt_imports_without_openai_key(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    sys.modules.pop("eval_gpt", None)
+    import eval_gpt
+    assert eval_gpt._client is None
@@ -0,0 +1,33 @@
+import time
+import threading
+
+from grade_cache import VerdictCache
+
+
+def test_identical_programs_in_flight_are_graded_once():
+    cache = VerdictCache()
+    calls = []
+
+    def grade():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"passed": True, "error": "", "failure_kind": ""}
+
+    verdicts = []
+    threads = [threading.Thread(target=lambda: verdicts.append(cache.grade("task", "def f(): pass", grade)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(verdicts) == 4 and all(v["passed"] for v in verdicts)
+    assert cache.stats()["graded"] == 1
+
+
+def test_uncached_outcomes_are_graded_again():
+    cache = VerdictCache()
+    timeout = {"passed": False, "error": "Timed out", "failure_kind": "timeout"}
+    assert cache.grade("task", "while True: pass", lambda: timeout) == timeout
+    assert cache.grade("task", "while True: pass", lambda: timeout) == timeout
+    assert cache.stats()["graded"] == 2
@@ -0,0 +1,21 @@
+import grade_order
+
+
+def outcome(index, passed):
+    return {"index": index, "passed": passed, "seconds": 0.01}
+
+
+def test_concurrent_saves_add_up(tmp_path):
+    path = str(tmp_path / "order.json")
+    a, b = grade_order.TestOrderStore(path), grade_order.TestOrderStore(path)
+    a.update("task", [outcome(0, False), outcome(1, True)])
+    b.update("task", [outcome(0, True)])
+    a.save()
+    b.save()
+    a.update("task", [outcome(1, False)])
+    a.save()
+    history = grade_order.TestOrderStore(path)._stats["task"]
+    assert history["0"]["runs"] == 2 and history["0"]["fails"] == 1
+    assert history["1"]["runs"] == 2 and history["1"]["fails"] == 1
+    # A save also brings in what the other processes saved
+    assert b._stats["task"]["0"]["runs"] == 2
@@ -0,0 +1,39 @@
+from graders import GRADING_FIELDS, clean_code, grade_code, grading_view
+
+
+def test_closing_fence_with_trailing_text():
+    response = ("Here you go:\n```python\ndef add(a, b):\n    return a + b\n```  # end\n"
+                "This adds the two numbers.\n")
+    assert clean_code(response, "add") == "def add(a, b):\n    return a + b"
+
+
+def test_closing_fence_followed_by_prose_on_the_same_line():
+    response = "```python\ndef add(a, b):\n    return a + b\n``` That's the whole solution.\nMore prose."
+    assert clean_code(response, "add") == "def add(a, b):\n    return a + b"
+
+
+def test_glued_and_unclosed_fences():
+    assert clean_code("```python\ndef f():\n    return 1```", "f") == "def f():\n    return 1"
+    assert clean_code("```python\ndef f():\n    return 1", "f") == "def f():\n    return 1"
+
+
+def test_block_that_does_not_parse_is_not_returned():
+    # Only the broken draft spells "def add(", the fix is written "def add (a, b)"
+    response = ("```python\ndef add(a, b)\n    return a + b\n```\nFixed:\n"
+                "```python\ndef add (a, b):\n    return a + b\n```\nCheck:\n```python\nprint(add(1, 2))\n```")
+    assert clean_code(response, "add") == "def add (a, b):\n    return a + b"
+
+
+def test_long_prose_around_the_solution():
+    prose = "\n".join(f"Step {k}: think about case {k}." for k in range(200))
+    response = f"{prose}\n```python\ndef f(x):\n    return x\n```\nUsage:\n```python\nprint(f(1))\n```\n" + "Done. " * 500
+    assert clean_code(response, "f") == "def f(x):\n    return x"
+
+
+def test_mbpp_setup_code_runs_before_the_asserts():
+    data = {"task_id": 1, "entry_point": "total", "test_setup_code": "import math\nXS = [1.5, 2.5]",
+            "test_list": ["assert total(XS) == math.floor(4.0)"], "code": "..."}
+    assert "test_setup_code" in GRADING_FIELDS["MBPP"]
+    view = grading_view(data, "MBPP")
+    answer = "```python\ndef total(xs):\n    return sum(xs)\n```"
+    assert grade_code(view, "MBPP", answer) == (True, "")
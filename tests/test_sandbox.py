@@ -0,0 +1,65 @@
+import pytest
+
+from sandbox import CRASH, FAILED, OOM, PASSED, TIMEOUT, SandboxPool
+
+PROBLEM = {
+    "task_id": "HumanEval/0",
+    "prompt": "def add(a, b):\n    \"\"\"Return a + b.\"\"\"\n",
+    "entry_point": "add",
+    "test": "def check(candidate):\n    assert candidate(1, 2) == 3\n",
+}
+
+
+def answer(body: str, preamble: str = "") -> str:
+    return f"```python\n{preamble}def add(a, b):\n    {body}\n```"
+
+
+CORRECT = answer("return a + b")
+
+
+@pytest.fixture(params=[False, True], ids=["worker", "fork"])
+def fork(request):
+    return request.param
+
+
+def grade(pool, code):
+    return pool.grade(PROBLEM, "HumanEval", code)
+
+
+def test_verdicts_and_recovery(fork):
+    with SandboxPool(1, timeout=5, cpu_seconds=5, memory_mb=512, fork_per_candidate=fork) as pool:
+        assert grade(pool, CORRECT)["failure_kind"] == PASSED
+        assert grade(pool, answer("return a - b"))["failure_kind"] == FAILED
+        assert grade(pool, answer("os._exit(3)", "import os\n"))["failure_kind"] == CRASH
+        # The dead worker was replaced
+        assert grade(pool, CORRECT)["passed"]
+
+
+def test_wall_clock_timeout(fork):
+    with SandboxPool(1, timeout=1, cpu_seconds=30, memory_mb=512, fork_per_candidate=fork) as pool:
+        verdict = grade(pool, answer("time.sleep(30)", "import time\n"))
+        assert verdict["failure_kind"] == TIMEOUT
+        assert grade(pool, CORRECT)["passed"]
+
+
+def test_cpu_limit(fork):
+    with SandboxPool(1, timeout=30, cpu_seconds=1, memory_mb=512, fork_per_candidate=fork) as pool:
+        verdict = grade(pool, answer("while True: pass"))
+        assert verdict["failure_kind"] == TIMEOUT
+        assert "CPU time limit" in verdict["error"]
+        assert grade(pool, CORRECT)["passed"]
+
+
+def test_memory_limit(fork):
+    with SandboxPool(1, timeout=10, cpu_seconds=10, memory_mb=512, fork_per_candidate=fork) as pool:
+        verdict = grade(pool, answer("return len(bytearray(4 << 30))"))
+        assert verdict["failure_kind"] == OOM
+        assert grade(pool, CORRECT)["passed"]
+
+
+def test_forked_candidates_do_not_see_each_others_patches():
+    patch = answer("return a + b", "import builtins\nbuiltins.sum = lambda *args: 0\n")
+    check_sum = answer("return sum([a, b])")
+    with SandboxPool(1, timeout=5, cpu_seconds=5, memory_mb=512, fork_per_candidate=True) as pool:
+        assert grade(pool, patch)["passed"]
+        assert grade(pool, check_sum)["passed"]
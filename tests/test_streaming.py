@@ -0,0 +1,36 @@
+from streaming import StreamAccumulator, code_block_closed
+
+PLAN_FIRST = (
+    "Plan:\n```text\n1. read the input\n2. sum it\n```\n"
+    "Run it with:\n```bash\npython solution.py\n```\n"
+    "```python\ndef solve(xs):\n    return sum(xs)\n```\n"
+    "Explanation: the function adds the numbers."
+)
+
+
+def stream(text, dataset=None, piece=4):
+    acc = StreamAccumulator(1, lambda t: code_block_closed(t, dataset))
+    for i in range(0, len(text), piece):
+        if acc.add(0, text[i:i + piece]):
+            break
+    return acc
+
+
+def test_non_python_fence_does_not_stop_the_stream():
+    acc = stream(PLAN_FIRST)
+    assert acc.stopped_early
+    content = acc.contents()[0]
+    assert "return sum(xs)\n```" in content
+    assert "Explanation" not in content
+
+
+def test_untagged_fence_counts_as_python():
+    assert code_block_closed("```\ndef f():\n    pass\n```")
+    assert not code_block_closed("```json\n{}\n```")
+
+
+def test_swe_stops_on_a_closed_diff_only():
+    diff = "```diff\n--- a/x.py\n+++ b/x.py\n@@ -1 +1 @@\n-a\n+b\n```"
+    assert not code_block_closed("```python\nprint(1)\n```", "SWE")
+    assert code_block_closed(diff, "SWE")
+    assert not code_block_closed(diff)
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from work_queue import DONE, FAILED, LEASED, PENDING, TOKEN_ENV, QueueServer, RemoteQueue, WorkQueue
+
+UNITS = [("u1", 0, "f1", {"strategy": "baseline"}), ("u2", 1, "f2", {"strategy": "cot"})]
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(**kwargs):
+        queue = WorkQueue(str(tmp_path / "queue.db"), **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+def test_expired_lease_is_requeued_and_first_ack_wins(make_queue):
+    queue = make_queue(lease_seconds=0.3)
+    queue.publish(UNITS[:1])
+    assert [uid for uid, _ in queue.lease("a")] == ["u1"]
+    assert queue.lease("b") == []
+    time.sleep(0.4)
+    assert [uid for uid, _ in queue.lease("b")] == ["u1"]
+    assert queue.ack("u1", "b", {"passed": True})
+    # The worker whose lease expired finishes late; its result is dropped
+    assert not queue.ack("u1", "a", {"passed": False})
+    [(_, uid, state, record)] = queue.results()
+    assert (uid, state, record) == ("u1", DONE, {"passed": True})
+
+
+def test_extended_lease_is_not_taken(make_queue):
+    queue = make_queue(lease_seconds=0.5)
+    queue.publish(UNITS[:1])
+    queue.lease("a")
+    time.sleep(0.3)
+    assert queue.extend(["u1"], "a") == 1
+    time.sleep(0.3)
+    assert queue.lease("b") == []
+    assert queue.status()[LEASED] == 1
+
+
+def test_lease_given_up_after_max_attempts(make_queue):
+    queue = make_queue(lease_seconds=0.05, max_attempts=2)
+    queue.publish(UNITS[:1])
+    for worker in ("a", "b"):
+        assert queue.lease(worker)
+        time.sleep(0.08)
+    assert queue.lease("c") == []
+    [(_, uid, state, error)] = queue.results()
+    assert (uid, state) == ("u1", FAILED)
+    assert "expired 2 times" in error
+
+
+def test_fail_requeues_until_max_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    queue.publish(UNITS[:1])
+    queue.lease("a")
+    assert not queue.fail("u1", "someone-else", "not theirs")
+    assert not queue.fail("u1", "a", "boom")
+    assert queue.status()[PENDING] == 1
+    queue.lease("b")
+    assert queue.fail("u1", "b", "boom again")
+    assert queue.status()[FAILED] == 1
+
+
+def test_republish_keeps_done_units_with_the_same_fingerprint(make_queue):
+    queue = make_queue()
+    queue.publish(UNITS)
+    for uid, _ in queue.lease("a", limit=2):
+        queue.ack(uid, "a", {"id": uid})
+    changed = [UNITS[0], ("u2", 1, "f2-new", {"strategy": "cot"})]
+    assert queue.publish(changed) == 1
+    assert [uid for uid, _ in queue.lease("a", limit=2)] == ["u2"]
+
+
+def test_http_front_requires_the_token(make_queue, monkeypatch):
+    queue = make_queue()
+    queue.publish(UNITS, {"grade_mode": "full"})
+    monkeypatch.delenv(TOKEN_ENV, raising=False)
+    with pytest.raises(ValueError):
+        QueueServer(queue, port=0)
+    with QueueServer(queue, port=0, token="s3cret") as server:
+        with pytest.raises(RuntimeError, match="token"):
+            RemoteQueue(server.url, token="wrong").status()
+        remote = RemoteQueue(server.url, token="s3cret")
+        assert remote.config() == {"grade_mode": "full"}
+        assert [uid for uid, _ in remote.lease("w", 1)] == ["u1"]
+        assert remote.ack("u1", "w", {"passed": True})
+        assert remote.status()[DONE] == 1